@@ -1,11 +1,26 @@
+# coding=utf8
 from __future__ import absolute_import, division, print_function
 
+import sys
+
 __author__ = 'hellflame'
 __author_email__ = 'hellflamedly@gmail.com'
 __url__ = 'https://github.com/hellflame/progressed-http'
 __version__ = '1.0.0'
 
-__all__ = ['http', 'progress', 'utils']
+__all__ = ['http', 'progress', 'utils', 'session']
 
-from . import http, progress, utils
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """
+        PEP 562: 子模块在第一次访问时才导入，只用到其中一部分的短命进程启动更快
+        """
+        if name in __all__:
+            import importlib
+            return importlib.import_module('.' + name, __name__)
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
+    def __dir__():
+        return sorted(list(globals()) + __all__)
+else:
+    from . import http, progress, utils, session
@@ -0,0 +1,33 @@
+# coding=utf8
+"""
+    Adaptive receive size for recv_into loops
+"""
+from __future__ import absolute_import, division, print_function
+
+__all__ = ['AdaptiveSize']
+
+
+class AdaptiveSize(object):
+    """
+    每次接收都填满时加倍接收大小，明显不足一半时减半
+    """
+    def __init__(self, initial=4096, minimum=4096, maximum=1024 * 1024):
+        """
+        :param initial: int => 初始接收大小
+        :param minimum: int
+        :param maximum: int => 接收大小上限，也是复用缓存的大小
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = min(max(initial, minimum), maximum)
+
+    def update(self, received):
+        """
+        :param received: int => 本次实际接收的字节数
+        :return: int => 下一次的接收大小
+        """
+        if received >= self.size:
+            self.size = min(self.size * 2, self.maximum)
+        elif received < self.size // 2:
+            self.size = max(self.size // 2, self.minimum)
+        return self.size
@@ -0,0 +1,155 @@
+# coding=utf8
+"""
+    asyncio backend (python 3.5+)
+"""
+import os
+import time
+import asyncio
+
+from ProgressedHttp import tls
+from ProgressedHttp.http import HTTPCons, SockFeed
+from ProgressedHttp.encoding import ACCEPT_ENCODING
+
+__all__ = ['request', 'get', 'post']
+
+
+def default_context():
+    """
+    与同步请求共用缓存的 SSLContext，避免反复加载证书
+    :return: ssl.SSLContext
+    """
+    return tls.context()
+
+
+class AsyncConnection(object):
+    """
+    asyncio 连接，供 SockFeed 在响应结束后关闭
+    """
+    keep_alive = False
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.connect = None
+
+    def close(self):
+        self.writer.close()
+
+    def release(self):
+        self.close()
+
+
+async def request(href, method='GET', debug=False, **kwargs):
+    """
+    异步请求，参数同 http.request
+    :param href: str
+    :param method: str => GET | POST
+    :param debug: bool
+    :param semaphore: asyncio.Semaphore => 限制同时进行的请求数
+    :param progress: callable => progress(feed)，每次接收数据后调用，可以是协程函数
+    :return: SockFeed
+    """
+    semaphore = kwargs.get('semaphore')
+    if semaphore is None:
+        return await fetch(href, method, debug, **kwargs)
+    async with semaphore:
+        return await fetch(href, method, debug, **kwargs)
+
+
+async def get(href, debug=False, **kwargs):
+    return await request(href, debug=debug, **kwargs)
+
+
+async def post(href, debug=False, **kwargs):
+    return await request(href, 'POST', debug=debug, **kwargs)
+
+
+async def send_entity(writer, entity, length):
+    """
+    发送请求实体，文件与生成器逐段发送
+    :param writer: asyncio.StreamWriter
+    :param entity: str | bytes | file | iterable
+    :param length: int | None => 实体长度，None 表示使用分块编码
+    :return: None
+    """
+    if isinstance(entity, str):
+        entity = entity.encode('utf8')
+    if isinstance(entity, (bytes, bytearray, memoryview)):
+        writer.write(entity)
+        return
+    if not length and length is not None:
+        return
+    if hasattr(entity, 'read'):
+        handle = entity
+        entity = iter(lambda: handle.read(65536), b'')
+    for piece in entity:
+        if isinstance(piece, str):
+            piece = piece.encode('utf8')
+        if not piece:
+            continue
+        if length is None:
+            writer.write(('%x\r\n' % len(piece)).encode() + piece + b'\r\n')
+        else:
+            writer.write(piece)
+        await writer.drain()
+    if length is None:
+        writer.write(b'0\r\n\r\n')
+
+
+async def fetch(href, method='GET', debug=False, **kwargs):
+    # 解析 URL
+    parse = HTTPCons.url_parser(href)
+
+    # 初始化连接
+    if parse['scheme'] == 'https':
+        reader, writer = await asyncio.open_connection(parse['host'], parse['port'],
+                                                       ssl=default_context(), server_hostname=parse['host'])
+    else:
+        reader, writer = await asyncio.open_connection(parse['host'], parse['port'])
+    feed = SockFeed(AsyncConnection(reader, writer))
+
+    try:
+        headers = kwargs.get('headers')
+        if kwargs.get('compress'):
+            headers = dict(headers or {})
+            headers['Accept-Encoding'] = ACCEPT_ENCODING
+            feed.decode_content = True
+
+        # 解析 HTTP 请求
+        parse = HTTPCons.http_parser(parse['host'], parse['href'], method, headers, kwargs.get('data'))
+
+        # 拼接请求头，实体单独发送
+        send = "{0[request]}\r\n{0[headers]}\r\n\r\n".format(parse)
+
+        if debug:
+            print("\033[01;33mRequest:\033[00m @{}".format(time.time()))
+            print(send.__repr__().strip("'"))
+
+        # 发送请求
+        writer.write(send.encode())
+        await send_entity(writer, parse['entity'], parse['length'])
+        await writer.drain()
+
+        if kwargs.get('file_path'):
+            # 与 http_response 相同，收到可以接受的响应头之后才打开文件
+            feed.target = (kwargs['file_path'], kwargs.get('overwrite'))
+            feed.title = os.path.basename(kwargs['file_path'])
+
+        progress = kwargs.get('progress')
+        chunk = kwargs.get('chunk', 65536)
+        while not feed.finished:
+            data = await reader.read(chunk)
+            if not data:
+                feed.finish_loop()
+                break
+            feed.feed(data, kwargs.get('skip_body'))
+            if progress is not None:
+                result = progress(feed)
+                if asyncio.iscoroutine(result):
+                    await result
+    except BaseException:
+        # 包括任务被取消
+        feed.clean_failed_file()
+        feed.finish_loop(verify=False)
+        raise
+    return feed
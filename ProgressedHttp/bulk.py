@@ -0,0 +1,180 @@
+# coding=utf8
+"""
+    Bulk download engine running on a thread pool
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+import threading
+from collections import deque
+
+from ProgressedHttp import http, progress
+from ProgressedHttp.utils import unit_change, is_python3
+
+if is_python3():
+    from urllib.parse import unquote
+else:
+    from urllib import unquote
+
+__all__ = ['download_many', 'BulkDownload', 'Summary']
+
+
+def download_many(items, workers=4, retries=2, per_host=0, debug=False, **kwargs):
+    """
+    使用线程池批量下载
+    :param items: list => [url, ...] 或 [(url, file_path), ...]
+    :param workers: int => 线程数
+    :param retries: int => 每个文件失败后的重试次数
+    :param per_host: int => 每个 host 同时进行的下载数，0 表示不限制
+    :param debug: bool
+    :return: Summary
+    """
+    loader = BulkDownload(items, workers, retries, per_host, debug, **kwargs)
+    return loader.run()
+
+
+def target_path(url, directory=''):
+    """
+    根据 URL 选择保存位置
+    :param url: str
+    :param directory: str
+    :return: str
+    """
+    href = http.HTTPCons.url_parser(url)['href'].split('?')[0]
+    name = unquote(href.rstrip('/').split('/')[-1]) or 'index.html'
+    return os.path.join(directory, name)
+
+
+class Summary(object):
+    """
+    批量下载结果
+    """
+    def __init__(self):
+        self.succeeded = []  # [(url, file_path, bytes), ...]
+        self.failures = []  # [(url, reason), ...]
+        self.total_bytes = 0
+        self.elapsed = 0
+
+    @property
+    def throughput(self):
+        return self.total_bytes / self.elapsed if self.elapsed else 0
+
+    def report(self):
+        lines = ["{} succeeded, {} failed, {} in {:.2f}s ({}/s)".format(
+            len(self.succeeded), len(self.failures), unit_change(self.total_bytes),
+            self.elapsed, unit_change(self.throughput))]
+        for url, reason in self.failures:
+            lines.append("  failed {} => {}".format(url, reason))
+        return "\n".join(lines)
+
+
+class BulkDownload(object):
+    """
+    线程池下载，进行中的下载每个一行，最后一行为汇总进度
+    """
+    def __init__(self, items, workers=4, retries=2, per_host=0, debug=False, **kwargs):
+        self.items = [(i, target_path(i)) if not isinstance(i, (tuple, list)) else tuple(i) for i in items]
+        self.workers = max(workers, 1)
+        self.retries = retries
+        self.per_host = per_host
+        self.debug = debug
+        mute = kwargs.pop('mute', False)
+        options = kwargs.pop('progress_options', {})
+        self.manager = None if mute else progress.Manager(expected=len(self.items), **options)
+        self.kwargs = kwargs
+        self.kwargs['disable_progress'] = True
+
+        self.summary = Summary()
+        self.lock = threading.Lock()
+        self.running = {}  # host => 正在下载的数量
+        self.pending = deque()
+        self.changed = threading.Condition(self.lock)
+
+    def next_item(self):
+        """
+        取出下一个所在 host 还有空闲名额的任务，跳过已达上限的 host，避免阻塞其他 host 的任务
+        :return: (url, file_path, host) | None => 没有剩余任务时为 None
+        """
+        with self.changed:
+            while self.pending:
+                for index, (url, file_path) in enumerate(self.pending):
+                    host = http.HTTPCons.url_parser(url)['host'] if self.per_host else None
+                    if not self.per_host or self.running.get(host, 0) < self.per_host:
+                        del self.pending[index]
+                        self.running[host] = self.running.get(host, 0) + 1
+                        return url, file_path, host
+                self.changed.wait()  # 剩下的任务所在 host 都已达上限，等待下载结束
+            return None
+
+    def fetch(self, url, file_path):
+        """
+        下载单个文件，失败时重试
+        :return: (SockFeed | None, str) => 响应与失败原因
+        """
+        reason = ''
+        options = dict(self.kwargs, file_path=file_path)
+        shown = []  # 本次尝试加入进度显示的响应，请求抛出异常时 feed 为 None 也要移除
+        if self.manager is not None:
+            options['on_feed'] = lambda target: shown.append(self.manager.add(target))
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 10))
+            feed = None
+            try:
+                feed = http.request(url, debug=self.debug, **options)
+                if not feed.status:
+                    reason = 'empty response'
+                elif feed.status['code'] not in (b'200', b'206'):
+                    # 状态行去掉协议版本，如 `HTTP 404 Not Found`
+                    reason = 'HTTP {}'.format(feed.status['status'].split(b' ', 1)[1].decode('latin-1'))
+                elif not feed.complete:
+                    reason = 'incomplete body'
+                else:
+                    return feed, ''
+            except Exception as e:
+                reason = '{}: {}'.format(e.__class__.__name__, e)
+            finally:
+                while shown:
+                    self.manager.remove(shown.pop())
+            if feed is not None and feed.file_handle:
+                # 重试时覆盖上一次没有下载完整的文件
+                options.update(file_path=feed.file_handle.name, overwrite=True)
+        return None, reason
+
+    def work(self):
+        while True:
+            item = self.next_item()
+            if item is None:
+                return
+            url, file_path, host = item
+            try:
+                feed, reason = self.fetch(url, file_path)
+            finally:
+                with self.changed:
+                    self.running[host] -= 1
+                    self.changed.notify_all()
+            with self.lock:
+                if feed is not None:
+                    self.summary.succeeded.append((url, feed.file_handle.name, feed.received))
+                    self.summary.total_bytes += feed.received
+                else:
+                    self.summary.failures.append((url, reason))
+
+    def run(self):
+        start = time.time()
+        self.pending.extend(self.items)
+        workers = [threading.Thread(target=self.work) for _ in range(min(self.workers, len(self.items)))]
+        for i in workers:
+            i.daemon = True
+            i.start()
+        if self.items and self.manager is not None:
+            self.manager.start()
+        try:
+            for i in workers:
+                i.join()
+        finally:
+            if self.manager is not None:
+                self.manager.stop()
+        self.summary.elapsed = time.time() - start
+        return self.summary
@@ -0,0 +1,510 @@
+# coding=utf8
+"""
+    HTTP response cache with ETag/Last-Modified revalidation and LRU eviction
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import copy
+import time
+import json
+import hashlib
+import threading
+
+from collections import OrderedDict
+from email.utils import parsedate_tz, mktime_tz
+
+from ProgressedHttp import http
+from ProgressedHttp.headers import Headers
+
+__all__ = ['CacheEntry', 'MemoryCache', 'DiskCache']
+
+
+def parse_date(value):
+    """
+    :param value: bytes => HTTP 日期
+    :return: float | None
+    """
+    if not value:
+        return None
+    try:
+        parsed = parsedate_tz(value.decode('latin-1'))
+        return mktime_tz(parsed) if parsed else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def cache_control(headers):
+    """
+    :param headers: Headers
+    :return: dict => 小写的指令名 => 参数(bytes)，没有参数时为 True
+    """
+    directives = {}
+    for value in headers.get_all(b'Cache-Control'):
+        for item in value.split(b','):
+            name, sep, arg = item.strip().partition(b'=')
+            if name:
+                directives[name.lower()] = arg.strip().strip(b'"') if sep else True
+    return directives
+
+
+def lifetime(headers):
+    """
+    响应的新鲜期，按 Cache-Control: max-age、Expires 的顺序确定
+    :param headers: Headers
+    :return: float | None => 秒数，None 表示不能缓存
+    """
+    directives = cache_control(headers)
+    if b'no-store' in directives:
+        return None
+    if b'no-cache' in directives:
+        return 0
+    if directives.get(b'max-age') not in (None, True):
+        try:
+            age = int(headers.get(b'Age', b'0'))
+        except ValueError:
+            age = 0
+        try:
+            return max(int(directives[b'max-age']) - age, 0)
+        except ValueError:
+            return 0
+    if b'Expires' in headers:
+        expires = parse_date(headers.get(b'Expires'))
+        if expires is None:
+            return 0  # 无效的 Expires 表示已经过期
+        return max(expires - (parse_date(headers.get(b'Date')) or time.time()), 0)
+    return 0
+
+
+def request_header(headers, name):
+    """
+    大小写不敏感地读取请求头
+    :param headers: dict | None
+    :param name: str
+    :return: str | None
+    """
+    for k, v in (headers or {}).items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def vary_values(response_headers, request_headers):
+    """
+    :param response_headers: Headers
+    :param request_headers: dict
+    :return: dict | None => Vary 中的请求头 => 本次请求的值，Vary: * 时返回 None
+    """
+    names = []
+    for value in response_headers.get_all(b'Vary'):
+        names.extend(i.strip().lower().decode('latin-1') for i in value.split(b',') if i.strip())
+    if '*' in names:
+        return None
+    return dict((name, request_header(request_headers, name)) for name in names)
+
+
+class CacheEntry(object):
+    """
+    一个缓存的响应，实体保存在内存或磁盘中，下载到文件的响应只记录文件的大小与修改时间
+    """
+    def __init__(self, url, status, head, expires, vary=None, body=None, file_path=None):
+        """
+        :param url: str
+        :param status: dict => SockFeed.status
+        :param head: bytes => 状态行之后的原始响应头
+        :param expires: float => 过期的时间戳
+        :param vary: dict => Vary 中的请求头 => 缓存时的值
+        :param body: bytes | None => 响应实体
+        :param file_path: str => 实体所在的下载文件
+        """
+        self.url = url
+        self.status = status
+        self.head = head
+        self.expires = expires
+        self.vary = vary or {}
+        self.body = body
+        self.has_body = body is not None
+        self.body_size = len(body) if body is not None else 0
+        self.file_path = os.path.abspath(file_path) if file_path else None
+        self.file_stat = None  # (大小, 修改时间)
+        if self.file_path and os.path.exists(self.file_path):
+            stat = os.stat(self.file_path)
+            self.file_stat = (stat.st_size, stat.st_mtime)
+
+    @property
+    def headers(self):
+        return Headers(self.head)
+
+    @property
+    def size(self):
+        return len(self.head) + self.body_size
+
+    def fresh(self, now=None):
+        return (now or time.time()) < self.expires
+
+    def validators(self):
+        """
+        :return: dict => 重新验证时附加的条件请求头
+        """
+        headers = self.headers
+        validators = {}
+        if b'Etag' in headers:
+            validators['If-None-Match'] = headers[b'Etag'].decode('latin-1')
+        if b'Last-Modified' in headers:
+            validators['If-Modified-Since'] = headers[b'Last-Modified'].decode('latin-1')
+        return validators
+
+    def matches(self, headers):
+        """
+        :param headers: dict => 本次请求的请求头
+        :return: bool => Vary 中的请求头与缓存时是否一致
+        """
+        return all(request_header(headers, k) == v for k, v in self.vary.items())
+
+    def file_valid(self, file_path):
+        """
+        :param file_path: str
+        :return: bool => 本地文件是否还是缓存时下载的内容
+        """
+        if not self.file_path or self.file_path != os.path.abspath(file_path) or not os.path.exists(file_path):
+            return False
+        stat = os.stat(file_path)
+        return self.file_stat == (stat.st_size, stat.st_mtime)
+
+    def refresh(self, headers):
+        """
+        收到 304 后用新的响应头更新缓存
+        :param headers: Headers
+        :return: None
+        """
+        fields = OrderedDict()
+        for name, value in self.headers.multi_items():
+            fields.setdefault(name.lower(), []).append((name, value))
+        updated = OrderedDict()
+        for name, value in headers.multi_items():
+            if name.lower() not in (b'content-length', b'transfer-encoding', b'connection'):
+                updated.setdefault(name.lower(), []).append((name, value))
+        fields.update(updated)
+        self.head = b'\r\n'.join(name + b': ' + value for items in fields.values() for name, value in items)
+        self.expires = time.time() + (lifetime(self.headers) or 0)
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'status': dict((k, v.decode('latin-1')) for k, v in self.status.items()),
+            'head': self.head.decode('latin-1'),
+            'expires': self.expires,
+            'vary': self.vary,
+            'has_body': self.has_body,
+            'body_size': self.body_size,
+            'file_path': self.file_path,
+            'file_stat': self.file_stat
+        }
+
+    @staticmethod
+    def from_dict(data):
+        entry = CacheEntry(data['url'], dict((k, v.encode('latin-1')) for k, v in data['status'].items()),
+                           data['head'].encode('latin-1'), data['expires'], data['vary'])
+        entry.has_body = data['has_body']
+        entry.body_size = data['body_size']
+        entry.file_path = data['file_path']
+        entry.file_stat = tuple(data['file_stat']) if data['file_stat'] else None
+        return entry
+
+
+class CachedConnection(object):
+    """
+    从缓存返回响应时 SockFeed 使用的空连接
+    """
+    keep_alive = False
+    connect = None
+    timeouts = None
+
+    def close(self):
+        pass
+
+    def release(self):
+        pass
+
+
+class MemoryCache(object):
+    """
+    内存中的响应缓存，超过 max_bytes 时淘汰最久未使用的缓存项
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        :param max_bytes: int => 缓存的响应头与实体总字节数上限
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key => CacheEntry，按使用顺序排列
+        self.varies = {}  # 不含 Vary 的 key => 最近一次响应的 Vary 请求头名
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0  # 未过期，直接返回缓存
+        self.revalidated = 0  # 过期后服务端返回 304
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(method, url, vary=None):
+        """
+        :param method: str
+        :param url: str
+        :param vary: dict => Vary 中的请求头 => 值，不同的值分别缓存
+        :return: str
+        """
+        key = '{} {}'.format(method.upper(), url)
+        if vary:
+            key += ' ' + json.dumps(sorted(vary.items()))
+        return key
+
+    def variant(self, url, headers):
+        """
+        :param url: str
+        :param headers: dict => 请求头
+        :return: str => 按之前响应的 Vary 找到本次请求对应的 key
+        """
+        names = self.varies.get(self.key('GET', url))
+        if not names:
+            return self.key('GET', url)
+        return self.key('GET', url, dict((name, request_header(headers, name)) for name in names))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.entries[key] = entry
+                self.touch(key)
+            return entry
+
+    def put(self, key, entry):
+        """
+        :param key: str
+        :param entry: CacheEntry
+        :return: bool => 超过 max_bytes 的响应不会缓存
+        """
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            if entry.size > self.max_bytes:
+                if old is not None:
+                    self.drop(key)
+                return False
+            self.save(key, entry)
+            self.entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+            return True
+
+    def remove(self, key):
+        with self.lock:
+            self.discard(key)
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self.discard(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'size': self.size
+            }
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            self.drop(key)
+
+    # 以下方法在持有锁时调用，DiskCache 覆盖以读写磁盘
+    def save(self, key, entry):
+        pass
+
+    def drop(self, key):
+        pass
+
+    def touch(self, key):
+        pass
+
+    def load(self, key, entry):
+        """
+        :return: bytes
+        """
+        return entry.body
+
+    def lookup(self, url, headers, file_path=None):
+        """
+        :param url: str
+        :param headers: dict => 请求头
+        :param file_path: str => 下载文件位置
+        :return: CacheEntry | None => 可以用于本次请求的缓存项
+        """
+        entry = self.get(self.variant(url, headers))
+        if entry is None or not entry.matches(headers):
+            return None
+        if entry.has_body or (file_path and entry.file_valid(file_path)):
+            return entry
+        return None
+
+    def serve(self, entry, file_path=None, overwrite=False, hasher=None):
+        """
+        未过期的缓存直接返回，不发出请求
+        """
+        with self.lock:
+            self.hits += 1
+        return self.replay(entry, file_path, overwrite, hasher)
+
+    def update(self, url, headers, feed, entry=None, file_path=None, overwrite=False, hasher=None):
+        """
+        请求完成后更新缓存
+        :param url: str
+        :param headers: dict => 请求头
+        :param feed: SockFeed
+        :param entry: CacheEntry => 请求前找到的过期缓存
+        :param file_path: str
+        :param overwrite: bool
+        :param hasher: Digests => 304 时用于计算、校验缓存实体的摘要
+        :return: SockFeed => 304 时返回缓存的响应
+        """
+        if entry is not None and feed.status and feed.status['code'] == b'304':
+            with self.lock:
+                self.revalidated += 1
+            # 更新副本，put 才能按原来的大小扣除
+            entry = copy.copy(entry)
+            entry.refresh(feed.headers)
+            self.put(self.key('GET', url, entry.vary), entry)
+            return self.replay(entry, file_path, overwrite, hasher)
+        with self.lock:
+            self.misses += 1
+        self.store(url, headers, feed)
+        return feed
+
+    def store(self, url, headers, feed):
+        """
+        缓存完整的 200 响应，Vary 中的请求头不同的响应分别缓存
+        """
+        if not feed.status or feed.status['code'] != b'200' or not feed.complete:
+            return False
+        fresh = lifetime(feed.headers)
+        vary = vary_values(feed.headers, headers)
+        if fresh is None or vary is None:
+            self.remove(self.variant(url, headers))
+            return False
+        if not fresh and b'Etag' not in feed.headers and b'Last-Modified' not in feed.headers:
+            return False  # 马上过期又无法验证的响应没有缓存的意义
+        head = feed.raw_head[feed.raw_head.find(b'\r\n') + 2: -4]
+        with self.lock:
+            self.varies[self.key('GET', url)] = sorted(vary)
+        key = self.key('GET', url, vary)
+        if feed.file_handle:
+            entry = CacheEntry(url, dict(feed.status), head, time.time() + fresh, vary,
+                               file_path=feed.file_handle.name)
+        else:
+            entry = CacheEntry(url, dict(feed.status), head, time.time() + fresh, vary, body=feed.data)
+        return self.put(key, entry)
+
+    def replay(self, entry, file_path=None, overwrite=False, hasher=None):
+        """
+        用缓存构造响应
+        :param entry: CacheEntry
+        :param file_path: str
+        :param overwrite: bool
+        :param hasher: Digests => 与网络响应一样计算、校验实体的摘要，不匹配时抛出 DigestMismatch
+        :return: SockFeed
+        """
+        feed = http.SockFeed(CachedConnection())
+        feed.from_cache = True
+        feed.status = dict(entry.status)
+        feed.headers = entry.headers
+        feed.raw_head = entry.status['status'] + b'\r\n' + entry.head + b'\r\n\r\n'
+        feed.hasher = hasher
+        if hasher is not None and b'Content-Encoding' not in feed.headers:
+            # 缓存的是解压后的实体，压缩的响应与响应头中的摘要对不上
+            hasher.expect_headers(feed.headers)
+        if file_path and entry.file_valid(file_path):
+            # 本地文件还是最新的，不需要再写入
+            feed.file_handle = open(entry.file_path, 'rb')
+            feed.received = entry.file_stat[0]
+            if hasher is not None:
+                hasher.update_file(entry.file_path, feed.received)
+        else:
+            body = self.load(self.key('GET', entry.url, entry.vary), entry)
+            if file_path:
+                feed.open_file(file_path, overwrite)
+            feed.store(body)
+        feed.finish_loop(True)
+        return feed
+
+
+class DiskCache(MemoryCache):
+    """
+    保存在目录中的响应缓存，实体按需读取，进程重启后仍然有效
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        """
+        :param directory: str => 缓存目录
+        :param max_bytes: int
+        """
+        MemoryCache.__init__(self, max_bytes)
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.load_index()
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf8')).hexdigest() + suffix)
+
+    def load_index(self):
+        """
+        按缓存描述文件的修改时间恢复使用顺序
+        """
+        metas = [os.path.join(self.directory, i) for i in os.listdir(self.directory) if i.endswith('.json')]
+        for meta in sorted(metas, key=os.path.getmtime):
+            try:
+                with open(meta) as handle:
+                    data = json.load(handle)
+                entry = CacheEntry.from_dict(data['entry'])
+            except (IOError, OSError, ValueError, KeyError):
+                os.remove(meta)
+                continue
+            self.entries[data['key']] = entry
+            if entry.vary:
+                self.varies[self.key('GET', entry.url)] = sorted(entry.vary)
+            self.size += entry.size
+
+    def save(self, key, entry):
+        if entry.body is not None:
+            temp = self.path(key, '.body.tmp')
+            with open(temp, 'wb') as handle:
+                handle.write(entry.body)
+            os.rename(temp, self.path(key, '.body'))
+            entry.body = None  # 实体只保存在磁盘上
+        elif not entry.has_body and os.path.exists(self.path(key, '.body')):
+            os.remove(self.path(key, '.body'))
+        with open(self.path(key, '.json'), 'w') as handle:
+            json.dump({'key': key, 'entry': entry.to_dict()}, handle)
+
+    def drop(self, key):
+        for suffix in ('.json', '.body'):
+            if os.path.exists(self.path(key, suffix)):
+                os.remove(self.path(key, suffix))
+
+    def touch(self, key):
+        if os.path.exists(self.path(key, '.json')):
+            os.utime(self.path(key, '.json'), None)
+
+    def load(self, key, entry):
+        if entry.body is not None:
+            return entry.body
+        with open(self.path(key, '.body'), 'rb') as handle:
+            return handle.read()
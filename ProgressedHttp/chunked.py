@@ -0,0 +1,97 @@
+# coding=utf8
+"""
+    Incremental decoder for `Transfer-Encoding: chunked` bodies
+"""
+from __future__ import absolute_import, division, print_function
+
+import re
+
+__all__ = ['ChunkedDecoder']
+
+SIZE, DATA, DATA_END, TRAILER, DONE = range(5)
+
+CHUNK_SIZE = re.compile(b'^[0-9A-Fa-f]+$')  # chunk-size = 1*HEXDIG
+
+
+class ChunkedDecoder(object):
+    """
+    分块编码状态机，按偏移量解析每次收到的数据，分块内容不经拼接直接交给 sink
+    """
+    max_line = 65536
+
+    def __init__(self, sink):
+        """
+        :param sink: callable => sink(memoryview)，接收解码后的实体数据
+        """
+        self.sink = sink
+        self.state = SIZE
+        self.line = bytearray()  # 跨越多次接收的 分块大小行/CRLF/尾部字段行
+        self.left = 0  # 当前分块剩余字节数
+        self.received = 0  # 解码后的实体总长度
+        self.trailers = []
+        self.leftover = b''  # 分块编码结束后多出来的数据
+
+    @property
+    def done(self):
+        return self.state == DONE
+
+    def feed(self, data, end=None):
+        """
+        解析一段数据
+        :param data: bytes | bytearray
+        :param end: int => data 中有效数据的结束位置，默认为全部
+        :return: bool => 分块编码是否已经结束
+        """
+        if self.state == DONE:
+            return True
+        end = len(data) if end is None else end
+        view = memoryview(data)
+        pos = 0
+        while pos < end:
+            if self.state == DATA:
+                size = min(self.left, end - pos)
+                self.sink(view[pos: pos + size])
+                self.received += size
+                self.left -= size
+                pos += size
+                if not self.left:
+                    self.state = DATA_END
+                continue
+
+            # 其余状态都以行为单位解析
+            index = data.find(b'\n', pos, end)
+            if index < 0:
+                self.line += view[pos: end]
+                if len(self.line) > self.max_line:
+                    raise Exception("Chunk Line Too Long")
+                break
+            if self.line:
+                self.line += view[pos: index]
+                line = bytes(self.line)
+                del self.line[:]
+            else:
+                line = view[pos: index].tobytes()
+            pos = index + 1
+            self.parse_line(line.rstrip(b'\r'))
+            if self.state == DONE:
+                self.leftover = view[pos: end].tobytes()
+                return True
+        return False
+
+    def parse_line(self, line):
+        if self.state == SIZE:
+            size = line.split(b';')[0].strip()
+            if not CHUNK_SIZE.match(size):
+                # int(x, 16) 还接受 -5、+5、0x5、5_0 等不合法的写法
+                raise Exception("Invalid Chunk Size `{}`".format(line))
+            self.left = int(size, 16)
+            self.state = DATA if self.left else TRAILER
+        elif self.state == DATA_END:
+            if line:
+                raise Exception("Chunk Not Terminated By CRLF")
+            self.state = SIZE
+        elif self.state == TRAILER:
+            if line:
+                self.trailers.append(line)
+            else:
+                self.state = DONE
@@ -0,0 +1,127 @@
+# coding=utf8
+"""
+    Console entry point
+
+    progressed-http fetch manifest.txt -j 16
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import signal
+import argparse
+
+from ProgressedHttp import __version__
+from ProgressedHttp.bulk import download_many, target_path
+from ProgressedHttp.limiter import TokenBucket, HostLimiter
+
+__all__ = ['main', 'read_manifest']
+
+
+def read_manifest(path, directory=''):
+    """
+    读取下载清单，每行为 `url [保存位置]`，以 # 开头的行为注释
+    :param path: str => 清单文件，`-` 表示标准输入
+    :param directory: str => 未指定保存位置时的下载目录
+    :return: list => [(url, file_path), ...]
+    """
+    handle = sys.stdin if path == '-' else open(path)
+    try:
+        items = []
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(None, 1)
+            if len(parts) == 2:
+                items.append((parts[0], os.path.join(directory, parts[1])))
+            else:
+                items.append((parts[0], target_path(parts[0], directory)))
+        return items
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def rate(value):
+    """
+    :param value: str => 每秒字节数，可以带 K/M/G 后缀，如 500K
+    :return: int
+    """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().rstrip('B')
+    try:
+        if value and value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(float(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid rate: {}".format(value))
+
+
+def throttle(limiter):
+    """
+    运行中调整限速: SIGUSR1 减半，SIGUSR2 加倍
+    :param limiter: TokenBucket | HostLimiter
+    :return: None
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+
+    def change(factor):
+        def handler(*_):
+            limiter.set_rate(max(int(limiter.rate * factor), 1))
+        return handler
+
+    signal.signal(signal.SIGUSR1, change(0.5))
+    signal.signal(signal.SIGUSR2, change(2))
+
+
+def parser():
+    arg = argparse.ArgumentParser(prog='progressed-http', description="http download with progress")
+    arg.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__)
+    commands = arg.add_subparsers(dest='command')
+
+    fetch = commands.add_parser('fetch', help="download every url listed in a manifest")
+    fetch.add_argument('manifest', help="manifest file, one `url [path]` per line, `-` for stdin")
+    fetch.add_argument('-j', '--jobs', type=int, default=4, help="concurrent downloads")
+    fetch.add_argument('-r', '--retries', type=int, default=2, help="retries per item")
+    fetch.add_argument('--per-host', type=int, default=0, help="concurrent downloads per host, 0 for unlimited")
+    fetch.add_argument('-o', '--output', default='', help="download directory")
+    fetch.add_argument('--overwrite', action='store_true', help="overwrite existing files")
+    fetch.add_argument('--resume', action='store_true', help="resume partial downloads")
+    fetch.add_argument('--preallocate', action='store_true', help="preallocate files when the size is known")
+    fetch.add_argument('--atomic', action='store_true', help="write to a temporary file and rename it when complete")
+    fetch.add_argument('-t', '--timeout', type=float, help="connect and idle read timeout in seconds")
+    fetch.add_argument('--deadline', type=float, help="give up an item after this many seconds")
+    fetch.add_argument('--limit-rate', type=rate, help="total bandwidth limit in bytes/s, e.g. 500K or 2M; "
+                                                        "SIGUSR1 halves it and SIGUSR2 doubles it while running")
+    fetch.add_argument('--limit-per-host', action='store_true', help="apply --limit-rate to each host separately")
+    fetch.add_argument('-q', '--quiet', action='store_true', help="hide the progress line")
+    return arg
+
+
+def main(args=None):
+    arg = parser()
+    options = arg.parse_args(args)
+    if options.command != 'fetch':
+        arg.print_help()
+        return 1
+
+    if options.output and not os.path.isdir(options.output):
+        os.makedirs(options.output)
+    items = read_manifest(options.manifest, options.output)
+    limiter = None
+    if options.limit_rate:
+        limiter = (HostLimiter if options.limit_per_host else TokenBucket)(options.limit_rate)
+        throttle(limiter)
+    summary = download_many(items, workers=options.jobs, retries=options.retries, per_host=options.per_host,
+                            overwrite=options.overwrite, resume=options.resume, mute=options.quiet,
+                            connect_timeout=options.timeout, read_timeout=options.timeout,
+                            deadline=options.deadline, limiter=limiter, preallocate=options.preallocate,
+                            atomic=options.atomic)
+    print(summary.report())
+    return 1 if summary.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
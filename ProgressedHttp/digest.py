@@ -0,0 +1,173 @@
+# coding=utf8
+"""
+    Hash the body while receiving, verify expected digests and Content-MD5 / Digest headers
+"""
+from __future__ import absolute_import, division, print_function
+
+import sys
+import base64
+import hashlib
+import binascii
+
+__all__ = ['Digests', 'DigestMismatch', 'header_digests']
+
+PY2 = sys.version_info.major == 2
+
+# 十六进制摘要长度 => 算法，expected_digest 没有写明算法时按长度推断
+HEX_LENGTHS = {32: 'md5', 40: 'sha1', 56: 'sha224', 64: 'sha256', 96: 'sha384', 128: 'sha512'}
+
+
+class DigestMismatch(Exception):
+    pass
+
+
+def algorithm_name(name):
+    """
+    :param name: str | bytes => SHA-256, sha256, SHA ...
+    :return: str | None => hashlib 中的算法名，不支持时返回 None
+    """
+    if isinstance(name, bytes):
+        name = name.decode('latin-1')
+    name = name.strip().lower().replace('-', '').replace('_', '')
+    if name == 'sha':
+        name = 'sha1'  # RFC 3230 中的 SHA 是 SHA-1
+    try:
+        hashlib.new(name)
+    except ValueError:
+        return None
+    return name
+
+
+def parse_expected(expected):
+    """
+    :param expected: dict | str => {'sha256': hex} 或 'sha256:hex' 或只有 hex(按长度推断算法)
+    :return: dict => 算法 => 摘要 bytes
+    """
+    if not isinstance(expected, dict):
+        expected = expected.strip()
+        if ':' in expected:
+            name, value = expected.split(':', 1)
+        else:
+            name, value = HEX_LENGTHS.get(len(expected), ''), expected
+        expected = {name: value}
+    result = {}
+    for name, value in expected.items():
+        algorithm = algorithm_name(name)
+        if algorithm is None:
+            raise Exception("unsupported digest algorithm: {}".format(name))
+        result[algorithm] = binascii.unhexlify(value.strip())
+    return result
+
+
+def header_digests(headers):
+    """
+    从响应头中取出实体摘要: Content-MD5、Digest(RFC 3230)、Content-Digest/Repr-Digest(RFC 9530)，
+    不认识的算法被忽略
+    :param headers: Headers
+    :return: dict => 算法 => 摘要 bytes
+    """
+    result = {}
+    if b'Content-MD5' in headers:
+        result['md5'] = decode_base64(headers[b'Content-MD5'])
+    for name in (b'Digest', b'Content-Digest', b'Repr-Digest'):
+        for item in headers.get(name, b'').split(b','):
+            algorithm, _, value = item.partition(b'=')
+            algorithm = algorithm_name(algorithm) if value else None
+            if algorithm is not None:
+                result[algorithm] = decode_base64(value.strip().strip(b':'))
+    # 长度不对的摘要无法校验
+    return dict((k, v) for k, v in result.items() if v is not None and len(v) == hashlib.new(k).digest_size)
+
+
+def decode_base64(value):
+    try:
+        return base64.b64decode(value.strip())
+    except (binascii.Error, TypeError, ValueError):
+        return None
+
+
+class Digests(object):
+    """
+    随接收更新的一组哈希
+    """
+    def __init__(self, algorithms=None, expected=None):
+        """
+        :param algorithms: list => 需要计算的算法，如 ['md5', 'sha256']
+        :param expected: dict | str => 期望的摘要，见 parse_expected
+        """
+        self.expected = parse_expected(expected) if expected else {}
+        self.header_expected = {}
+        self.hashes = {}
+        for name in list(algorithms or []) + list(self.expected):
+            self.add(name)
+        self.verified = None  # 没有可以对比的摘要时为 None
+
+    def add(self, name):
+        algorithm = algorithm_name(name)
+        if algorithm is None:
+            raise Exception("unsupported digest algorithm: {}".format(name))
+        if algorithm not in self.hashes:
+            self.hashes[algorithm] = hashlib.new(algorithm)
+
+    def expect_headers(self, headers):
+        """
+        收到响应头时调用，响应头中有摘要时一并校验
+        :param headers: Headers
+        :return: None
+        """
+        self.header_expected = header_digests(headers)
+        for name in self.header_expected:
+            self.add(name)
+
+    def update(self, data):
+        if PY2 and isinstance(data, memoryview):
+            data = data.tobytes()
+        for value in self.hashes.values():
+            value.update(data)
+
+    def update_file(self, file_path, size, block=1024 * 1024):
+        """
+        续传时先计算文件中已有的部分
+        :param file_path: str
+        :param size: int
+        :param block: int
+        :return: None
+        """
+        with open(file_path, 'rb') as handle:
+            while size > 0:
+                data = handle.read(min(block, size))
+                if not data:
+                    break
+                self.update(data)
+                size -= len(data)
+
+    def hexdigests(self):
+        """
+        :return: dict => 算法 => 十六进制摘要
+        """
+        return dict((name, value.hexdigest()) for name, value in self.hashes.items())
+
+    def incomplete(self):
+        """
+        实体没有完整接收
+        :return: str => 有期望的摘要时返回失败原因，否则为空字符串
+        """
+        if not self.expected and not self.header_expected:
+            return ''
+        self.verified = False
+        return "incomplete body"
+
+    def verify(self):
+        """
+        :return: str => 不匹配的原因，全部匹配时返回空字符串
+        """
+        errors = []
+        for source, expected in (('expected', self.expected), ('header', self.header_expected)):
+            for name, value in sorted(expected.items()):
+                actual = self.hashes[name].digest()
+                if actual != value:
+                    errors.append("{} {} {} != {}".format(source, name, binascii.hexlify(value).decode(),
+                                                          binascii.hexlify(actual).decode()))
+        if self.expected or self.header_expected:
+            self.verified = not errors
+        return "; ".join(errors)
@@ -0,0 +1,63 @@
+# coding=utf8
+"""
+    Incremental gzip/deflate content decoding
+"""
+from __future__ import absolute_import, division, print_function
+
+import sys
+import zlib
+
+__all__ = ['ContentDecoder', 'ACCEPT_ENCODING']
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+PY2 = sys.version_info.major == 2
+
+
+class ContentDecoder(object):
+    """
+    按 Content-Encoding 逐段解压实体
+    """
+    def __init__(self, encoding):
+        """
+        :param encoding: bytes => gzip | deflate
+        """
+        self.encoding = encoding.lower()
+        if self.encoding in (b'gzip', b'x-gzip'):
+            self.obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self.obj = zlib.decompressobj()
+        self.started = False
+        self.head = b''  # deflate 实体开头不足 2 字节时暂存
+
+    @staticmethod
+    def create(encoding):
+        """
+        :param encoding: bytes => Content-Encoding 响应头
+        :return: ContentDecoder | None => 不需要或不支持解码时返回 None
+        """
+        if encoding and encoding.strip().lower() in (b'gzip', b'x-gzip', b'deflate'):
+            return ContentDecoder(encoding.strip())
+        return None
+
+    def decompress(self, data):
+        """
+        :param data: bytes | memoryview
+        :return: bytes
+        """
+        if PY2 and isinstance(data, memoryview):
+            data = data.tobytes()  # py2 的 zlib 不接受 memoryview
+        if not self.started and self.encoding == b'deflate':
+            # 部分服务端返回不带 zlib 头的原始 deflate 数据，收到 2 字节的 zlib 头之后才能判断
+            self.head += bytes(data)
+            if len(self.head) < 2:
+                return b''
+            data, self.head = self.head, b''
+            cmf, flg = bytearray(data[:2])
+            if cmf & 0x0f != 8 or (cmf << 8 | flg) % 31:
+                self.obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        self.started = True
+        return self.obj.decompress(data)
+
+    def flush(self):
+        return self.obj.flush()
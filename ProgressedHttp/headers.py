@@ -0,0 +1,225 @@
+# coding=utf8
+"""
+    Incremental response head parser and case-insensitive multi-dict headers
+"""
+from __future__ import absolute_import, division, print_function
+
+import sys
+
+__all__ = ['Headers', 'HeadParser']
+
+if sys.version_info.major == 3:
+    text_type = str
+else:
+    text_type = unicode
+
+
+def lower_name(name):
+    """
+    :param name: str | bytes
+    :return: bytes
+    """
+    if isinstance(name, text_type):
+        name = name.encode('latin-1')
+    return name.lower()
+
+
+class Headers(object):
+    """
+    大小写不敏感、允许重复的响应头，第一次访问时才解析
+    键为首字母大写的 bytes，与原来 dict 形式的 headers 兼容
+    只按名称查找时直接在小写的原始响应头中搜索，遍历时才完整解析
+    """
+    def __init__(self, raw=b''):
+        """
+        :param raw: bytes => 状态行之后、空行之前的响应头
+        """
+        self.raw = raw
+        self.fields = None  # [(name, value), ...] 按出现顺序
+        self.index = None  # 小写 name => [fields 中的位置, ...]
+        self.names = None  # 不重复的 name，按第一次出现的顺序
+        self.lowered = None  # 小写的原始响应头，用于不解析直接查找
+
+    def parse(self):
+        if self.fields is not None:
+            return
+        self.fields = []
+        self.index = {}
+        self.names = []
+        for line in self.raw.split(b'\r\n'):
+            if line[:1] in (b' ', b'\t') and self.fields:
+                # 已废弃的多行折叠写法，拼接到上一个值
+                name, value = self.fields[-1]
+                self.fields[-1] = (name, value + b' ' + line.strip())
+                continue
+            name, sep, value = line.partition(b':')
+            name = name.strip()
+            if not sep or not name:
+                continue
+            name = name.title()
+            key = name.lower()
+            if key not in self.index:
+                self.index[key] = []
+                self.names.append(name)
+            self.index[key].append(len(self.fields))
+            self.fields.append((name, value.strip()))
+
+    def scan(self, key):
+        """
+        在原始响应头中查找，存在多行折叠写法时返回 None
+        :param key: bytes => 小写的 name
+        :return: list | None
+        """
+        if self.lowered is None:
+            if b'\n ' in self.raw or b'\n\t' in self.raw:
+                return None
+            self.lowered = b'\r\n' + self.raw.lower()
+        needle = b'\r\n' + key + b':'
+        values = []
+        start = self.lowered.find(needle)
+        while start >= 0:
+            begin = start + len(needle)
+            end = self.lowered.find(b'\r\n', begin)
+            if end < 0:
+                end = len(self.lowered)
+            values.append(self.raw[begin - 2: end - 2].strip())  # lowered 比 raw 多开头的 \r\n
+            start = self.lowered.find(needle, end)
+        return values
+
+    def get_all(self, name):
+        """
+        :param name: str | bytes
+        :return: list => 同名响应头的全部值，例如多个 Set-Cookie
+        """
+        key = lower_name(name)
+        if self.fields is None:
+            values = self.scan(key)
+            if values is not None:
+                return values
+        self.parse()
+        return [self.fields[i][1] for i in self.index.get(key, ())]
+
+    def get(self, name, default=None):
+        values = self.get_all(name)
+        if not values:
+            return default
+        return values[0] if len(values) == 1 else b', '.join(values)
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return bool(self.get_all(name))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        self.parse()
+        return len(self.index)
+
+    def keys(self):
+        self.parse()
+        return list(self.names)
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def multi_items(self):
+        """
+        :return: list => [(name, value), ...] 包括重复的响应头
+        """
+        self.parse()
+        return list(self.fields)
+
+    def __eq__(self, other):
+        if isinstance(other, Headers):
+            return self.multi_items() == other.multi_items()
+        if isinstance(other, dict):
+            return dict((lower_name(k), v) for k, v in self.items()) == \
+                dict((lower_name(k), v) for k, v in other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return "Headers({})".format(dict(self.items()))
+
+
+class HeadParser(object):
+    """
+    增量查找响应头结束位置，每次只扫描新收到的数据
+    """
+    max_size = 65536  # 响应头最大字节数
+
+    def __init__(self, max_size=None):
+        """
+        :param max_size: int => 响应头超过该长度时抛出异常
+        """
+        if max_size is not None:
+            self.max_size = max_size
+        self.buffer = bytearray()
+        self.scanned = 0  # buffer 中已经确认不含结束标记的位置
+        self.end = -1  # 响应头(包括空行)结束位置
+
+    @property
+    def done(self):
+        return self.end >= 0
+
+    def feed(self, data):
+        """
+        :param data: bytes | memoryview
+        :return: bool => 响应头是否已接收完整
+        """
+        self.buffer += data
+        # 结束标记可能跨两次接收，从上次扫描位置往前 3 字节开始找
+        index = self.buffer.find(b'\r\n\r\n', max(self.scanned - 3, 0))
+        if (len(self.buffer) if index < 0 else index + 4) > self.max_size:
+            raise Exception("response head exceeds {} bytes".format(self.max_size))
+        if index < 0:
+            self.scanned = len(self.buffer)
+            return False
+        self.end = index + 4
+        return True
+
+    @property
+    def raw(self):
+        """
+        :return: bytes => 完整的响应头，包括结尾的空行
+        """
+        return bytes(self.buffer[:self.end])
+
+    def status(self):
+        """
+        :return: dict => {'status': 状态行, 'code': 状态码, 'version': 协议版本}
+        """
+        line = bytes(self.buffer[:self.buffer.find(b'\r\n')])
+        parts = line.split(b' ')
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/'):
+            raise Exception("malformed status line: {!r}".format(line))
+        return {
+            'status': line,
+            'code': parts[1],
+            'version': parts[0]
+        }
+
+    def headers(self):
+        """
+        :return: Headers
+        """
+        start = self.buffer.find(b'\r\n') + 2
+        return Headers(bytes(self.buffer[start: max(self.end - 4, start)]))
+
+    def leftover(self):
+        """
+        :return: bytes => 响应头之后已经收到的实体数据
+        """
+        return bytes(self.buffer[self.end:])
@@ -2,29 +2,292 @@
 from __future__ import absolute_import, division, print_function
 
 from ProgressedHttp import progress, __version__
+from ProgressedHttp.chunked import ChunkedDecoder
+from ProgressedHttp.encoding import ContentDecoder, ACCEPT_ENCODING
+from ProgressedHttp.headers import HeadParser
+from ProgressedHttp.resolver import default_resolver
+from ProgressedHttp import tls
+from ProgressedHttp.timeout import Timeouts, ConnectTimeout, ReadTimeout
+from ProgressedHttp.timing import Timings
+from ProgressedHttp.adaptive import AdaptiveSize
+from ProgressedHttp.limiter import TokenBucket
+from ProgressedHttp.output import OutputFile
+from collections import deque
 import socket
 import time
 import sys
-import ssl
 import os
 
-__all__ = ['SockFeed', 'HTTPCons', 'request', 'get', 'post']
+__all__ = ['SockFeed', 'HTTPCons', 'request', 'get', 'post', 'configure']
 
 if sys.version_info.major == 3:
-    from urllib.request import quote
+    text_type = str
 else:
-    from urllib import quote
+    text_type = unicode
+
+
+def quote(value):
+    """
+    只有 GET 带参数时才用到，urllib 在第一次调用时再导入
+    :param value: str
+    :return: str
+    """
+    if sys.version_info.major == 3:
+        from urllib.parse import quote as _quote
+    else:
+        from urllib import quote as _quote
+    return _quote(value)
 
 
 def request(href, method='GET', debug=False, **kwargs):
-    req = HTTPCons(debug)
-    req.request(href, method, kwargs.get('headers'), kwargs.get('data'))
+    headers = kwargs.get('headers')
+    resume = None
+    if kwargs.get('resume') and kwargs.get('file_path'):
+        # 断点续传
+        from ProgressedHttp.resume import ResumeState  # json 只在续传时导入
+        resume = ResumeState(kwargs['file_path'], href)
+        if resume.load():
+            headers = dict(headers or {})
+            headers.update(resume.headers())
+    # 续传的 Range 针对压缩后的数据，无法接着解压，续传时不协商压缩
+    compress = kwargs.get('compress') and not (resume and resume.offset)
+    if compress:
+        headers = dict(headers or {})
+        headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+    cache = kwargs.get('cache')
+    if method != 'GET' or resume is not None or kwargs.get('stream') or kwargs.get('skip_body'):
+        cache = None
+    cached = None
+    request_headers = headers
+    if cache is not None:
+        cached = cache.lookup(href, headers, kwargs.get('file_path'))
+        if cached is not None:
+            if cached.fresh():
+                return cache.serve(cached, kwargs.get('file_path'), kwargs.get('overwrite'), digests(kwargs))
+            # 过期的缓存附加条件请求头，304 时直接使用缓存
+            headers = dict(headers or {})
+            headers.update(cached.validators())
+
+    timeouts = Timeouts.create(kwargs)
+    timings = Timings(kwargs.get('on_timings'))
+    try:
+        req = send_request(href, method, headers, debug, kwargs, timeouts, timings)
+    except BaseException as e:
+        # 连接、发送阶段的失败同样调用 on_timings 与全局回调
+        timings.fail(e)
+        raise
     feed = SockFeed(req)
+    configure(feed, kwargs)
+    if compress:
+        feed.decode_content = True
+    if resume is not None:
+        # 续传在原文件上继续写入
+        feed.preallocate = feed.atomic = False
+        feed.open_resume(resume, kwargs.get('overwrite'))
+    if kwargs.get('on_feed'):
+        kwargs['on_feed'](feed)
+    if kwargs.get('stream'):
+        # 只接收响应头，实体由调用者通过 iter_content 等方法读取
+        feed.stream = True
+        try:
+            feed.read_head(kwargs.get('chunk', 4096))
+        except BaseException as e:
+            feed.close()
+            timings.fail(e, feed.wire)
+            raise
+        return feed
+    try:
+        feed.http_response(kwargs.get('file_path', ''), kwargs.get('skip_body'),
+                           kwargs.get('chunk', 4096), kwargs.get('overwrite'))
+    except BaseException as e:
+        feed.clean_failed_file()
+        if not feed.released:
+            feed.con.close()  # 回调在归还连接之后出错时，连接可能已经被其他线程取出
+        timings.fail(e, feed.wire)
+        raise
+    if cache is not None:
+        return cache.update(href, request_headers, feed, cached, kwargs.get('file_path'), kwargs.get('overwrite'),
+                            digests(kwargs))
+    return feed
+
+
+def send_request(href, method, headers, debug, kwargs, timeouts, timings):
+    """
+    建立或从连接池取出连接，发出请求
+    :return: HTTPCons
+    """
+    session = kwargs.get('session')
+    if session is None:
+        req = HTTPCons(debug, tls_options=tls.options(kwargs), sock_options=socket_options(kwargs))
+        req.timeouts = timeouts
+        req.timings = timings
+        req.request(href, method, headers, kwargs.get('data'))
+        return req
+    connection_options = {'tls_options': tls.options(kwargs), 'sock_options': socket_options(kwargs)}
+    req = session.connection(href, **connection_options)
+    req.timeouts = timeouts
+    req.timings = timings
+    data = kwargs.get('data')
+    position = None
+    if hasattr(data, 'seek') and hasattr(data, 'tell'):
+        try:
+            position = data.tell()
+        except (IOError, OSError, ValueError):
+            position = None  # 不可定位的文件，例如管道
+    try:
+        req.request(href, method, headers, data)
+    except socket.error:
+        if not req.reused:
+            raise
+        if req.body_started and not isinstance(data, (text_type, bytes, bytearray, memoryview)):
+            # 生成器、文件的一部分已经读出，只有可定位的文件才能回到开头重发
+            if position is None:
+                raise
+            data.seek(position)
+        # 复用的连接可能已被服务端关闭，换新连接重试一次
+        req.close()
+        req = session.connection(href, fresh=True, **connection_options)
+        req.timeouts = timeouts
+        req.timings = timings
+        req.request(href, method, headers, kwargs.get('data'))
+    return req
+
+
+def configure(feed, kwargs):
+    """
+    按请求参数设置响应的接收方式
+    :param feed: SockFeed
+    :param kwargs: dict => request 的参数
+    :return: None
+    """
     if kwargs.get("disable_progress"):
         feed.disable_progress = True
-    feed.http_response(kwargs.get('file_path', ''), kwargs.get('skip_body'),
-                       kwargs.get('chunk', 4096), kwargs.get('overwrite'))
-    return feed
+    if kwargs.get("threaded_progress"):
+        feed.threaded_progress = True
+    if kwargs.get('adaptive'):
+        feed.read_size = AdaptiveSize(kwargs.get('chunk', 4096), maximum=kwargs.get('max_chunk', 1024 * 1024))
+    if kwargs.get('limiter') is not None:
+        # 共享的 TokenBucket 或 HostLimiter
+        feed.bucket = kwargs['limiter'].bucket(feed.con.key[1])
+    elif kwargs.get('limit_rate'):
+        feed.bucket = TokenBucket(kwargs['limit_rate'])
+    feed.hasher = digests(kwargs)
+    feed.preallocate = kwargs.get('preallocate', False)
+    feed.atomic = bool(kwargs.get('atomic'))
+
+
+def digests(kwargs):
+    """
+    :param kwargs: dict => request 的参数
+    :return: Digests | None => 需要计算或校验摘要时接收过程中使用的哈希
+    """
+    if kwargs.get('hash_algorithms') or kwargs.get('expected_digest') or kwargs.get('verify_digest'):
+        # verify_digest 只校验响应头中的 Content-MD5、Digest
+        from ProgressedHttp.digest import Digests  # hashlib 只在需要校验时导入
+        return Digests(kwargs.get('hash_algorithms'), kwargs.get('expected_digest'))
+    return None
+
+
+def choose_path(file_path, overwrite=False):
+    """
+    选择下载文件位置，若文件已存在，则在前面用数字区分版本
+    :param file_path: str
+    :param overwrite: bool => 是否覆盖重名文件
+    :return: str
+    """
+    path_choice = file_path
+    if os.path.exists(file_path):
+        if overwrite:
+            os.remove(file_path)
+        else:
+            file_index = 1
+            dirname = os.path.dirname(path_choice)
+            filename = os.path.basename(path_choice)
+            while os.path.exists(path_choice):
+                path_choice = os.path.join(dirname, '{}_{}'.format(file_index, filename))
+                file_index += 1
+    return path_choice
+
+
+def parse_content_range(value):
+    """
+    :param value: bytes => Content-Range 响应头，如 b'bytes 0-99/1000'
+    :return: (int, int, int | None) | None => (起始, 结束(包含), 总长度)，无法解析时为 None
+    """
+    if not value or not value.startswith(b'bytes '):
+        return None
+    try:
+        span, total = value[6:].strip().split(b'/')
+        start, end = span.split(b'-')
+        start, end = int(start), int(end)
+        total = None if total.strip() == b'*' else int(total)
+    except ValueError:
+        return None
+    if start < 0 or end < start:
+        return None
+    return start, end, total
+
+
+def write_at(handle, data, offset):
+    """
+    在文件指定偏移处写入，不改变文件当前位置(不支持 pwrite 时退化为 seek + write)
+    :param handle: file
+    :param data: bytes | memoryview
+    :param offset: int
+    :return: None
+    """
+    if hasattr(os, 'pwrite'):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(handle.fileno(), view, offset)
+            view = view[written:]
+            offset += written
+    else:
+        handle.seek(offset)
+        handle.write(data)
+
+
+def socket_options(kwargs):
+    """
+    从请求参数中取出 socket 选项
+    :param kwargs: dict => rcvbuf: int => SO_RCVBUF 大小; nodelay: bool => 设置 TCP_NODELAY
+    :return: list => [(level, option, value), ...]
+    """
+    options = []
+    if kwargs.get('rcvbuf'):
+        options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, kwargs['rcvbuf']))
+    if kwargs.get('nodelay'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+    return options
+
+
+def body_length(data):
+    """
+    请求实体的字节数，无法预知时(生成器、不可 seek 的文件)返回 None
+    :param data: str | bytes | file | iterable
+    :return: int | None
+    """
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if isinstance(data, memoryview):
+        return data.nbytes
+    if isinstance(data, text_type):
+        return len(data.encode('utf8'))
+    if hasattr(data, 'read'):
+        try:
+            return os.fstat(data.fileno()).st_size - data.tell()
+        except (AttributeError, IOError, OSError, ValueError):
+            pass
+        try:
+            position = data.tell()
+            data.seek(0, 2)
+            end = data.tell()
+            data.seek(position)
+            return end - position
+        except (AttributeError, IOError, OSError, ValueError):
+            pass
+    return None
 
 
 def get(href, debug=False, **kwargs):
@@ -39,6 +302,7 @@ class SockFeed(object):
     """
     连接响应
     """
+    max_preallocate = 16 * 1024 * 1024  # 按 Content-Length 预分配的上限，更大的实体边接收边扩容
     def __init__(self, connection):
         """
         :param connection: HttpCons
@@ -47,152 +311,657 @@ class SockFeed(object):
         self.socket = self.con.connect
         self.status = None
         self.raw_head = b''
+        self.head = HeadParser()
         self.headers = {}
-        self.data = b''
+        self.buffer = bytearray()  # 内存中的响应实体，长度已知时预分配
+        self.buffered = 0  # buffer 中有效数据长度
         self.progressed = 0
-        self.total = 0
+        self.total = 1  # 响应头接收完整前的占位，避免响应头分多次到达时进度循环提前结束
         self.disable_progress = False
+        self.threaded_progress = False  # 在后台线程中绘制进度条
         self.chunked = False
-        self.current_chunk = b''
+        self.decoder = None
         self.chunk_recved = 0
         self.title = ''
 
         self.file_handle = None
+        self.target = None  # (file_path, overwrite) 等待响应头确认后再打开的下载文件
+        self.file_offset = None  # 按偏移写入文件时的当前位置
+        self.range = None  # (start, end) Range 请求的范围，响应需要与之一致
+        self.accept_codes = (b'200', )  # 写入文件时可以接受的状态码
+        self.drain_rejected = False  # 不可接受的响应不打开文件，实体读进内存，连接可以继续使用
+        self.resume = None  # 断点续传状态
+        self.finished = False
+        self.complete = False  # 响应实体是否完整
+        self.released = False  # 连接已经交还 HTTPCons.release
+        self.received = 0  # 已保存的实体字节数(解码后)
+        self.stream = False  # 流式读取实体
+        self.preallocated = False  # 实体按 Content-Length 预分配了缓存
+        self.decode_content = False  # 请求时协商了压缩，按 Content-Encoding 解压
+        self.content_decoder = None  # gzip/deflate 解压
+        self.wire = 0  # 实际传输的实体字节数(解压前)
+        self.pending = deque()  # 流式读取时已接收、尚未取走的实体数据
+        self.from_cache = False  # 响应来自 cache，没有发出请求
+        self.read_size = None  # AdaptiveSize，设置后按接收情况调整每次接收的大小
+        self.recv_buffer = None  # 复用的接收缓存
+        self.recv_view = None
+        self.bucket = None  # TokenBucket，设置后按令牌限制接收速度
+        self.preallocate = False  # 已知实体大小时预分配下载文件，合并写入; 'mmap' 时通过 mmap 写入
+        self.atomic = False  # 下载到临时文件，完整之后再重命名
+        self.hasher = None  # Digests，接收时计算实体的哈希
+        self.leftover = b''  # 响应结束后多读到的数据，管线化时属于同一连接上的下一个响应
+        self.timeouts = connection.timeouts if hasattr(connection, 'timeouts') else None
+        self.timings = getattr(connection, 'timings', None) or Timings()
+
+    def __enter__(self):
+        return self
 
-    def finish_loop(self):
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def digests(self):
+        """
+        :return: dict => 算法 => 十六进制摘要，没有设置 hash_algorithms 时为空
+        """
+        return self.hasher.hexdigests() if self.hasher is not None else {}
+
+    @property
+    def verified(self):
+        """
+        :return: bool | None => 摘要是否与期望值、响应头一致，没有可对比的摘要时为 None
+        """
+        return self.hasher.verified if self.hasher is not None else None
+
+    @property
+    def body(self):
+        """
+        内存中的响应实体，不产生拷贝
+        :return: memoryview
         """
-        让进度条走满，关闭TCP连接，关闭可能还打开的文件
+        return memoryview(self.buffer)[:self.buffered]
+
+    @property
+    def data(self):
+        """
+        内存中的响应实体(拷贝为 bytes)
+        :return: bytes
+        """
+        return self.body.tobytes()
+
+    def keep_alive(self):
+        """
+        响应结束后连接是否可以复用
+        :return: bool
+        """
+        if not self.con.keep_alive or not self.status:
+            return False
+        connection = self.headers.get(b'Connection', b'').lower()
+        if self.status['version'] == b'HTTP/1.0':
+            return connection == b'keep-alive'
+        return connection != b'close'
+
+    def finish_loop(self, complete=False, verify=True):
+        """
+        让进度条走满，关闭或归还TCP连接，关闭可能还打开的文件
+        :param complete: bool => 响应实体是否已完整读取
+        :param verify: bool => 是否校验摘要，调用者主动放弃响应时不校验
         :return: None
         """
         self.progressed = self.total = 100
-        self.con.close()  # 关闭tcp连接
-        if self.file_handle:
+        if self.finished:
+            return
+        self.finished = True
+        self.complete = complete
+        self.timings.finish(complete, self.wire)
+        if complete and self.content_decoder is not None:
+            left = self.content_decoder.flush()
+            if left:
+                self.store(left)
+        mismatch = ''
+        if verify and self.hasher is not None and self.status and self.status['code'] in (b'200', b'206'):
+            if complete:
+                mismatch = self.hasher.verify()
+            elif self.resume is None:
+                mismatch = self.hasher.incomplete()  # 实体不完整时同样视为校验失败，续传时保留已下载的部分
+        if mismatch:
+            # 摘要不匹配，下载的内容不可用，续传状态也一并删除
+            if self.resume is not None:
+                self.resume.remove()
+                self.resume = None
+            self.clean_failed_file()
+        if complete and not mismatch and self.keep_alive():
+            self.con.unread = self.leftover
+            self.released = True
+            self.con.release()  # 实体已读完，连接归还连接池
+        else:
+            self.con.close()  # 关闭tcp连接
+        if self.file_handle and not self.file_handle.closed:
+            if self.resume is not None:
+                if complete:
+                    self.resume.remove()
+                else:
+                    self.resume.save(self.file_offset)
+            if complete and isinstance(self.file_handle, OutputFile):
+                self.file_handle.commit()
             self.file_handle.close()
+        # 连接与文件都已清理，回调抛出异常也不会泄漏资源
+        self.timings.notify()
+        if mismatch:
+            from ProgressedHttp.digest import DigestMismatch
+            raise DigestMismatch("digest mismatch: {}".format(mismatch))
 
     def clean_failed_file(self):
         """
-        下载失败后清理、删除文件
+        下载失败后清理、删除文件，断点续传时保留已下载的部分
         :return:
         """
-        if self.file_handle:
+        if self.file_handle and not self.file_handle.closed:
             name = self.file_handle.name
             self.file_handle.close()
-            os.unlink(name)
+            if self.range is not None:
+                pass  # 分段下载共享同一个文件，由调用者统一清理
+            elif self.resume is not None and self.file_offset:
+                self.resume.save(self.file_offset)
+            elif isinstance(self.file_handle, OutputFile):
+                self.file_handle.remove()
+            else:
+                os.unlink(name)
+                if self.resume is not None:
+                    self.resume.remove()
+
+    def close(self):
+        """
+        流式读取时提前结束，未读完的连接不再复用
+        :return: None
+        """
+        if not self.finished:
+            self.clean_failed_file()
+            self.finish_loop(verify=False)
+
+    def read_head(self, chunk=4096):
+        """
+        接收直到响应头解析完成
+        :param chunk: int => 缓存块大小
+        :return: None
+        """
+        while not self.status and not self.finished:
+            data = self.take_unread() or self.recv(chunk)
+            if not data:
+                self.finish_loop()
+                break
+            self.feed(data)
+
+    def read_piece(self, chunk=65536):
+        """
+        流式读取时接收下一段实体
+        :param chunk: int => 缓存块大小
+        :return: bool => 是否还有未取走的数据
+        """
+        try:
+            while not self.pending and not self.finished:
+                data = self.recv(chunk)
+                if not data:
+                    self.finish_loop()
+                    break
+                self.feed(data)
+        except BaseException:
+            self.close()
+            raise
+        return bool(self.pending)
+
+    def recv(self, chunk):
+        """
+        接收数据，设置了超时限制时按剩余时间设置 socket 超时
+        :param chunk: int
+        :return: bytes
+        """
+        if self.bucket is not None:
+            return self.limited(self.socket.recv, chunk)
+        if self.timeouts is None:
+            return self.socket.recv(chunk)
+        data = self.wait(self.socket.recv, chunk)
+        self.timeouts.update(len(data))
+        return data
+
+    def recv_into(self, view):
+        """
+        :param view: memoryview
+        :return: int
+        """
+        if self.bucket is not None:
+            return self.limited(self.socket.recv_into, view)
+        if self.timeouts is None:
+            return self.socket.recv_into(view)
+        received = self.wait(self.socket.recv_into, view)
+        self.timeouts.update(received)
+        return received
+
+    def limited(self, method, target):
+        """
+        先从令牌桶预留，再最多接收预留的字节数，没有读取的数据留在内核缓存里由 TCP 流控限制对方发送
+        :param method: socket.recv | socket.recv_into
+        :param target: int | memoryview
+        :return: bytes | int
+        """
+        wanted = target if isinstance(target, int) else len(target)
+        granted = self.bucket.reserve(wanted)
+        if granted < wanted and not isinstance(target, int):
+            target = target[:granted]
+        elif granted < wanted:
+            target = granted
+        if self.timeouts is None:
+            result = method(target)
+        else:
+            result = self.wait(method, target)
+        received = result if isinstance(result, int) else len(result)
+        if self.timeouts is not None:
+            self.timeouts.update(received)
+        if received < granted:
+            self.bucket.refund(granted - received)
+        return result
+
+    def wait(self, method, *args):
+        while True:
+            self.socket.settimeout(self.timeouts.timeout())
+            try:
+                return method(*args)
+            except socket.timeout:
+                # 抛出具体的超时原因，速度统计窗口到期时继续等待
+                self.timeouts.expired()
+
+    def iter_content(self, chunk_size=65536):
+        """
+        逐段读取解码后的实体，每段不超过 chunk_size
+        :param chunk_size: int
+        :return: generator => bytes
+        """
+        while self.read_piece(chunk_size):
+            piece = self.pending.popleft()
+            if len(piece) > chunk_size:
+                view = memoryview(piece)
+                self.pending.appendleft(view[chunk_size:])
+                piece = view[:chunk_size]
+            yield piece if isinstance(piece, bytes) else piece.tobytes()
+
+    def iter_lines(self, chunk_size=65536, delimiter=b'\n'):
+        """
+        逐行读取实体，不包含行尾分隔符
+        :param chunk_size: int
+        :param delimiter: bytes
+        :return: generator => bytes
+        """
+        left = bytearray()
+        scan = 0  # left 中已经确认没有分隔符的位置
+        for piece in self.iter_content(chunk_size):
+            left += piece
+            start = 0
+            index = left.find(delimiter, scan)
+            while index >= 0:
+                yield bytes(left[start: index])
+                start = index + len(delimiter)
+                index = left.find(delimiter, start)
+            del left[:start]
+            scan = max(len(left) - len(delimiter) + 1, 0)
+        if left:
+            yield bytes(left)
+
+    def readinto(self, buf):
+        """
+        读取实体到 buf 中
+        :param buf: bytearray | memoryview
+        :return: int => 读取的字节数，0 表示实体已读完
+        """
+        view = memoryview(buf)
+        size = 0
+        while size < len(view) and (self.pending or not size) and self.read_piece(len(view)):
+            piece = self.pending.popleft()
+            count = min(len(piece), len(view) - size)
+            view[size: size + count] = piece[:count]
+            if count < len(piece):
+                self.pending.appendleft(memoryview(piece)[count:])
+            size += count
+        return size
+
+    def read(self, size=-1):
+        """
+        :param size: int => 最多读取的字节数，-1 表示读完
+        :return: bytes
+        """
+        if size < 0:
+            return b''.join(self.iter_content())
+        buf = bytearray(size)
+        return bytes(buf[:self.readinto(buf)])
 
     def save_data(self, data):
         """
-        将每次获取的HTTP实体保存进内存或文件
+        将每次获取的HTTP实体解压后保存
         :param data:
         :return:
         """
-        if self.file_handle:
-            self.file_handle.write(data)
+        self.wire += len(data)
+        if self.content_decoder is not None:
+            data = self.content_decoder.decompress(data)
+            if not data:
+                return
+        self.store(data)
+
+    def store(self, data):
+        """
+        将解码后的HTTP实体保存进内存或文件
+        :param data:
+        :return:
+        """
+        self.received += len(data)
+        if self.hasher is not None:
+            self.hasher.update(data)
+        if self.stream:
+            self.pending.append(data)
+        elif self.file_handle:
+            if self.file_offset is None:
+                self.file_handle.write(data)
+            else:
+                write_at(self.file_handle, data, self.file_offset)
+                self.file_offset += len(data)
+        elif self.buffered + len(data) <= len(self.buffer):
+            # 写入预分配的缓存
+            self.buffer[self.buffered: self.buffered + len(data)] = data
+            self.buffered += len(data)
         else:
-            self.data += data
-
-    def flush_chunk(self, data):
-        self.current_chunk += data
-
-        while len(self.current_chunk) > 10240 or self.current_chunk.endswith(b'0\r\n\r\n'):  # 并不意味着所有分块结束
-            # 开始解析当前chunk cache
-            chunk_head = self.current_chunk[: self.current_chunk.index(b'\r\n')]
-            chunk_left = self.current_chunk[self.current_chunk.index(b'\r\n') + 2:]
-            chunk_size = int(chunk_head, 16)
-            if chunk_size == 0:
-                self.finish_loop()  # 一定要用finish_loop结束请求，否则会出现未关闭的文件 !
-                return True
-            if chunk_size > len(chunk_left):
-                # 说明当前分块没有接收完全
-                return False
-            valid_data = chunk_left[: chunk_size]
-            self.chunk_recved += len(valid_data)
-            self.save_data(valid_data)
-            self.current_chunk = chunk_left[chunk_size:]
-            if self.current_chunk.startswith(b'\r\n'):
-                # 如果上一个分块没有吃掉最后的 \r\n，则在这里把它剔除
-                self.current_chunk = self.current_chunk[2:]
+            del self.buffer[self.buffered:]
+            self.buffer += data
+            self.buffered = len(self.buffer)
+
+    def save_chunk(self, data):
+        """
+        保存解码后的分块内容
+        :param data: memoryview
+        :return: None
+        """
+        self.chunk_recved += len(data)
+        self.save_data(data)
+
+    def flush_chunk(self, data, end=None):
+        """
+        解析分块编码数据，分块全部结束后结束请求
+        :param data: bytes | bytearray
+        :param end: int => data 中有效数据的结束位置
+        :return: bool
+        """
+        if self.decoder.feed(data, end):
+            self.leftover = self.decoder.leftover
+            self.finish_loop(True)  # 一定要用finish_loop结束请求，否则会出现未关闭的文件 !
+            return True
+        return False
 
     @progress.bar()
-    def http_response(self, file_path='', skip_body=False, chunk=4096, overwrite=False):
+    def http_response(self, file_path='', skip_body=False, chunk=4096, overwrite=False, hash_algorithms=None,
+                      expected_digest=None):
         """
         通过进度条控制获取响应结果
         :param file_path: str => 下载文件位置，若文件已存在，则在前面用数字区分版本
         :param skip_body: bool => 是否跳过http实体
         :param chunk: int => 缓存块大小
         :param overwrite: bool => 是否覆盖重名文件
+        :param hash_algorithms: list => 接收时计算的哈希，如 ['md5', 'sha256']，结果见 digests
+        :param expected_digest: dict | str => 期望的摘要，如 'sha256:...'，不匹配时删除文件并抛出 DigestMismatch
         :return:
         """
-        if file_path and not self.file_handle:
-            path_choice = file_path
-            if os.path.exists(file_path):
-                if overwrite:
-                    os.remove(file_path)
-                else:
-                    file_index = 1
-                    dirname = os.path.dirname(path_choice)
-                    filename = os.path.basename(path_choice)
-                    while os.path.exists(path_choice):
-                        path_choice = os.path.join(dirname, '{}_{}'.format(file_index, filename))
-                        file_index += 1
-
-            self.file_handle = open(path_choice, 'wb')
-            self.title = os.path.basename(path_choice)
+        if self.hasher is None and (hash_algorithms or expected_digest):
+            from ProgressedHttp.digest import Digests
+            self.hasher = Digests(hash_algorithms, expected_digest)
+        if file_path and not self.file_handle and self.target is None:
+            # 收到可以接受的响应头之后才打开文件，避免覆盖或创建无用的文件
+            self.target = (file_path, overwrite)
+            self.title = os.path.basename(file_path)
 
         if self.status and self.progressed == self.total:
-            self.finish_loop()
+            self.finish_loop(True)
             return True
 
-        data = self.socket.recv(chunk)
+        if not self.status:
+            data = self.take_unread()
+            if data:
+                return self.feed(data, skip_body)
+
+        if self.read_size is not None:
+            chunk = self.read_size.size
+
+        if self.preallocated and not self.finished:
+            # 实体直接接收进预分配的缓存，避免每次 recv 产生新的 bytes
+            if self.buffered + chunk > len(self.buffer) and len(self.buffer) < self.total:
+                # 超过预分配上限的实体按倍数扩容
+                size = min(self.total, max(self.buffered + chunk, 2 * len(self.buffer)))
+                self.buffer += bytearray(size - len(self.buffer))
+            received = self.recv_into(memoryview(self.buffer)[self.buffered: self.buffered + chunk])
+            if self.read_size is not None:
+                self.read_size.update(received)
+            if not received:
+                self.finish_loop()
+                return True
+            if self.hasher is not None:
+                self.hasher.update(memoryview(self.buffer)[self.buffered: self.buffered + received])
+            self.buffered += received
+            self.received += received
+            self.wire += received
+            self.progressed += received
+            if self.progressed == self.total:
+                self.finish_loop(True)
+            return
+
+        if self.read_size is not None:
+            # 接收进复用的缓存，下游只拿到缓存的切片
+            if self.recv_buffer is None or len(self.recv_buffer) < chunk:
+                # 随接收大小增长，小响应不需要分配完整的上限
+                self.recv_buffer = bytearray(chunk)
+                self.recv_view = memoryview(self.recv_buffer)
+            received = self.recv_into(self.recv_view[:chunk])
+            self.read_size.update(received)
+            if not received:
+                self.finish_loop()
+                return True
+            return self.feed(self.recv_buffer, skip_body, received)
+
+        data = self.recv(chunk)
 
         if not data:
             self.finish_loop()
             return True
+        return self.feed(data, skip_body)
+
+    def open_file(self, file_path, overwrite=False):
+        """
+        打开下载文件，若文件已存在，则在前面用数字区分版本
+        :param file_path: str
+        :param overwrite: bool => 是否覆盖重名文件
+        :return: None
+        """
+        if self.atomic and overwrite:
+            path_choice = file_path  # 完整之后才由临时文件替换，失败时原文件保持不变
+        else:
+            path_choice = choose_path(file_path, overwrite)
+        if self.preallocate or self.atomic:
+            self.file_handle = OutputFile(path_choice, self.atomic, self.preallocate == 'mmap')
+        else:
+            self.file_handle = open(path_choice, 'wb')
+        self.title = os.path.basename(path_choice)
+
+    def open_range(self, file_path, offset, end=None):
+        """
+        打开已存在的文件，响应实体从 offset 处开始写入，用于 Range 请求
+        :param file_path: str
+        :param offset: int
+        :param end: int => 请求范围的结束位置(包含)，None 表示到文件末尾
+        :return: None
+        """
+        self.file_handle = open(file_path, 'r+b')
+        self.file_offset = offset
+        self.range = (offset, end)
+        self.accept_codes = (b'206', )
+        self.title = os.path.basename(file_path)
+
+    def open_resume(self, resume, overwrite=False):
+        """
+        打开断点续传的文件，有可续传的部分时从末尾继续写入
+        :param resume: ResumeState
+        :param overwrite: bool => 没有可续传的部分时，是否覆盖重名文件
+        :return: None
+        """
+        self.resume = resume
+        if resume.offset:
+            self.file_handle = open(resume.file_path, 'r+b')
+        else:
+            # 与普通下载一样，收到可以接受的响应头之后才打开文件
+            self.target = (resume.file_path, overwrite)
+        self.title = os.path.basename(resume.file_path)
+        self.file_offset = resume.offset
+        self.accept_codes = (b'200', b'206')
+
+    def check_range(self):
+        """
+        206 响应的 Content-Range 需要从请求的位置开始并覆盖请求的长度，否则写入的位置是错的
+        :return: bool => 是否继续接收
+        """
+        start, end = self.range
+        parsed = parse_content_range(self.headers.get(b'Content-Range'))
+        if parsed is None or parsed[0] != start or (end is not None and parsed[1] != end):
+            self.clean_failed_file()
+            self.finish_loop()
+            return False
+        return True
+
+    def check_resume(self):
+        """
+        根据响应状态决定续传还是从头开始
+        :return: bool => 是否继续接收
+        """
+        self.resume.file_path = self.file_handle.name  # 从头下载时可能换成了另一个文件名
+        self.resume.update(self.headers)
+        if self.status['code'] == b'206':
+            content_range = self.headers.get(b'Content-Range', b'')
+            if not content_range.startswith('bytes {}-'.format(self.file_offset).encode()):
+                self.clean_failed_file()
+                self.finish_loop()
+                return False
+        elif self.file_offset:
+            # 服务端返回了完整实体(文件已变化)，从头开始
+            self.file_handle.truncate(0)
+            self.file_offset = 0
+        if self.hasher is not None and self.file_offset:
+            self.hasher.update_file(self.file_handle.name, self.file_offset)
+        self.resume.save(self.file_offset)
+        return True
+
+    def split_body(self, data):
+        """
+        超出 Content-Length 的数据不属于本次响应，留给同一连接上的下一个响应
+        :param data: bytes | memoryview
+        :return: bytes | memoryview => 属于本次响应的部分
+        """
+        remaining = self.total - self.progressed
+        if len(data) <= remaining:
+            return data
+        self.leftover = memoryview(data)[remaining:].tobytes()
+        return data[:remaining]
+
+    def take_unread(self):
+        """
+        管线化时上一个响应多读到的数据
+        :return: bytes
+        """
+        data = getattr(self.con, 'unread', b'')
+        if data:
+            self.con.unread = b''
+        return data
+
+    def feed(self, data, skip_body=False, end=None):
+        """
+        处理一次接收到的数据，与数据的来源(socket, asyncio stream)无关
+        :param data: bytes | bytearray
+        :param skip_body: bool => 是否跳过http实体
+        :param end: int => data 中有效数据的结束位置，data 为复用的缓存时使用
+        :return:
+        """
+        if end is not None and not (self.status and self.chunked):
+            data = memoryview(data)[:end]
         if not self.status:
-            self.raw_head += data
-            if b'\r\n\r\n' in self.raw_head:  # 接收数据直到 `\r\n\r\n` 为止
-                seps = self.raw_head[0: self.raw_head.index(b'\r\n\r\n')].split(b'\r\n')
-                status = seps[0].split(b' ')
-                self.status = {
-                    'status': seps[0],
-                    'code': status[1],
-                    'version': status[0]
-                }
-                if self.file_handle and not self.status['code'] == b'200':
+            if self.timings.first_byte is None:
+                self.timings.mark('first_byte')
+            if self.head.feed(data):  # 接收数据直到 `\r\n\r\n` 为止
+                self.timings.mark('head_received')
+                self.raw_head = self.head.raw
+                self.timings.head_size = len(self.raw_head)
+                self.status = self.head.status()
+                self.headers = self.head.headers()
+                if self.timeouts is not None:
+                    self.timeouts.start_body(len(self.head.leftover()))
+                if self.decode_content:
+                    self.content_decoder = ContentDecoder.create(self.headers.get(b'Content-Encoding'))
+                if self.hasher is not None and self.status['code'] == b'200' and self.content_decoder is None:
+                    # 响应头中的摘要针对完整的、未解压的实体
+                    self.hasher.expect_headers(self.headers)
+                if self.target is not None and not self.file_handle and self.status['code'] in self.accept_codes:
+                    self.open_file(*self.target)
+                if (self.file_handle or self.target is not None) and self.status['code'] not in self.accept_codes \
+                        and not (self.drain_rejected and self.file_handle is None):
                     self.clean_failed_file()
                     self.finish_loop()
                     return False
-                self.headers = {
-                    i.split(b":")[0].title(): i.split(b":")[1].strip() for i in seps[1:]
-                }
+                if self.resume is not None and not self.check_resume():
+                    return False
+                if self.range is not None and not self.check_range():
+                    return False
                 # print("\n".join(["{} => {}".format(str(k), str(self.headers[k])) for k in self.headers]))
                 if skip_body:
-                    self.finish_loop()
+                    self.finish_loop(verify=False)
+                    return True
+                if self.status['code'] in (b'204', b'304'):
+                    # 没有实体的响应
+                    self.leftover = self.head.leftover()
+                    self.finish_loop(True)
                     return True
 
                 if b'Content-Length' in self.headers:
                     self.total = int(self.headers[b'Content-Length'])
+                    if not self.total:
+                        self.leftover = self.head.leftover()
+                        self.finish_loop(True)
+                        return True
+                    if not self.file_handle and not self.stream and self.content_decoder is None:
+                        # Content-Length 来自服务端，不能直接按它分配内存
+                        self.buffer = bytearray(min(self.total, self.max_preallocate))
+                        self.preallocated = True
+                    elif self.preallocate and self.content_decoder is None and isinstance(self.file_handle, OutputFile):
+                        self.file_handle.allocate(self.total)
                 else:
                     self.total = 100
                     self.chunked = True
+                    self.decoder = ChunkedDecoder(self.save_chunk)
 
-                left = self.raw_head[self.raw_head.index(b"\r\n\r\n") + 4:]
+                left = self.head.leftover()
+                self.head = None
 
                 if left:
                     if not self.chunked:
+                        left = self.split_body(left)
                         self.save_data(left)
                         self.progressed += len(left)
+                        if self.progressed == self.total:
+                            self.finish_loop(True)
                     else:
 
                         self.flush_chunk(left)  # 实体部分以分块大小十六进制数字开头
 
         else:
             if not self.chunked:
+                if self.progressed + len(data) > self.total:
+                    data = self.split_body(data)
                 self.save_data(data)
                 self.progressed += len(data)
                 if self.progressed == self.total:
-                    self.finish_loop()
+                    self.finish_loop(True)
             else:
-                self.flush_chunk(data)
+                self.flush_chunk(data, end)
 
 
 class HTTPCons(object):
@@ -201,10 +970,35 @@ class HTTPCons(object):
     """
     user_agent = "ProgressedAgent {version} by hellflame".format(version=__version__)
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, pool=None, resolver=None, tls_options=None, sock_options=None):
+        """
+        :param debug: bool
+        :param pool: ConnectionPool => 连接所属的连接池，设置后使用 keep-alive 连接
+        :param resolver: Resolver => DNS 缓存，默认使用进程内共享的缓存
+        :param tls_options: dict => SSLContext 配置，verify | cafile | certfile | keyfile
+        :param sock_options: list => [(level, option, value), ...] 连接前设置的 socket 选项
+        """
         self.is_debug = debug
+        self.resolver = resolver or default_resolver
+        self.tls_options = tls_options or {}
+        self.context = None
+        self.tls_address = None  # 握手成功的 (host, port)，用于保存 TLS 会话
+        self.resumed = False  # 本次连接是否复用了 TLS 会话
+        self.timeouts = None  # 当前请求的超时限制
+        self.timings = None  # 当前请求的各阶段耗时
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        for option in sock_options or ():
+            # SO_RCVBUF 需要在连接之前设置才会影响 TCP 窗口
+            self.s.setsockopt(*option)
         self.connect = None
+        self.pool = pool
+        self.keep_alive = pool is not None
+        self.key = None  # (scheme, host, port) + variant
+        self.variant = ()  # 连接配置与会话默认不同时，用于在连接池中区分
+        self.reused = False
+        self.in_flight = 0  # 已发出、响应还没有读完的请求数
+        self.unread = b''  # 已接收、还没有交给响应解析的数据
+        self.body_started = False  # 流式实体是否已经开始读取、发送
 
     def __del__(self):
         self.close()
@@ -214,11 +1008,30 @@ class HTTPCons(object):
         需要请求接收完成之后手动关闭
         :return: None
         """
-        if self.connect is self.s:
+        if self.connect is not None and self.connect is not self.s:
+            self.save_session()
             self.connect.close()
+        self.s.close()
+        self.in_flight = 0
+        self.unread = b''
+
+    def release(self):
+        """
+        响应接收完成后归还连接池，没有连接池则直接关闭；管线化时等所有响应都读完
+        :return: None
+        """
+        self.in_flight -= 1
+        if self.in_flight > 0:
+            return
+        if self.unread:
+            # 没有等待中的请求却多出了数据，连接不能再复用
+            self.close()
+            return
+        if self.pool is not None:
+            self.save_session()
+            self.pool.put(self)
         else:
-            self.connect.close()
-            self.s.close()
+            self.close()
 
     def https_init(self, host, port):
         """
@@ -227,13 +1040,38 @@ class HTTPCons(object):
         :param port: int
         :return: None
         """
-        context = ssl.create_default_context()
-        context.check_hostname = True
-        context.verify_mode = ssl.CERT_REQUIRED
-        context.load_default_certs()
-        self.connect = context.wrap_socket(self.s, server_hostname=host)
-        # self.connect.settimeout(65)
-        self.connect.connect((host, port))
+        self.context = tls.context(**self.tls_options)
+        session = tls.default_sessions.get(self.context, host, port) if tls.SUPPORT_SESSION else None
+        # 连接建立后再单独握手，分开记录 TCP 连接与 TLS 握手的耗时
+        if session is not None:
+            self.connect = self.context.wrap_socket(self.s, server_hostname=host, session=session,
+                                                    do_handshake_on_connect=False)
+        else:
+            self.connect = self.context.wrap_socket(self.s, server_hostname=host, do_handshake_on_connect=False)
+        self.connect_to(host, port)
+        try:
+            self.connect.do_handshake()
+        except socket.timeout:
+            raise ConnectTimeout("TLS handshake with {}:{} timed out".format(host, port))
+        self.timings.mark('handshaked')
+        if self.timeouts is not None:
+            self.timeouts.update(0)
+        self.tls_address = (host, port)
+        self.resumed = bool(getattr(self.connect, 'session_reused', False))
+        self.save_session()
+
+    def save_session(self):
+        """
+        保存 TLS 会话供之后的连接复用，TLS 1.3 的会话票据在读取响应后才会到达，所以关闭前再保存一次
+        :return: None
+        """
+        if not tls.SUPPORT_SESSION or self.tls_address is None:
+            return
+        try:
+            session = self.connect.session
+        except (socket.error, ValueError, AttributeError):
+            return
+        tls.default_sessions.put(self.context, self.tls_address[0], self.tls_address[1], session)
 
     def http_init(self, host, port):
         """
@@ -243,8 +1081,30 @@ class HTTPCons(object):
         :return: None
         """
         self.connect = self.s
-        # self.connect.settimeout(60)
-        self.connect.connect((host, port))
+        self.connect_to(host, port)
+
+    def connect_to(self, host, port):
+        """
+        通过 DNS 缓存解析后建立连接
+        :param host: str
+        :param port: int
+        :return: None
+        """
+        address = self.resolver.resolve(host, port)[0]
+        self.timings.mark('resolved')
+        if self.timeouts is not None:
+            self.connect.settimeout(self.timeouts.connect_timeout())
+        try:
+            self.connect.connect(address)
+        except socket.timeout:
+            raise ConnectTimeout("connect to {}:{} timed out".format(host, port))
+        except socket.error:
+            # 缓存的地址可能已经失效
+            self.resolver.invalidate(host, port)
+            raise
+        self.timings.mark('connected')
+        if self.timeouts is not None:
+            self.timeouts.update(0)  # 读写空闲超时从连接建立之后开始计算
 
     @staticmethod
     def url_parser(url):
@@ -294,7 +1154,7 @@ class HTTPCons(object):
         return parse
 
     @staticmethod
-    def http_parser(host, href, method, headers, data):
+    def http_parser(host, href, method, headers, data, keep_alive=False):
         method = method.upper()
         if method == 'GET':
             if data:
@@ -308,16 +1168,17 @@ class HTTPCons(object):
                     raise Exception("Failed to unpack url")
 
         user_agent = HTTPCons.user_agent
+        connection = 'keep-alive' if keep_alive else 'close'
         if not headers:
             headers = {
                 'Host': host,
                 'User-Agent': user_agent,
-                'Connection': 'close'
+                'Connection': connection
             }
         else:
             headers.update({'Host': host,
                             'User-Agent': headers.get("User-Agent", user_agent),
-                            'Connection': 'close'})
+                            'Connection': connection})
 
         try:
             head = "\r\n".join(["{}: {}".format(k, v) for k, v in headers.items()])
@@ -326,15 +1187,21 @@ class HTTPCons(object):
         except Exception:
             raise Exception("Failed to unpack headers")
 
+        length = 0
         if method == 'POST' and data:
-            head += "\r\nContent-Length: {}".format(len(data))
+            length = body_length(data)
+            if length is None:
+                head += "\r\nTransfer-Encoding: chunked"
+            else:
+                head += "\r\nContent-Length: {}".format(length)
         elif method not in ('POST', 'GET'):
             raise Exception("Method Not Implement `{}`".format(method))
 
         return {
             'request': "{method} {href} HTTP/1.1".format(method=method, href=href),
             'headers': head,
-            'entity': data or ''
+            'entity': data if method == 'POST' and data else '',
+            'length': length
         }
 
     def request(self, url, method='GET', headers=None, data=None):
@@ -343,30 +1210,136 @@ class HTTPCons(object):
         :param url: str
         :param method: str => GET | POST
         :param headers: dict
-        :param data: str => post data entity
+        :param data: str | bytes | file | iterable => post data entity
         :return: None
         """
         # 解析 URL
         parse = self.url_parser(url)
 
-        # 初始化连接
-        getattr(self, 'https_init' if parse['scheme'] == 'https' else 'http_init')(parse['host'], parse['port'])
+        # 初始化连接，连接池中取出的连接已经建立
+        self.key = (parse['scheme'], parse['host'], parse['port']) + self.variant
+        if self.timings is None:
+            self.timings = Timings()
+        self.timings.url = url
+        self.timings.reused = self.connect is not None
+        if self.connect is None:
+            getattr(self, 'https_init' if parse['scheme'] == 'https' else 'http_init')(parse['host'], parse['port'])
 
         # 解析 HTTP 请求
-        parse = self.http_parser(parse['host'], parse['href'], method, headers, data)
+        self.body_started = False
+        parse = self.http_parser(parse['host'], parse['href'], method, headers, data, self.keep_alive)
 
-        # 拼接请求
-        send = "{0[request]}\r\n{0[headers]}\r\n\r\n{0[entity]}".format(parse)
+        # 拼接请求头，实体单独发送
+        send = "{0[request]}\r\n{0[headers]}\r\n\r\n".format(parse)
 
         if self.is_debug:
             print("\033[01;33mRequest:\033[00m @{}".format(time.time()))
-            print(send.__repr__().strip("'"))
+            if self.tls_address is not None:
+                print("TLS session resumed: {}".format(self.resumed))
+            if isinstance(parse['entity'], (text_type, bytes)):
+                entity = parse['entity']
+                if not isinstance(entity, text_type):
+                    entity = entity.decode('latin-1')  # 保留原始字节，非 ASCII 部分由 repr 转义
+                print((send + entity).__repr__().strip("'"))
+            else:
+                print(send.__repr__().strip("'") + "<{}>".format(type(parse['entity']).__name__))
 
-        # 发送请求
-        self.connect.sendall(send.encode())
+        # 发送请求，连接池中的连接可能保留了上一次请求的超时设置
+        self.connect.settimeout(None if self.timeouts is None else self.timeouts.send_timeout())
+        try:
+            self.send(send.encode(), parse['entity'], parse['length'])
+        except socket.timeout:
+            self.timeouts.check()
+            raise ReadTimeout("sending request timed out after {}s".format(self.timeouts.read))
+        self.in_flight += 1
+        self.timings.mark('sent')
+        self.timings.request_size = len(send)
+        self.timings.resumed = self.resumed
 
         return self.connect
 
+    def send(self, head, entity, length):
+        """
+        发送请求头与实体，文件与生成器不会整个读进内存
+        :param head: bytes => 请求行与请求头
+        :param entity: str | bytes | file | iterable
+        :param length: int | None => 实体长度，None 表示使用分块编码
+        :return: None
+        """
+        if isinstance(entity, text_type):
+            entity = entity.encode('utf8')
+        if isinstance(entity, (bytes, bytearray, memoryview)):
+            if length <= 65536:
+                # 小实体与请求头一起发送，避免多一个小包
+                self.sendall(head + bytes(entity))
+            else:
+                self.sendall(head)
+                self.sendall(entity)
+            return
+
+        self.sendall(head)
+        self.body_started = True
+        if length is None:
+            if hasattr(entity, 'read'):
+                handle = entity
+                entity = iter(lambda: handle.read(65536), b'')
+            self.send_chunked(entity)
+        elif length:
+            self.send_file(entity, length)
+
+    def send_file(self, handle, length):
+        """
+        :param handle: file
+        :param length: int
+        :return: None
+        """
+        try:
+            handle.fileno()
+            zero_copy = hasattr(self.connect, 'sendfile')
+        except (AttributeError, IOError, OSError, ValueError):
+            zero_copy = False
+        if zero_copy:
+            # 普通 HTTP 连接上使用 os.sendfile，HTTPS 连接会自动退化为 send
+            # socket 超时作用于每次等待可写，相当于空闲超时
+            self.connect.sendfile(handle, handle.tell(), length)
+            if self.timeouts is not None:
+                self.timeouts.update(length)
+            return
+        while length > 0:
+            piece = handle.read(min(length, 65536))
+            if not piece:
+                break
+            self.sendall(piece)
+            length -= len(piece)
+
+    def send_chunked(self, pieces):
+        """
+        :param pieces: iterable => str | bytes
+        :return: None
+        """
+        for piece in pieces:
+            if isinstance(piece, text_type):
+                piece = piece.encode('utf8')
+            if piece:
+                self.sendall(b''.join((('%x\r\n' % len(piece)).encode(), piece, b'\r\n')))
+        self.sendall(b'0\r\n\r\n')
+
+    def sendall(self, data):
+        """
+        有超时限制时分块发送，sendall 的超时是整次发送的总时长，分块后才是空闲超时
+        :param data: bytes | bytearray | memoryview
+        :return: None
+        """
+        if self.timeouts is None:
+            self.connect.sendall(data)
+            return
+        view = memoryview(data)
+        for offset in range(0, len(view), 65536):
+            piece = view[offset: offset + 65536]
+            self.connect.settimeout(self.timeouts.send_timeout())
+            self.connect.sendall(piece)
+            self.timeouts.update(len(piece))
+
 
 
 
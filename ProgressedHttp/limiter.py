@@ -0,0 +1,124 @@
+# coding=utf8
+"""
+    Token-bucket bandwidth limiting, per request, shared or per host
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+import threading
+
+__all__ = ['TokenBucket', 'HostLimiter']
+
+clock = getattr(time, 'monotonic', time.time)
+
+
+class TokenBucket(object):
+    """
+    令牌桶限速，每接收一个字节消耗一个令牌，多个请求共用同一个桶时共享带宽
+    """
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: int => 每秒字节数，0 或 None 表示不限速
+        :param burst: int => 桶容量，默认为 0.1 秒的流量且不小于 4KB
+        """
+        self.condition = threading.Condition(threading.Lock())
+        self.rate = 0
+        self.burst = 0
+        self.tokens = 0
+        self.updated = clock()
+        self.set_rate(rate, burst)
+
+    def bucket(self, host):
+        """
+        :param host: str
+        :return: TokenBucket => 所有主机共用这一个桶
+        """
+        return self
+
+    def set_rate(self, rate, burst=None):
+        """
+        运行中调整速度，正在等待的请求会按新的速度重新计算
+        :param rate: int
+        :param burst: int
+        :return: None
+        """
+        with self.condition:
+            self.refill()
+            limited = self.rate
+            self.rate = rate or 0
+            self.burst = burst or max(int(self.rate * 0.1), 4096)
+            # 从不限速切换过来时桶是满的
+            self.tokens = min(self.tokens, self.burst) if limited else self.burst
+            self.condition.notify_all()
+
+    def refill(self):
+        now = clock()
+        if self.rate:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.burst)
+        self.updated = now
+
+    def reserve(self, amount):
+        """
+        接收之前预留令牌，令牌不足时等待
+        :param amount: int => 希望接收的字节数
+        :return: int => 允许接收的字节数，不超过 amount
+        """
+        with self.condition:
+            while self.rate:
+                self.refill()
+                # 至少攒够半个桶(或 amount)再接收，避免大量很小的 recv
+                wanted = max(min(amount, self.burst) // 2, 1)
+                if self.tokens >= wanted:
+                    granted = int(min(amount, self.tokens))
+                    self.tokens -= granted
+                    return granted
+                self.condition.wait((wanted - self.tokens) / self.rate)
+            return amount
+
+    def refund(self, amount):
+        """
+        实际接收的少于预留的字节数时退还令牌
+        :param amount: int
+        :return: None
+        """
+        with self.condition:
+            if self.rate:
+                self.tokens = min(self.tokens + amount, self.burst)
+
+
+class HostLimiter(object):
+    """
+    每个主机一个令牌桶，同一主机的请求共享带宽
+    """
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: int => 每个主机每秒字节数
+        :param burst: int
+        """
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def set_rate(self, rate, burst=None, host=None):
+        """
+        :param rate: int
+        :param burst: int
+        :param host: str => 只调整这个主机，默认调整全部主机
+        :return: None
+        """
+        if host is not None:
+            self.bucket(host).set_rate(rate, burst)
+            return
+        with self.lock:
+            self.rate = rate
+            self.burst = burst
+            buckets = list(self.buckets.values())
+        for bucket in buckets:
+            bucket.set_rate(rate, burst)
@@ -0,0 +1,194 @@
+# coding=utf8
+"""
+    Download file output: preallocation, mmap or coalesced writes, atomic rename
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import binascii
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+__all__ = ['OutputFile', 'preallocate']
+
+PY2 = sys.version_info.major == 2
+
+
+def preallocate(fd, size):
+    """
+    为文件预留磁盘空间，减少碎片。不支持 posix_fallocate 时只设置文件大小
+    :param fd: int
+    :param size: int
+    :return: bool => 是否真正分配了磁盘块
+    """
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return True
+        except OSError:
+            pass  # 文件系统不支持
+    os.ftruncate(fd, size)
+    return False
+
+
+def replace(source, target):
+    if hasattr(os, 'replace'):
+        os.replace(source, target)
+        return
+    if os.name == 'nt' and os.path.exists(target):
+        os.remove(target)
+    os.rename(source, target)
+
+
+class OutputFile(object):
+    """
+    下载文件写入，代替 open(path, 'wb') 交给 SockFeed 使用
+
+    已知实体大小时(allocate)预分配文件，小块数据合并成大块再写，也可以选择通过 mmap 写入；
+    atomic 时先写入同目录下的临时文件，完整接收后再重命名为目标文件
+    """
+    def __init__(self, file_path, atomic=False, use_mmap=False, buffer_size=1024 * 1024):
+        """
+        :param file_path: str => 目标文件
+        :param atomic: bool => 写入临时文件，commit 之后关闭时重命名
+        :param use_mmap: bool => 预分配之后通过 mmap 写入，缺页的开销在多数系统上比合并写入大
+        :param buffer_size: int => 合并写入的缓存大小
+        """
+        self.name = file_path
+        self.atomic = atomic
+        self.use_mmap = use_mmap and mmap is not None
+        if atomic:
+            directory, base = os.path.split(file_path)
+            suffix = binascii.hexlify(os.urandom(4)).decode()
+            self.path = os.path.join(directory, '.{}.{}.part'.format(base, suffix))
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+        else:
+            self.path = file_path
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        self.closed = False
+        self.committed = False
+        self.written = 0
+        self.size = 0  # 预分配的大小
+        self.map = None
+        self.buffer_size = buffer_size
+        self.buffer = None  # 第一次合并写入时才分配
+        self.buffered = 0
+
+    def allocate(self, size):
+        """
+        按实体大小预分配文件
+        :param size: int
+        :return: None
+        """
+        if self.written or self.buffered or size <= 0:
+            return
+        preallocate(self.fd, size)
+        self.size = size
+        if self.use_mmap:
+            try:
+                self.map = mmap.mmap(self.fd, size)
+            except (mmap.error, OSError, ValueError):
+                return  # 例如 32 位系统上的超大文件，退化为合并写入
+            if hasattr(self.map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                self.map.madvise(mmap.MADV_SEQUENTIAL)
+
+    def write(self, data):
+        """
+        :param data: bytes | bytearray | memoryview
+        :return: int
+        """
+        length = len(data)
+        if self.map is not None:
+            if self.written + length <= self.size:
+                if PY2 and isinstance(data, memoryview):
+                    data = data.tobytes()
+                self.map[self.written: self.written + length] = data
+                self.written += length
+                return length
+            # 超出了预分配的大小，之后按合并写入处理
+            self.unmap()
+        if self.buffered + length > self.buffer_size:
+            self.flush()
+        if length >= self.buffer_size:
+            self.write_fd(data, self.written)
+            self.written += length
+            return length
+        if self.buffer is None:
+            self.buffer = bytearray(self.buffer_size)
+        self.buffer[self.buffered: self.buffered + length] = data
+        self.buffered += length
+        return length
+
+    def write_fd(self, data, offset):
+        view = memoryview(data)
+        if hasattr(os, 'pwrite'):
+            while view:
+                written = os.pwrite(self.fd, view, offset)
+                view = view[written:]
+                offset += written
+        else:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            while view:
+                view = view[os.write(self.fd, view.tobytes() if PY2 else view):]
+
+    def flush(self):
+        if self.buffered:
+            self.write_fd(memoryview(self.buffer)[:self.buffered], self.written)
+            self.written += self.buffered
+            self.buffered = 0
+
+    def unmap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def commit(self):
+        """
+        实体已完整接收，关闭时重命名为目标文件
+        :return: None
+        """
+        self.committed = True
+
+    def close(self):
+        """
+        写入剩余数据，按实际写入的大小截断预分配的文件；
+        atomic 模式下 commit 过的临时文件重命名为目标文件，否则删除临时文件
+        :return: None
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.unmap()
+            self.flush()
+            if self.size and self.written != self.size:
+                os.ftruncate(self.fd, self.written)  # 接收不完整
+        finally:
+            os.close(self.fd)
+        if not self.atomic:
+            return
+        if self.committed:
+            replace(self.path, self.name)
+            self.path = self.name
+        else:
+            self.remove()
+
+    def remove(self):
+        """
+        删除还留在磁盘上的文件，atomic 模式下不会影响已存在的目标文件
+        :return: None
+        """
+        if not self.closed:
+            self.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
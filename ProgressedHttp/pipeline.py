@@ -0,0 +1,165 @@
+# coding=utf8
+"""
+    HTTP/1.1 pipelining for batches of small GETs to one host
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import socket
+from collections import deque
+
+from ProgressedHttp import http, tls
+from ProgressedHttp.encoding import ACCEPT_ENCODING
+from ProgressedHttp.timeout import Timeout, Timeouts
+from ProgressedHttp.timing import Timings
+
+__all__ = ['pipeline']
+
+
+def pipeline(items, depth=8, debug=False, **kwargs):
+    """
+    在同一个 keep-alive 连接上连续发出多个 GET 请求，再按顺序读取响应，
+    每读完一个响应补发一个请求，保持 depth 个请求在途
+
+    服务端提前关闭连接(Connection: close、达到连接的请求数上限或直接断开)时，
+    没有完整收到响应的请求换新连接重发；新连接上一个完整响应都没有时退化为逐个请求
+    :param items: list => url 或 (url, file_path)，需要是同一个 (scheme, host, port)
+    :param depth: int => 同时在途的请求数
+    :param debug: bool
+    :param kwargs: dict => 与 request 相同的参数，作用于所有请求
+    :return: list => 与 items 顺序相同的 SockFeed
+    """
+    items = [tuple(i) if isinstance(i, (tuple, list)) else (i, None) for i in items]
+    origins = set()
+    for url, _ in items:
+        parse = http.HTTPCons.url_parser(url)
+        origins.add((parse['scheme'], parse['host'], parse['port']))
+    if len(origins) > 1:
+        raise Exception("pipelined requests should share one origin, got {}".format(len(origins)))
+
+    results = [None] * len(items)
+    index = 0
+    fresh = False
+    while index < len(items):
+        received, reused = run(items, index, depth, results, debug, kwargs, fresh)
+        index += received
+        if received:
+            fresh = False
+        elif reused and not fresh:
+            fresh = True  # 连接池中的连接可能已经失效，换新连接再试一次
+        else:
+            break
+
+    for position in range(index, len(items)):
+        # 服务端不支持管线化，逐个请求
+        url, file_path = items[position]
+        options = dict(kwargs, file_path=file_path) if file_path else kwargs
+        results[position] = http.request(url, debug=debug, **options)
+    return results
+
+
+def connection(url, debug, kwargs, fresh):
+    session = kwargs.get('session')
+    if session is not None:
+        return session.connection(url, fresh, tls_options=tls.options(kwargs), sock_options=http.socket_options(kwargs))
+    return http.HTTPCons(debug, tls_options=tls.options(kwargs), sock_options=http.socket_options(kwargs))
+
+
+def send(con, url, kwargs):
+    """
+    发出一个请求，返回对应的响应
+    :param con: HTTPCons
+    :param url: str
+    :param kwargs: dict
+    :return: SockFeed
+    """
+    headers = dict(kwargs.get('headers') or {})
+    if kwargs.get('compress'):
+        headers['Accept-Encoding'] = ACCEPT_ENCODING
+    con.timeouts = Timeouts.create(kwargs)
+    con.timings = Timings(kwargs.get('on_timings'))
+    con.request(url, 'GET', headers, kwargs.get('data'))
+    feed = http.SockFeed(con)
+    feed.drain_rejected = True  # 错误响应同样读完实体
+    http.configure(feed, kwargs)
+    if kwargs.get('compress'):
+        feed.decode_content = True
+    if kwargs.get('on_feed'):
+        kwargs['on_feed'](feed)
+    return feed
+
+
+def discard(feed):
+    """
+    没有完整收到的响应会重发，删除已经写入的文件
+    :param feed: SockFeed
+    :return: None
+    """
+    handle = feed.file_handle
+    if handle is None:
+        return
+    if not handle.closed:
+        feed.clean_failed_file()
+    elif not getattr(handle, 'atomic', False) and os.path.exists(handle.name):
+        os.remove(handle.name)  # atomic 的临时文件关闭时已经删除
+
+
+def run(items, start, depth, results, debug, kwargs, fresh=False):
+    """
+    在一个连接上管线化发出 items[start:]，直到全部完成或连接被关闭
+    :return: (int, bool) => 按顺序完整收到的响应数，连接是否来自连接池
+    """
+    con = connection(items[start][0], debug, kwargs, fresh)
+    con.keep_alive = True
+    con.in_flight += 1  # 请求之间在途数可能降到 0，持有一个引用避免连接被归还或关闭
+    reused = con.reused
+    alive = True
+    writable = True
+    feeds = deque()
+    sent = start
+    received = 0
+    feed = None
+    try:
+        # 请求都很小，关闭 Nagle 算法，避免后面的请求等待前一个请求的 ACK
+        # https 连接建立后 con.s 已经被 wrap_socket 接管，需要设置在 con.connect 上
+        (con.connect or con.s).setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for position in range(start, len(items)):
+            while writable and sent < len(items) and sent - position < max(depth, 1):
+                try:
+                    feeds.append(send(con, items[sent][0], kwargs))
+                    sent += 1
+                except Timeout:
+                    raise
+                except socket.error:
+                    writable = False  # 服务端已经关闭连接，先读完已经发出的请求的响应
+            if not feeds:
+                break
+            feed = feeds.popleft()
+            feed.http_response(items[position][1] or '', False, kwargs.get('chunk', 4096), kwargs.get('overwrite'))
+            if not feed.complete:
+                break
+            results[position] = feed
+            received += 1
+            feed = None
+            if not results[position].keep_alive():
+                alive = False
+                break  # 服务端关闭了连接，之后的请求不会有响应
+    except BaseException as e:
+        if feed is not None:
+            discard(feed)
+        con.close()
+        if isinstance(e, Timeout) or not isinstance(e, socket.error):
+            if feed is not None:
+                feed.timings.fail(e, feed.wire)
+            elif con.timings is not None:
+                con.timings.fail(e)  # 发送请求时失败
+            raise
+        return received, reused  # 连接被服务端关闭，剩下的请求换新连接重发
+    if feed is not None:
+        discard(feed)
+    if sent > start + received or not alive:
+        # 还有没读完的响应，连接不能再复用
+        con.close()
+    else:
+        con.release()
+    return received, reused
@@ -1,6 +1,6 @@
 # coding=utf8
 """
-    Progress Bar decorator for classes
+    Progress Bar decorator for classes, and a manager drawing many transfers at once
 """
 from __future__ import absolute_import, division, print_function
 
@@ -8,20 +8,183 @@ import os
 import sys
 import math
 import functools
+import threading
 
-from subprocess import check_output
 from itertools import cycle
 from time import time
 from ProgressedHttp.utils import *
 
-__all__ = ['bar']
+__all__ = ['bar', 'Renderer', 'terminal_width', 'Speed', 'Manager']
 
+# 终端宽度缓存，收到 SIGWINCH 后失效
+_terminal = {
+    'width': 0,
+    'checked': 0,
+    'watching': 0,  # 监听 SIGWINCH 的绘制线程数
+    'previous': None
+}
 
-def bar(width=0, fill='#'):
+
+def _on_resize(signum, frame):
+    _terminal['width'] = 0
+    if callable(_terminal['previous']):
+        _terminal['previous'](signum, frame)
+
+
+def _watch_resize():
+    """
+    只在后台线程绘制时监听 SIGWINCH，且只能在主线程中注册，注册失败则退化为定时刷新宽度
+    :return: bool => 是否注册成功，成功时需要配对调用 _unwatch_resize
+    """
+    if _terminal['watching']:
+        _terminal['watching'] += 1
+        return True
+    import signal  # 只在绘制进度条时才需要
+    if not hasattr(signal, 'SIGWINCH'):
+        return False
+    if threading.current_thread().name != 'MainThread':
+        return False
+    try:
+        _terminal['previous'] = signal.signal(signal.SIGWINCH, _on_resize)
+        signal.siginterrupt(signal.SIGWINCH, False)  # 不打断正在进行的 recv
+    except (ValueError, OSError, RuntimeError):
+        return False
+    _terminal['watching'] = 1
+    _terminal['width'] = 0
+    return True
+
+
+def _unwatch_resize():
+    """
+    最后一个监听者结束后恢复原来的 SIGWINCH 处理
+    :return: None
+    """
+    if not _terminal['watching']:
+        return
+    _terminal['watching'] -= 1
+    if _terminal['watching']:
+        return
+    import signal
+    previous = _terminal['previous']
+    try:
+        signal.signal(signal.SIGWINCH, signal.SIG_DFL if previous is None else previous)
+    except (ValueError, OSError, RuntimeError):
+        pass
+    _terminal['previous'] = None
+
+
+def terminal_width(refresh=1):
+    """
+    获取终端宽度
+    :param refresh: int => 无法监听 SIGWINCH 时，宽度缓存的有效秒数
+    :return: int
+    """
+    if not _terminal['width'] or (not _terminal['watching'] and time() - _terminal['checked'] > refresh):
+        try:
+            if is_python3():
+                # py3 中的 get_terminal_size 显然要快于 check_output
+                _terminal['width'] = os.get_terminal_size().columns
+            else:
+                from subprocess import check_output
+                _terminal['width'] = int(check_output("stty size", stderr=None, shell=True).split(b" ")[1])
+        except Exception as e:
+            _terminal['width'] = 50
+        _terminal['checked'] = time()
+    return _terminal['width']
+
+
+def snapshot(target):
+    """
+    读取进度状态，total 在读取前后一致才返回
+    :param target: 带有 progressed, total 属性的对象
+    :return: tuple => (progressed, total, chunked, chunk_recved, title)
+    """
+    while True:
+        total = target.total
+        state = (target.progressed, total, getattr(target, 'chunked', False),
+                 getattr(target, 'chunk_recved', 0), getattr(target, 'title', ''))
+        if target.total == total:
+            return state
+
+
+class Renderer(object):
+    """
+    进度条绘制，缓存标题宽度
+    """
+    def __init__(self, width=0, fill='#'):
+        """
+        :param width: int => 进度条宽度，0 表示占满终端
+        :param fill: str => 进度填充字符
+        """
+        self.width = width
+        self.fill = fill
+        self.cursor = 1
+        self.title = None
+        self.title_text = ''
+        self.title_width = 0
+        self.drawn = 0  # 上次绘制时的宽度
+
+    def measure(self, title):
+        """
+        :param title: str
+        :return: (str, int) => 标题与其显示宽度
+        """
+        if title != self.title:
+            self.title = title
+            if not is_python3() and isinstance(title, bytes):
+                title = title.decode('utf8')
+            self.title_text = title
+            self.title_width = str_len(title)
+        return self.title_text, self.title_width
+
+    def draw(self, progressed, total, chunked=False, chunk_recved=0, title=''):
+        w = self.width or terminal_width()
+        title, title_width = self.measure(title)
+        if not chunked:
+            # 普通编码进度条
+            percent = min(max(progressed / float(total), 0), 1) if total > 0 else 0
+            # marks count
+            percent_show = "{}%".format(int(percent * 100))
+            # marks width
+            mark_width = w - len(percent_show) - title_width - 7
+            mark_count = int(math.floor(mark_width * percent))
+            sys.stdout.write(
+                ' ' + title + ' ' +
+                '[' + self.fill * mark_count + ' ' * (mark_width - mark_count) + ']  ' + percent_show + '\r')
+        else:
+            # 分块编码进度条
+            self.cursor += 1
+            chunk_show = unit_change(chunk_recved)
+            mark_width = w - title_width - len(chunk_show) - 6
+            sys.stdout.write(" " + title + " " +
+                             "[" +
+                             "".join([i for _, i in zip(range(mark_width),
+                                                        cycle([">> ", " >>", "> >"][self.cursor % 3]))])
+                             + "] {}\r".format(chunk_show))
+        sys.stdout.flush()
+        self.drawn = w
+
+    def clear(self):
+        if self.drawn:
+            sys.stdout.write(" " * self.drawn + '\r')
+            sys.stdout.flush()
+
+
+def _render_loop(target, renderer, stop, interval):
+    while not stop.wait(interval):
+        progressed, total, chunked, chunk_recved, title = snapshot(target)
+        if total > 0:
+            renderer.draw(progressed, total, chunked, chunk_recved, title)
+
+
+def bar(width=0, fill='#', interval=.1, every=0, threaded=False):
     """
     进度条处理
     :param width: 手动设置进度条宽度
     :param fill: 进度填充字符
+    :param interval: 两次绘制之间的最小间隔(秒)
+    :param every: 接收量每增加 every 才检查一次是否需要绘制，0 表示每次都检查
+    :param threaded: 在后台线程中绘制，循环中只更新计数；为 False 时由对象的 threaded_progress 属性决定
     """
     def function_wrapper(func):
         @functools.wraps(func)
@@ -29,70 +192,348 @@ def bar(width=0, fill='#'):
             if not hasattr(self, 'progressed') or not hasattr(self, 'total'):
                 print("progressed, total attribute is needed!")
                 return
-            progress_cursor = 1
+            if getattr(self, 'disable_progress', False):
+                while self.progressed <= self.total:
+                    func(self, *args, **kwargs)
+                    if self.progressed == self.total:
+                        break
+                return
+
+            renderer = Renderer(width, fill)
+            if threaded or getattr(self, 'threaded_progress', False):
+                watching = _watch_resize()
+                stop = threading.Event()
+                painter = threading.Thread(target=_render_loop, args=(self, renderer, stop, interval))
+                painter.daemon = True
+                painter.start()
+                try:
+                    while self.progressed <= self.total:
+                        func(self, *args, **kwargs)
+                        if self.total <= 0:
+                            print("Total Length Invalid !")
+                            self.progressed = self.total = 1
+                            break
+                        if self.progressed == self.total:
+                            break
+                finally:
+                    stop.set()
+                    painter.join()
+                    renderer.clear()
+                    if watching:
+                        _unwatch_resize()
+                return
+
             last_update = time()
+            last_amount = 0
             while self.progressed <= self.total:
                 func(self, *args, **kwargs)
-                if not hasattr(self, 'disable_progress') or not self.disable_progress:
-                    if self.total <= 0:
-                        print("Total Length Invalid !")
-                        self.progressed = self.total = 1
-                        break
-                    
-                    if time() - last_update > .1:
-                        # 获取终端宽度
-                        if not width:
-                            try:
-                                if is_python3():
-                                    # py3 中的 get_terminal_size 显然要快于 check_output
-                                    w = os.get_terminal_size().columns
-                                else:
-                                    w = int(check_output("stty size", stderr=None, shell=True).split(b" ")[1])
-                            except Exception as e:
-                                w = 50
-                        else:
-                            w = width
-
-                        if not hasattr(self, 'chunked') or not self.chunked:
-                            # 普通编码进度条
-                            percent = self.progressed / float(self.total)
-                            # marks count
-                            percent_show = "{}%".format(int(percent * 100))
-                            # marks width
-                            if is_python3():
-                                title = getattr(self, 'title', '')
-                            else:
-                                title = getattr(self, 'title', '').decode('utf8')
-                            mark_width = w - len(percent_show) - str_len(title) - 7
-                            mark_count = int(math.floor(mark_width * percent))
-                            sys.stdout.write(
-                                ' ' + title + ' ' +
-                                '[' + fill * mark_count + ' ' * (mark_width - mark_count) + ']  ' + percent_show + '\r')
-                        else:
-                            # 分块编码进度条
-                            progress_cursor += 1
-                            title = getattr(self, 'title', '')
-                            chunk_recved = unit_change(self.chunk_recved)
-                            mark_width = w - str_len(title) - len(chunk_recved) - 6
-                            sys.stdout.write(" " + title + " " +
-                                             "[" +
-                                             "".join([i for _, i in zip(range(mark_width),
-                                                                        cycle([">> ", " >>", "> >"][progress_cursor % 3]))])
-                                             + "] {}\r".format(chunk_recved))
-
-                        sys.stdout.flush()
-                        last_update = time()
+                if self.total <= 0:
+                    print("Total Length Invalid !")
+                    self.progressed = self.total = 1
+                    break
 
-                    if self.progressed == self.total:
-                        sys.stdout.write(" " * w + '\r')
-                        break
-                else:
-                    if self.progressed == self.total:
-                        break
+                if self.progressed == self.total:
+                    renderer.clear()
+                    break
+
+                if every:
+                    amount = self.chunk_recved if getattr(self, 'chunked', False) else self.progressed
+                    if amount - last_amount < every:
+                        continue
+                    last_amount = amount
+
+                if time() - last_update > interval:
+                    renderer.draw(*snapshot(self))
+                    last_update = time()
         return arguments
     return function_wrapper
 
 
+def format_eta(seconds):
+    """
+    :param seconds: float | None
+    :return: str => mm:ss 或 h:mm:ss，无法估计时为 --:--
+    """
+    if seconds is None or seconds < 0 or seconds > 360000:
+        return '--:--'
+    seconds = int(math.ceil(seconds))
+    hours, seconds = divmod(seconds, 3600)
+    if hours:
+        return "{}:{:02d}:{:02d}".format(hours, seconds // 60, seconds % 60)
+    return "{:02d}:{:02d}".format(seconds // 60, seconds % 60)
+
+
+def fit(text, width):
+    """
+    按显示宽度截断并补齐
+    :param text: str
+    :param width: int
+    :return: str
+    """
+    if str_len(text) > width:
+        result = []
+        used = 0
+        for i in text:
+            size = str_len(i)
+            if used + size > width - 1:
+                break
+            result.append(i)
+            used += size
+        text = ''.join(result) + '~'
+    return text + ' ' * (width - str_len(text))
+
+
+class Speed(object):
+    """
+    指数加权移动平均的吞吐量，权重按采样间隔计算，采样不均匀时同样平滑
+    """
+    def __init__(self, window=3.0):
+        """
+        :param window: float => 时间常数(秒)，越大越平滑
+        """
+        self.window = window
+        self.rate = 0.0
+        self.amount = None
+        self.checked = 0
+        self.sampled = False
+
+    def update(self, amount, now=None):
+        """
+        :param amount: int => 累计传输量
+        :param now: float
+        :return: float => 平滑后的字节/秒
+        """
+        now = time() if now is None else now
+        if self.amount is None:
+            self.amount, self.checked = amount, now
+            return self.rate
+        elapsed = now - self.checked
+        if elapsed <= 0:
+            return self.rate
+        instant = max(amount - self.amount, 0) / elapsed
+        if self.sampled:
+            self.rate += (instant - self.rate) * (1 - math.exp(-elapsed / self.window))
+        else:
+            self.rate = instant  # 第一个区间直接使用，避免从 0 开始缓慢爬升
+            self.sampled = True
+        self.amount, self.checked = amount, now
+        return self.rate
+
+    def eta(self, remaining):
+        """
+        :param remaining: int => 剩余传输量
+        :return: float | None => 剩余秒数，无法估计时为 None
+        """
+        if remaining <= 0:
+            return 0
+        return remaining / self.rate if self.rate > 0 else None
+
+
+class Manager(object):
+    """
+    多个传输同时进行时的进度显示，每个传输一行，最后一行为汇总
+    所有输出都由一个绘制线程按固定帧率完成，传输线程只在加入、移除时短暂持有锁
+
+        with Manager(expected=len(urls)) as manager:
+            get(url, disable_progress=True, on_feed=manager.add)
+    """
+    def __init__(self, fps=10, rows=10, width=0, expected=0, title='total', stream=None, redraw=None, window=3.0):
+        """
+        :param fps: float => 每秒最多绘制的帧数
+        :param rows: int => 最多显示的传输行数，其余只显示数量
+        :param width: int => 行宽，0 表示占满终端
+        :param expected: int => 预计的传输数量，用于汇总行的计数与剩余时间
+        :param title: str => 汇总行标题
+        :param stream: 输出，默认 sys.stdout
+        :param redraw: bool => 是否原地刷新，默认在终端中才刷新，否则只在结束时输出汇总
+        :param window: float => 速度平滑的时间常数(秒)
+        """
+        self.interval = 1.0 / fps
+        self.rows = rows
+        self.width = width
+        self.expected = expected
+        self.title = title
+        self.stream = stream or sys.stdout
+        if redraw is None:
+            redraw = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.redraw = redraw
+        self.window = window
+        self.lock = threading.Lock()
+        self.transfers = []  # [[target, Speed], ...]
+        self.done = 0  # 已完成的传输数
+        self.done_bytes = 0
+        self.speed = Speed(window)
+        self.lines = 0  # 上一帧输出的行数
+        self.stopped = threading.Event()
+        self.painter = None
+        self.watching = False  # 是否注册了 SIGWINCH
+
+    def add(self, target):
+        """
+        :param target: 带有 progressed, total 属性的对象，如 SockFeed
+        :return: target
+        """
+        speed = Speed(self.window)
+        speed.update(self.amount(snapshot(target)))  # 从加入时开始计时，第一帧就能给出速度
+        with self.lock:
+            self.transfers.append([target, speed])
+        return target
+
+    def remove(self, target):
+        """
+        传输结束或失败，完整结束的传输计入汇总
+        :param target:
+        :return: None
+        """
+        with self.lock:
+            for entry in self.transfers:
+                if entry[0] is target:
+                    self.retire(entry, snapshot(target))
+                    break
+
+    def retire(self, entry, state):
+        """
+        需要持有锁
+        """
+        self.transfers.remove(entry)
+        if getattr(entry[0], 'complete', True) and self.finished(entry[0], state):
+            self.done += 1
+            # SockFeed 结束时进度被重置，以实际接收的字节数为准
+            self.done_bytes += getattr(entry[0], 'received', self.amount(state))
+
+    @staticmethod
+    def amount(state):
+        progressed, total, chunked, chunk_recved, _ = state
+        return chunk_recved if chunked else progressed
+
+    @staticmethod
+    def finished(target, state):
+        progressed, total = state[:2]
+        return getattr(target, 'finished', total > 0 and progressed >= total)
+
+    def frame(self, now=None):
+        """
+        :param now: float
+        :return: list => 当前帧的每一行
+        """
+        now = time() if now is None else now
+        w = (self.width or terminal_width()) - 1  # 写满最后一列会导致部分终端自动换行
+        with self.lock:
+            transfers = list(self.transfers)
+        lines = []
+        active = 0
+        remaining = 0
+        retired = []
+        for entry in transfers:
+            target, speed = entry
+            state = snapshot(target)
+            if self.finished(target, state):
+                retired.append((entry, state))
+                continue
+            progressed, total, chunked, chunk_recved, title = state
+            amount = self.amount(state)
+            size = 0 if chunked or not getattr(target, 'status', True) else total
+            rate = speed.update(amount, now)
+            active += amount
+            remaining += max(size - amount, 0)
+            if len(lines) < self.rows:
+                lines.append(self.line(title or '-', amount, size, rate, speed.eta(size - amount) if size else None,
+                                       w))
+        with self.lock:
+            for entry, state in retired:
+                if entry in self.transfers:
+                    self.retire(entry, state)
+            done, done_bytes, count = self.done, self.done_bytes, len(self.transfers)
+        if len(transfers) - len(retired) > self.rows:
+            lines.append(fit("  ... {} more".format(len(transfers) - len(retired) - self.rows), w))
+
+        rate = self.speed.update(done_bytes + active, now)
+        eta = None
+        if self.expected and done:
+            # 还没开始的传输按已完成传输的平均大小估计
+            pending = max(self.expected - done - count, 0)
+            eta = self.speed.eta(remaining + pending * done_bytes / done)
+        elif count and remaining:
+            eta = self.speed.eta(remaining)
+        summary = " {} {}/{}  {}  {}/s".format(self.title, done, self.expected or done + count,
+                                               unit_change(done_bytes + active), unit_change(rate))
+        if count or (eta is not None and done < self.expected):
+            summary += "  ETA " + format_eta(eta)
+        lines.append(fit(summary, w))
+        return lines
+
+    @staticmethod
+    def line(title, amount, size, rate, eta, width):
+        """
+        :return: str => 一个传输的进度行
+        """
+        info = "{}/s".format(unit_change(rate))
+        if size:
+            info = "{:>10} / {:>10}  {:>12}  ETA {}".format(unit_change(amount), unit_change(size), info,
+                                                             format_eta(eta))
+        else:
+            info = "{:>10}  {:>12}".format(unit_change(amount), info)
+        name_width = max(min(width // 3, max(str_len(title), 10)), 4)
+        text = ' ' + fit(title, name_width) + ' '
+        if size:
+            percent = min(max(amount / float(size), 0), 1)
+            percent_show = "{:>3}% ".format(int(percent * 100))
+            mark_width = width - str_len(text) - len(percent_show) - len(info) - 3
+            if mark_width >= 5:
+                mark_count = int(math.floor(mark_width * percent))
+                text += '[' + '#' * mark_count + ' ' * (mark_width - mark_count) + '] '
+            text += percent_show
+        return fit(text + info, width)
+
+    def draw(self, now=None):
+        """
+        一次写出完整的一帧，覆盖上一帧
+        :return: None
+        """
+        lines = self.frame(now)
+        if not self.redraw:
+            return
+        output = '\x1b[{}A\r'.format(self.lines) if self.lines else '\r'
+        output += ''.join(i.rstrip() + '\x1b[K\n' for i in lines) + '\x1b[J'
+        self.stream.write(output)
+        self.stream.flush()
+        self.lines = len(lines)
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            self.draw()
+
+    def start(self):
+        if self.painter is not None:
+            return self
+        self.watching = _watch_resize()
+        self.stopped.clear()
+        self.painter = threading.Thread(target=self.loop)
+        self.painter.daemon = True
+        self.painter.start()
+        return self
 
+    def stop(self):
+        """
+        停止绘制，输出最后一帧
+        :return: None
+        """
+        if self.painter is None:
+            return
+        self.stopped.set()
+        self.painter.join()
+        self.painter = None
+        if self.watching:
+            _unwatch_resize()
+            self.watching = False
+        if self.redraw:
+            self.draw()
+        else:
+            self.stream.write(self.frame()[-1].rstrip() + '\n')
+            self.stream.flush()
 
+    def __enter__(self):
+        return self.start()
 
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
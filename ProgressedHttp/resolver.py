@@ -0,0 +1,97 @@
+# coding=utf8
+"""
+    Process-wide DNS resolution cache
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+import socket
+import threading
+
+from collections import OrderedDict
+
+__all__ = ['Resolver', 'default_resolver', 'resolve']
+
+
+class Resolver(object):
+    """
+    带 TTL 的 getaddrinfo 缓存，解析失败的结果也会缓存一小段时间
+    """
+    def __init__(self, ttl=60, negative_ttl=5, maxsize=256):
+        """
+        :param ttl: float => 解析结果缓存秒数，0 表示不缓存
+        :param negative_ttl: float => 解析失败的缓存秒数
+        :param maxsize: int => 最多缓存的 (host, port) 数量，超出后淘汰最久未使用的
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.cache = OrderedDict()  # (host, port) => (过期时间, 地址列表, (异常类型, 参数) | None)
+        self.lock = threading.Lock()
+        self.getaddrinfo = socket.getaddrinfo
+
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host, port):
+        """
+        :param host: str
+        :param port: int
+        :return: list => [(ip, port), ...]
+        """
+        key = (host, port)
+        now = time.time()
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                self.cache.pop(key)
+                self.cache[key] = entry  # 移到末尾，最近使用
+                if entry[2] is not None:
+                    # 每次抛出新的异常实例，共享的实例的 __traceback__ 会在线程间累积
+                    raise entry[2][0](*entry[2][1])
+                return entry[1]
+            self.misses += 1
+
+        error = failure = None
+        try:
+            result = [i[4] for i in self.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)]
+            expires = now + self.ttl
+        except socket.gaierror as e:
+            result = None
+            failure = e
+            error = (e.__class__, e.args)  # 只缓存异常类型与参数
+            expires = now + self.negative_ttl
+
+        with self.lock:
+            self.cache.pop(key, None)
+            if expires > now:
+                self.cache[key] = (expires, result, error)
+                while len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+        if failure is not None:
+            raise failure
+        return result
+
+    def invalidate(self, host, port):
+        with self.lock:
+            self.cache.pop((host, port), None)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.cache)
+            }
+
+
+default_resolver = Resolver()
+
+
+def resolve(host, port):
+    return default_resolver.resolve(host, port)
@@ -0,0 +1,118 @@
+# coding=utf8
+"""
+    On-disk state for resumable downloads
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import json
+
+__all__ = ['ResumeState']
+
+
+class ResumeState(object):
+    """
+    与下载文件放在一起的状态文件，记录 URL、校验信息(ETag/Last-Modified)与已写入字节数
+    """
+    suffix = '.progress'
+
+    def __init__(self, file_path, url):
+        """
+        :param file_path: str => 下载文件位置
+        :param url: str
+        """
+        self.file_path = file_path
+        self.url = url
+        self.etag = None
+        self.last_modified = None
+        self.offset = 0  # 续传起始位置
+
+    @property
+    def sidecar(self):
+        return self.file_path + self.suffix
+
+    def candidates(self):
+        """
+        不覆盖时下载文件可能被改名为 `1_<name>`、`2_<name>` ...，这些文件旁边也可能有状态文件
+        :return: generator => 已存在的下载文件位置
+        """
+        dirname = os.path.dirname(self.file_path)
+        filename = os.path.basename(self.file_path)
+        path_choice = self.file_path
+        index = 1
+        while os.path.exists(path_choice):
+            yield path_choice
+            path_choice = os.path.join(dirname, '{}_{}'.format(index, filename))
+            index += 1
+
+    def load(self):
+        """
+        读取状态文件，URL 与文件都对得上并且有校验信息时才续传，找到时 file_path 指向续传的文件
+        :return: int => 续传起始位置
+        """
+        self.offset = 0
+        for path_choice in self.candidates():
+            state = self.read(path_choice + self.suffix)
+            if state is None or state.get('url') != self.url or not (state.get('etag') or state.get('last_modified')):
+                continue
+            self.file_path = path_choice
+            self.etag = state.get('etag')
+            self.last_modified = state.get('last_modified')
+            # 以磁盘上实际的文件大小为准
+            self.offset = min(os.path.getsize(self.file_path), state.get('written', 0))
+            return self.offset
+        return 0
+
+    @staticmethod
+    def read(sidecar):
+        """
+        :param sidecar: str
+        :return: dict | None
+        """
+        if not os.path.exists(sidecar):
+            return None
+        try:
+            with open(sidecar) as handle:
+                return json.load(handle)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def headers(self):
+        """
+        续传请求需要的请求头
+        :return: dict
+        """
+        if not self.offset:
+            return {}
+        return {
+            'Range': 'bytes={}-'.format(self.offset),
+            'If-Range': self.etag or self.last_modified
+        }
+
+    def update(self, headers):
+        """
+        从响应头中记录校验信息
+        :param headers: dict
+        :return: None
+        """
+        etag = headers.get(b'Etag')
+        last_modified = headers.get(b'Last-Modified')
+        self.etag = etag.decode('latin-1') if etag else None
+        self.last_modified = last_modified.decode('latin-1') if last_modified else None
+
+    def save(self, written):
+        """
+        :param written: int => 已写入文件的字节数
+        :return: None
+        """
+        with open(self.sidecar, 'w') as handle:
+            json.dump({
+                'url': self.url,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'written': written
+            }, handle)
+
+    def remove(self):
+        if os.path.exists(self.sidecar):
+            os.unlink(self.sidecar)
@@ -0,0 +1,182 @@
+# coding=utf8
+"""
+    Segmented multi-connection download using Range requests
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+import socket
+import threading
+
+from ProgressedHttp import http, progress, tls
+
+__all__ = ['SegmentedDownload', 'download']
+
+
+def download(href, file_path, segments=4, debug=False, **kwargs):
+    """
+    分段下载文件，服务端不支持 Range 时退化为单连接下载
+    :param href: str
+    :param file_path: str
+    :param segments: int => 最多同时使用的连接数
+    :param debug: bool
+    :return: SegmentedDownload
+    """
+    loader = SegmentedDownload(href, file_path, segments, debug, **kwargs)
+    loader.run()
+    return loader
+
+
+class SegmentedDownload(object):
+    """
+    探测文件大小与 Accept-Ranges 后，多个连接并行下载各自的字节范围
+    """
+    min_segment = 1024 * 1024  # 每段至少 1MB
+
+    def __init__(self, href, file_path, segments=4, debug=False, **kwargs):
+        """
+        :param href: str
+        :param file_path: str
+        :param segments: int => 最多同时使用的连接数
+        :param debug: bool
+        :param headers: dict
+        :param chunk: int => 缓存块大小
+        :param overwrite: bool => 是否覆盖重名文件
+        :param disable_progress: bool
+        :param verify/cafile/certfile/keyfile: 与 request 相同的 https 参数
+        """
+        self.href = href
+        self.file_path = file_path
+        self.segments = max(segments, 1)
+        self.debug = debug
+        self.headers = kwargs.get('headers') or {}
+        self.chunk = kwargs.get('chunk', 65536)
+        self.overwrite = kwargs.get('overwrite')
+        self.disable_progress = kwargs.get('disable_progress', False)
+        self.tls_options = tls.options(kwargs)
+
+        self.progressed = 0
+        self.total = 0
+        self.title = os.path.basename(file_path)
+        self.ranges = []  # [(start, end), ...] end 包含在内
+        self.feeds = []
+        self.errors = []
+        self.segmented = False
+        self.cancelled = False
+
+    def probe(self):
+        """
+        只获取响应头，判断是否可以分段
+        :return: (int, bool) => (实体长度, 是否支持 Range)
+        """
+        feed = http.request(self.href, debug=self.debug, headers=dict(self.headers),
+                            skip_body=True, disable_progress=True, **self.tls_options)
+        if not feed.status or feed.status['code'] != b'200':
+            return 0, False
+        length = int(feed.headers.get(b'Content-Length', 0))
+        accept = feed.headers.get(b'Accept-Ranges', b'').lower() == b'bytes'
+        return length, accept
+
+    def split(self, length):
+        count = min(self.segments, max(length // self.min_segment, 1))
+        size = length // count
+        self.ranges = [(i * size, (i + 1) * size - 1 if i < count - 1 else length - 1) for i in range(count)]
+        return self.ranges
+
+    def fetch(self, index):
+        start, end = self.ranges[index]
+        try:
+            if self.cancelled:
+                return
+            headers = dict(self.headers)
+            headers['Range'] = 'bytes={}-{}'.format(start, end)
+            req = http.HTTPCons(self.debug, tls_options=self.tls_options)
+            req.request(self.href, 'GET', headers)
+            feed = http.SockFeed(req)
+            feed.disable_progress = True
+            feed.open_range(self.file_path, start, end)
+            self.feeds[index] = feed
+            if self.cancelled:
+                feed.close()
+                return
+            feed.http_response(chunk=self.chunk)
+            if not feed.complete and not self.cancelled:
+                status = feed.status['status'].decode('latin-1') if feed.status else 'no response'
+                raise Exception("segment {}-{} failed: {} {}".format(
+                    start, end, status, feed.headers.get(b'Content-Range', b'').decode('latin-1')).strip())
+        except Exception as e:
+            if not self.cancelled:
+                self.errors.append(e)
+                self.cancel()
+
+    def cancel(self):
+        """
+        一个分段失败后中断其余分段，文件在所有分段结束后由 run 统一清理
+        :return: None
+        """
+        self.cancelled = True
+        for feed in list(self.feeds):
+            if feed is not None and not feed.finished:
+                try:
+                    # https 连接的 con.s 已经被 wrap_socket 接管
+                    (feed.con.connect or feed.con.s).shutdown(socket.SHUT_RDWR)
+                except (socket.error, OSError, AttributeError):
+                    pass
+
+    def written(self):
+        return sum(feed.file_offset - start for feed, (start, _) in zip(self.feeds, self.ranges) if feed)
+
+    def fallback(self):
+        """
+        单连接下载
+        :return: None
+        """
+        self.segmented = False
+        feed = http.request(self.href, debug=self.debug, headers=dict(self.headers), chunk=self.chunk,
+                            file_path=self.file_path, overwrite=True, disable_progress=self.disable_progress,
+                            **self.tls_options)
+        self.feeds = [feed]
+
+    def run(self):
+        length, accept = self.probe()
+        self.file_path = http.choose_path(self.file_path, self.overwrite)
+        self.title = os.path.basename(self.file_path)
+        if not accept or length < 2 * self.min_segment or self.segments < 2:
+            return self.fallback()
+
+        self.segmented = True
+        with open(self.file_path, 'wb') as handle:
+            handle.truncate(length)
+        self.total = length
+        self.split(length)
+        self.feeds = [None] * len(self.ranges)
+        workers = [threading.Thread(target=self.fetch, args=(i, )) for i in range(len(self.ranges))]
+        for i in workers:
+            i.daemon = True
+            i.start()
+        self.watch(workers)
+        for i in workers:
+            i.join()
+
+        if any(feed and feed.status and feed.status['code'] == b'200' for feed in self.feeds):
+            # 服务端忽略了 Range 请求头，其余分段都已结束，覆盖重新下载
+            self.errors = []
+            return self.fallback()
+        if self.errors or self.written() != length:
+            if os.path.exists(self.file_path):
+                os.unlink(self.file_path)
+            raise Exception("Segmented Download Failed `{}`".format(self.errors or 'incomplete'))
+
+    @progress.bar()
+    def watch(self, workers):
+        """
+        汇总各个分段的进度
+        :param workers: list => 下载线程
+        :return: None
+        """
+        time.sleep(.05)
+        if not any(i.is_alive() for i in workers):
+            self.progressed = self.total
+        else:
+            self.progressed = self.written()
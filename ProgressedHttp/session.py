@@ -0,0 +1,200 @@
+# coding=utf8
+"""
+    Keep-alive connection pool & session
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+import select
+import threading
+
+from ProgressedHttp import http
+
+__all__ = ['ConnectionPool', 'Session']
+
+
+def is_dropped(con):
+    """
+    空闲连接上出现可读事件，说明服务端已经关闭连接(或发来了意料之外的数据)
+    :param con: HTTPCons
+    :return: bool
+    """
+    try:
+        readable, _, _ = select.select([con.connect], [], [], 0)
+    except (select.error, ValueError, OSError):
+        return True
+    return bool(readable)
+
+
+class ConnectionPool(object):
+    """
+    按 (scheme, host, port) 保存空闲的 keep-alive 连接
+    """
+    def __init__(self, maxsize=10, idle_timeout=60):
+        """
+        :param maxsize: int => 每个 (scheme, host, port) 最多保留的空闲连接数
+        :param idle_timeout: int => 空闲超过该秒数的连接将被淘汰
+        """
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, now):
+        """
+        取出所有超时的空闲连接，需持有锁
+        :param now: float
+        :return: list
+        """
+        expired = []
+        for key in list(self.idle):
+            cons = self.idle[key]
+            # 列表按归还时间排序，最早归还的在最前面
+            while cons and now - cons[0][1] > self.idle_timeout:
+                expired.append(cons.pop(0)[0])
+            if not cons:
+                del self.idle[key]
+        return expired
+
+    def get(self, key):
+        """
+        取出一个可用的空闲连接
+        :param key: tuple => (scheme, host, port)
+        :return: HTTPCons | None
+        """
+        con = None
+        with self.lock:
+            discard = self._expired(time.time())
+            cons = self.idle.get(key, [])
+            while cons:
+                candidate = cons.pop()[0]  # 优先使用最近归还的连接
+                if is_dropped(candidate):
+                    discard.append(candidate)
+                    continue
+                con = candidate
+                break
+            if con is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.evictions += len(discard)
+
+        for i in discard:
+            i.close()
+        return con
+
+    def put(self, con):
+        """
+        归还连接，超出容量则直接关闭
+        :param con: HTTPCons
+        :return: None
+        """
+        with self.lock:
+            cons = self.idle.setdefault(con.key, [])
+            if len(cons) < self.maxsize:
+                cons.append((con, time.time()))
+                return
+            self.evictions += 1
+        con.close()
+
+    def evict_idle(self):
+        """
+        主动淘汰超时的空闲连接
+        :return: int => 淘汰的连接数
+        """
+        with self.lock:
+            expired = self._expired(time.time())
+            self.evictions += len(expired)
+        for i in expired:
+            i.close()
+        return len(expired)
+
+    def clear(self):
+        """
+        关闭所有空闲连接
+        :return: None
+        """
+        with self.lock:
+            cons = [con for key in self.idle for con, _ in self.idle[key]]
+            self.idle = {}
+        for i in cons:
+            i.close()
+
+    def stats(self):
+        """
+        连接池命中统计
+        :return: dict
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'idle': sum(len(i) for i in self.idle.values())
+            }
+
+
+class Session(object):
+    """
+    复用 keep-alive 连接的请求会话
+    """
+    def __init__(self, pool_size=10, idle_timeout=60, debug=False, tls_options=None, sock_options=None):
+        """
+        :param pool_size: int => 每个 (scheme, host, port) 最多保留的空闲连接数
+        :param idle_timeout: int => 空闲连接超时秒数
+        :param debug: bool
+        :param tls_options: dict => SSLContext 配置，verify | cafile | certfile | keyfile
+        :param sock_options: list => [(level, option, value), ...] 新连接的 socket 选项
+        """
+        self.pool = ConnectionPool(pool_size, idle_timeout)
+        self.debug = debug
+        self.tls_options = tls_options
+        self.sock_options = sock_options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connection(self, href, fresh=False, tls_options=None, sock_options=None):
+        """
+        获取请求使用的连接，优先从连接池中取
+        :param href: str
+        :param fresh: bool => 不使用连接池中的连接
+        :param tls_options: dict => 本次请求的 SSLContext 配置，覆盖会话的同名配置
+        :param sock_options: list => 本次请求追加的 socket 选项
+        :return: HTTPCons
+        """
+        merged_tls = dict(self.tls_options or {})
+        merged_tls.update(tls_options or {})
+        merged_sock = list(self.sock_options or ()) + list(sock_options or ())
+        # 配置与会话不同的连接单独放在连接池中，不会被其他请求复用
+        variant = ()
+        if merged_tls != (self.tls_options or {}) or merged_sock != list(self.sock_options or ()):
+            variant = (tuple(sorted(merged_tls.items())), tuple(merged_sock))
+        if not fresh:
+            parse = http.HTTPCons.url_parser(href)
+            con = self.pool.get((parse['scheme'], parse['host'], parse['port']) + variant)
+            if con is not None:
+                con.reused = True
+                return con
+        con = http.HTTPCons(self.debug, self.pool, tls_options=merged_tls, sock_options=merged_sock)
+        con.variant = variant
+        return con
+
+    def request(self, href, method='GET', **kwargs):
+        return http.request(href, method, self.debug, session=self, **kwargs)
+
+    def get(self, href, **kwargs):
+        return self.request(href, **kwargs)
+
+    def post(self, href, **kwargs):
+        return self.request(href, 'POST', **kwargs)
+
+    def close(self):
+        self.pool.clear()
@@ -0,0 +1,78 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import io
+import os
+import gzip
+import socket
+import tempfile
+import unittest
+
+from ProgressedHttp.http import get, socket_options
+from ProgressedHttp.adaptive import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class AdaptiveSizeTest(unittest.TestCase):
+    def test_grow_and_shrink(self):
+        size = AdaptiveSize(4096, maximum=65536)
+        self.assertEqual([size.update(size.size) for _ in range(6)], [8192, 16384, 32768, 65536, 65536, 65536])
+        self.assertEqual(size.update(40000), 65536)
+        self.assertEqual(size.update(100), 32768)
+        self.assertEqual(size.update(0), 16384)
+        for _ in range(10):
+            size.update(0)
+        self.assertEqual(size.size, 4096)
+
+
+class AdaptiveResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(3 * 1024 * 1024 + 17)
+        self.server.route('/plain', Reply(self.body))
+        self.server.route('/chunked', Reply(self.body, chunked=True, chunk_size=[3, 70000, 5, 1024 * 1024]))
+        self.server.route('/gzip', lambda req: Reply(self.gzipped, chunked=True, headers=[('Content-Encoding', 'gzip')]))
+        self.server.route('/slow', Reply(self.body[:200000], piece=3000, delay=0.001))
+        out = io.BytesIO()
+        with gzip.GzipFile(fileobj=out, mode='wb') as handle:
+            handle.write(self.body)
+        self.gzipped = out.getvalue()
+        self.file_path = os.path.join(tempfile.gettempdir(), 'adaptive.data')
+
+    def tearDown(self):
+        self.server.close()
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_memory(self):
+        for path in ('/plain', '/chunked'):
+            resp = get(self.server.url(path), adaptive=True, disable_progress=True)
+            self.assertEqual(resp.data, self.body, path)
+        resp = get(self.server.url('/gzip'), adaptive=True, compress=True, disable_progress=True)
+        self.assertEqual(resp.data, self.body)
+
+    def test_file(self):
+        for path in ('/plain', '/chunked'):
+            get(self.server.url(path), adaptive=True, file_path=self.file_path, overwrite=True,
+                disable_progress=True)
+            with open(self.file_path, 'rb') as handle:
+                self.assertEqual(handle.read(), self.body, path)
+
+    def test_grows(self):
+        resp = get(self.server.url('/chunked'), adaptive=True, max_chunk=256 * 1024, disable_progress=True)
+        self.assertGreater(resp.read_size.size, 4096)
+        self.assertLessEqual(len(resp.recv_buffer), 256 * 1024)
+        resp = get(self.server.url('/slow'), adaptive=True, disable_progress=True)
+        self.assertEqual(resp.data, self.body[:200000])
+        self.assertLessEqual(resp.read_size.size, 8192)
+
+    def test_socket_options(self):
+        self.assertEqual(socket_options({}), [])
+        resp = get(self.server.url('/plain'), rcvbuf=1024 * 1024, nodelay=True, stream=True)
+        self.assertEqual(resp.socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), 1)
+        self.assertGreaterEqual(resp.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF), 1024 * 1024)
+        self.assertEqual(resp.read(), self.body)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
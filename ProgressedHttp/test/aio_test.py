@@ -0,0 +1,93 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from ProgressedHttp.test.server import LocalServer, Reply
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from ProgressedHttp import aio
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "asyncio backend needs python 3.5+")
+class AsyncTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(200000)
+        self.server.route('/plain', Reply(self.body))
+        self.server.route('/chunked', Reply(self.body, chunked=True, chunk_size=[3, 10000]))
+        self.server.route('/slow', Reply(self.body, piece=50000, delay=0.01))
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        self.server.close()
+
+    def run_loop(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_in_memory(self):
+        for path in ('/plain', '/chunked', '/slow'):
+            resp = self.run_loop(aio.get(self.server.url(path)))
+            self.assertEqual(resp.data, self.body, path)
+            self.assertEqual(resp.status['code'], b'200')
+
+    def test_downloading(self):
+        file_path = os.path.join(tempfile.gettempdir(), 'aio.data')
+        resp = self.run_loop(aio.get(self.server.url('/chunked'), file_path=file_path, overwrite=True))
+        with open(file_path, 'rb') as handle:
+            content = handle.read()
+        os.remove(resp.file_handle.name)
+        self.assertEqual(content, self.body)
+
+    def test_failed_status(self):
+        self.server.route('/missing', Reply(b'not found', status='404 Not Found'))
+        directory = tempfile.mkdtemp()
+        file_path = os.path.join(directory, 'aio.data')
+        try:
+            resp = self.run_loop(aio.get(self.server.url('/missing'), file_path=file_path))
+            self.assertEqual(resp.status['code'], b'404')
+            self.assertEqual(os.listdir(directory), [])
+
+            with open(file_path, 'wb') as handle:
+                handle.write(b'old')
+            self.run_loop(aio.get(self.server.url('/missing'), file_path=file_path, overwrite=True))
+            with open(file_path, 'rb') as handle:
+                self.assertEqual(handle.read(), b'old')
+            self.assertEqual(os.listdir(directory), ['aio.data'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_concurrent(self):
+        semaphore = asyncio.Semaphore(5)
+        calls = []
+
+        def progress(feed):
+            calls.append(feed.progressed)
+            return asyncio.sleep(0)
+
+        results = self.run_loop(asyncio.gather(*[
+            aio.get(self.server.url('/plain' if i % 2 else '/chunked'), semaphore=semaphore, progress=progress)
+            for i in range(50)
+        ]))
+        self.assertTrue(all(i.data == self.body for i in results))
+        self.assertTrue(calls)
+
+    def test_post(self):
+        self.server.route('/echo', lambda req: Reply(req.body))
+        resp = self.run_loop(aio.post(self.server.url('/echo'), data='async post'))
+        self.assertEqual(resp.data, b'async post')
+
+        pieces = (self.body[i: i + 4096] for i in range(0, len(self.body), 4096))
+        resp = self.run_loop(aio.post(self.server.url('/echo'), data=pieces))
+        self.assertEqual(resp.data, self.body)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
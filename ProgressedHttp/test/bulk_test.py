@@ -0,0 +1,129 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from ProgressedHttp.bulk import *
+from ProgressedHttp.cli import main, read_manifest
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class BulkTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.directory = tempfile.mkdtemp()
+        self.bodies = {}
+        for i in range(20):
+            body = os.urandom(10000 + i * 1000)
+            self.bodies['/file{}'.format(i)] = body
+            self.server.route('/file{}'.format(i), Reply(body, chunked=bool(i % 2)))
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def items(self):
+        return [(self.server.url(k), os.path.join(self.directory, k[1:])) for k in sorted(self.bodies)]
+
+    def check(self, summary):
+        self.assertEqual(len(summary.succeeded), len(self.bodies))
+        self.assertEqual(summary.total_bytes, sum(len(i) for i in self.bodies.values()))
+        for url, file_path, size in summary.succeeded:
+            with open(file_path, 'rb') as handle:
+                self.assertEqual(handle.read(), self.bodies['/' + os.path.basename(file_path)])
+
+    def test_download_many(self):
+        print("进度条换行")
+        summary = download_many(self.items(), workers=8)
+        self.check(summary)
+        self.assertEqual(summary.failures, [])
+        self.assertTrue(summary.throughput > 0)
+
+    def test_failures(self):
+        items = self.items() + [(self.server.url('/missing'), os.path.join(self.directory, 'missing'))]
+        summary = download_many(items, workers=4, retries=1, mute=True)
+        self.check(summary)
+        self.assertEqual(summary.failures, [(self.server.url('/missing'), 'HTTP 404 Not Found')])
+        self.assertEqual(len([i for i in self.server.requests if i.path == '/missing']), 2)
+        self.assertIn('1 failed', summary.report())
+
+    def test_retry(self):
+        attempts = []
+
+        def flaky(req):
+            attempts.append(req)
+            if len(attempts) < 3:
+                return Reply(b'x' * 10, headers=[('Content-Length', 100)], close=True)
+            return Reply(b'x' * 100)
+
+        self.server.route('/flaky', flaky)
+        summary = download_many([(self.server.url('/flaky'), os.path.join(self.directory, 'flaky'))],
+                                retries=2, mute=True)
+        self.assertEqual(summary.failures, [])
+        self.assertEqual(sorted(os.listdir(self.directory)), ['flaky'])
+
+    def test_per_host(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow(req):
+            with lock:
+                running.append(req)
+                peak.append(len(running))
+            reply = Reply(b'x' * 1000, piece=100, delay=0.005)
+            for _ in reply.pieces():
+                pass
+            with lock:
+                running.remove(req)
+            return reply
+
+        self.server.route('/slow', slow)
+        items = [(self.server.url('/slow'), os.path.join(self.directory, str(i))) for i in range(12)]
+        summary = download_many(items, workers=8, per_host=2, mute=True)
+        self.assertEqual(len(summary.succeeded), 12)
+        self.assertTrue(max(peak) <= 2)
+
+    def test_per_host_skips_saturated(self):
+        arrived = {}
+
+        def slow(req):
+            arrived.setdefault(req.path, time.time())
+            time.sleep(0.5)
+            return Reply(b'x' * 100)
+
+        self.server.route('/slow', slow)
+        self.server.route('/fast', lambda req: arrived.setdefault(req.path, time.time()) and Reply(b'y' * 100))
+        other = self.server.url('/fast').replace('127.0.0.1', 'localhost')
+        items = [(self.server.url('/slow'), os.path.join(self.directory, 'a')),
+                 (self.server.url('/slow'), os.path.join(self.directory, 'b')),
+                 (other, os.path.join(self.directory, 'c'))]
+        start = time.time()
+        summary = download_many(items, workers=2, per_host=1, mute=True)
+        self.assertEqual(len(summary.succeeded), 3)
+        # 第二个 worker 跳过已达上限的 host，不用等第一个慢请求结束
+        self.assertLess(arrived['/fast'] - start, 0.4)
+
+    def test_cli(self):
+        manifest = os.path.join(self.directory, 'manifest.txt')
+        output = os.path.join(self.directory, 'output')
+        with open(manifest, 'w') as handle:
+            handle.write("# comment\n\n")
+            for k in sorted(self.bodies):
+                handle.write("{}\n".format(self.server.url(k)))
+            handle.write("{} renamed\n".format(self.server.url('/file0')))
+        self.assertEqual(read_manifest(manifest, output)[-1],
+                         (self.server.url('/file0'), os.path.join(output, 'renamed')))
+        self.assertEqual(main(['fetch', manifest, '-j', '4', '-o', output, '-q']), 0)
+        self.assertEqual(len(os.listdir(output)), len(self.bodies) + 1)
+        with open(os.path.join(output, 'renamed'), 'rb') as handle:
+            self.assertEqual(handle.read(), self.bodies['/file0'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
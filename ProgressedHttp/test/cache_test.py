@@ -0,0 +1,165 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.cache import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+def conditional(body, etag, headers=None):
+    """
+    支持 If-None-Match 的响应
+    """
+    def reply(req):
+        base = [('ETag', etag)] + list(headers or [])
+        if req.headers.get('if-none-match') == etag:
+            return Reply(b'', '304 Not Modified', base + [('Content-Length', '0')])
+        return Reply(body, headers=base)
+    return reply
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(20000)
+        self.server.route('/fresh', Reply(self.body, headers=[('Cache-Control', 'max-age=60')]))
+        self.server.route('/etag', conditional(self.body, '"v1"', [('Cache-Control', 'no-cache')]))
+        self.server.route('/short', conditional(self.body, '"v1"', [('Cache-Control', 'max-age=1')]))
+        self.server.route('/store', Reply(self.body, headers=[('Cache-Control', 'no-store'), ('ETag', '"v1"')]))
+        self.server.route('/vary', lambda req: Reply(req.headers.get('accept-language', '').encode(), headers=[
+            ('Cache-Control', 'max-age=60'), ('Vary', 'Accept-Language')]))
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def fetch(self, cache, path, **kwargs):
+        kwargs.setdefault('disable_progress', True)
+        return get(self.server.url(path), cache=cache, **kwargs)
+
+    def test_fresh(self):
+        cache = MemoryCache()
+        for _ in range(3):
+            self.assertEqual(self.fetch(cache, '/fresh').data, self.body)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_revalidate(self):
+        cache = MemoryCache()
+        first = self.fetch(cache, '/etag')
+        second = self.fetch(cache, '/etag')
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.data, self.body)
+        self.assertEqual(second.status['code'], b'200')
+        self.assertEqual(self.server.requests[-1].headers['if-none-match'], '"v1"')
+        self.assertEqual(cache.stats()['revalidated'], 1)
+
+    def test_revalidated_size(self):
+        def growing(req):
+            # 每次 304 带回更长的响应头
+            headers = [('ETag', '"v1"'), ('Cache-Control', 'no-cache'),
+                       ('X-Served', 'x' * 100 * len(self.server.requests))]
+            if req.headers.get('if-none-match') == '"v1"':
+                return Reply(b'', '304 Not Modified', headers + [('Content-Length', '0')])
+            return Reply(self.body, headers=headers)
+
+        self.server.route('/grow', growing)
+        cache = MemoryCache()
+        for _ in range(4):
+            self.assertEqual(self.fetch(cache, '/grow').data, self.body)
+            self.assertEqual(cache.size, sum(i.size for i in cache.entries.values()))
+        self.assertEqual(cache.stats()['revalidated'], 3)
+
+    def test_expired(self):
+        cache = MemoryCache()
+        self.fetch(cache, '/short')
+        self.fetch(cache, '/short')
+        self.assertEqual(len(self.server.requests), 1)
+        time.sleep(1.1)
+        self.assertEqual(self.fetch(cache, '/short').data, self.body)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIn('if-none-match', self.server.requests[-1].headers)
+
+    def test_no_store(self):
+        cache = MemoryCache()
+        self.fetch(cache, '/store')
+        self.fetch(cache, '/store')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertNotIn('if-none-match', self.server.requests[-1].headers)
+
+    def test_vary(self):
+        cache = MemoryCache()
+        self.assertEqual(self.fetch(cache, '/vary', headers={'Accept-Language': 'en'}).data, b'en')
+        self.assertEqual(self.fetch(cache, '/vary', headers={'accept-language': 'en'}).data, b'en')
+        self.assertEqual(self.fetch(cache, '/vary', headers={'Accept-Language': 'zh'}).data, b'zh')
+        self.assertEqual(len(self.server.requests), 2)
+        # 不同的值分别缓存，交替请求不会互相替换
+        for language in ('en', 'zh', 'en', 'zh'):
+            self.assertEqual(self.fetch(cache, '/vary', headers={'Accept-Language': language}).data,
+                             language.encode())
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def test_lru(self):
+        cache = MemoryCache(max_bytes=50000)
+        for path in ('/fresh', '/etag', '/short'):
+            self.fetch(cache, path)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertLessEqual(cache.size, 50000)
+        self.assertNotIn('GET ' + self.server.url('/fresh'), cache.entries)
+
+    def test_file_target(self):
+        cache = MemoryCache()
+        file_path = os.path.join(self.directory, 'target.data')
+        for _ in range(3):
+            resp = self.fetch(cache, '/etag', file_path=file_path, overwrite=True)
+            self.assertEqual(resp.file_handle.name, file_path)
+        with open(file_path, 'rb') as handle:
+            self.assertEqual(handle.read(), self.body)
+        self.assertEqual(cache.stats()['revalidated'], 2)
+        self.assertEqual(cache.size, len(cache.entries['GET ' + self.server.url('/etag')].head))
+
+        # 本地文件被修改后重新下载
+        with open(file_path, 'wb') as handle:
+            handle.write(b'changed')
+        self.fetch(cache, '/etag', file_path=file_path, overwrite=True)
+        self.assertNotIn('if-none-match', self.server.requests[-1].headers)
+        with open(file_path, 'rb') as handle:
+            self.assertEqual(handle.read(), self.body)
+
+    def test_disk(self):
+        directory = os.path.join(self.directory, 'cache')
+        cache = DiskCache(directory)
+        self.fetch(cache, '/fresh')
+        self.fetch(cache, '/etag')
+        self.assertIsNone(cache.entries['GET ' + self.server.url('/fresh')].body)
+
+        cache = DiskCache(directory)
+        self.assertEqual(self.fetch(cache, '/fresh').data, self.body)
+        self.assertEqual(self.fetch(cache, '/etag').data, self.body)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['revalidated'], 1)
+        for language in ('en', 'zh'):
+            self.fetch(cache, '/vary', headers={'Accept-Language': language})
+
+        # 重新加载后按 Vary 找到对应的缓存
+        cache = DiskCache(directory)
+        for language in ('zh', 'en'):
+            self.assertEqual(self.fetch(cache, '/vary', headers={'Accept-Language': language}).data,
+                             language.encode())
+        self.assertEqual(len(self.server.requests), 5)
+        cache.clear()
+        self.assertEqual(os.listdir(directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
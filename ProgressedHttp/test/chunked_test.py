@@ -0,0 +1,70 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import unittest
+
+from ProgressedHttp.chunked import *
+
+
+def encode(body, sizes):
+    data = b''
+    offset = index = 0
+    while offset < len(body):
+        size = sizes[index % len(sizes)]
+        data += b'%x\r\n' % len(body[offset: offset + size]) + body[offset: offset + size] + b'\r\n'
+        offset += size
+        index += 1
+    return data + b'0\r\n\r\n'
+
+
+class ChunkedTest(unittest.TestCase):
+    def decode(self, data, piece):
+        result = bytearray()
+        decoder = ChunkedDecoder(result.extend)
+        done = False
+        for i in range(0, len(data), piece):
+            done = decoder.feed(data[i: i + piece])
+        self.assertTrue(done)
+        return decoder, bytes(result)
+
+    def test_piece_sizes(self):
+        body = os.urandom(100000)
+        data = encode(body, [1, 7, 4096, 65536])
+        for piece in (1, 2, 3, 100, 4096, len(data)):
+            decoder, result = self.decode(data, piece)
+            self.assertEqual(result, body, piece)
+            self.assertEqual(decoder.received, len(body))
+
+    def test_terminator_in_payload(self):
+        body = b'0\r\n\r\n' * 1000
+        decoder, result = self.decode(encode(body, [5, 3000]), 5)
+        self.assertEqual(result, body)
+
+    def test_extension_and_trailers(self):
+        data = b'5;name=value\r\nhello\r\n0\r\nExpires: never\r\nX-Sum: 1\r\n\r\nHTTP/1.1'
+        decoder, result = self.decode(data, 4)
+        self.assertEqual(result, b'hello')
+        self.assertEqual(decoder.trailers, [b'Expires: never', b'X-Sum: 1'])
+        self.assertEqual(decoder.leftover, b'')
+
+        decoder, result = self.decode(data, len(data))
+        self.assertEqual(decoder.leftover, b'HTTP/1.1')
+
+    def test_end_offset(self):
+        buf = bytearray(b'3\r\nabc\r\n0\r\n\r\n' + b'\x00' * 10)
+        result = bytearray()
+        decoder = ChunkedDecoder(result.extend)
+        self.assertTrue(decoder.feed(buf, len(buf) - 10))
+        self.assertEqual(result, b'abc')
+        self.assertEqual(decoder.leftover, b'')
+
+    def test_invalid(self):
+        self.assertRaises(Exception, ChunkedDecoder(lambda x: x).feed, b'zz\r\n')
+        self.assertRaises(Exception, ChunkedDecoder(lambda x: x).feed, b'1\r\nab\r\n')
+        for size in (b'-5', b'+5', b'0x5', b'5_0', b' ', b'', b'5 5'):
+            self.assertRaises(Exception, ChunkedDecoder(lambda x: x).feed, size + b'\r\nhello\r\n0\r\n\r\n')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
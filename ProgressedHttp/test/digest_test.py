@@ -0,0 +1,187 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import io
+import os
+import gzip
+import base64
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.cache import MemoryCache
+from ProgressedHttp.session import Session
+from ProgressedHttp.digest import *
+from ProgressedHttp.headers import Headers
+from ProgressedHttp.resume import ResumeState
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+def b64(digest):
+    return base64.b64encode(digest).decode()
+
+
+class DigestsTest(unittest.TestCase):
+    def test_expected_formats(self):
+        body = b'hello world'
+        md5 = hashlib.md5(body).hexdigest()
+        sha256 = hashlib.sha256(body).hexdigest()
+        for expected in (md5, 'md5:' + md5, 'SHA-256:' + sha256, {'sha256': sha256, 'md5': md5}):
+            digests = Digests(expected=expected)
+            digests.update(memoryview(body))
+            self.assertEqual(digests.verify(), '', expected)
+            self.assertTrue(digests.verified)
+        digests = Digests(['sha1'], expected='md5:' + '0' * 32)
+        digests.update(body)
+        self.assertIn('expected md5', digests.verify())
+        self.assertFalse(digests.verified)
+        self.assertEqual(digests.hexdigests(), {'sha1': hashlib.sha1(body).hexdigest(), 'md5': md5})
+        self.assertRaises(Exception, Digests, ['nope'])
+
+    def test_nothing_to_verify(self):
+        digests = Digests(['md5'])
+        self.assertEqual(digests.verify(), '')
+        self.assertIsNone(digests.verified)
+
+    def test_header_digests(self):
+        body = b'hello world'
+        headers = Headers('Content-MD5: {}\r\nDigest: SHA={}, UNIXsum=30637, SHA-256={}\r\n'
+                          'Repr-Digest: sha-512=:{}:\r\n'.format(
+                              b64(hashlib.md5(body).digest()), b64(hashlib.sha1(body).digest()),
+                              b64(hashlib.sha256(body).digest()), b64(hashlib.sha512(body).digest())).encode())
+        self.assertEqual(header_digests(headers), {
+            'md5': hashlib.md5(body).digest(),
+            'sha1': hashlib.sha1(body).digest(),
+            'sha256': hashlib.sha256(body).digest(),
+            'sha512': hashlib.sha512(body).digest()
+        })
+        self.assertEqual(header_digests(Headers(b'Content-MD5: ###\r\n')), {})
+
+
+class DigestResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(300 * 1024)
+        self.md5 = hashlib.md5(self.body).hexdigest()
+        self.sha256 = hashlib.sha256(self.body).hexdigest()
+        out = io.BytesIO()
+        with gzip.GzipFile(fileobj=out, mode='wb') as handle:
+            handle.write(self.body)
+        content_md5 = [('Content-MD5', b64(hashlib.md5(self.body).digest()))]
+        self.server.route('/plain', Reply(self.body))
+        self.server.route('/chunked', Reply(self.body, chunked=True, chunk_size=[3, 70000, 5, 4096]))
+        self.server.route('/md5', Reply(self.body, headers=content_md5))
+        self.server.route('/bad-md5', Reply(self.body, headers=[('Content-MD5', b64(b'0' * 16))]))
+        self.server.route('/bad-digest', Reply(self.body, chunked=True,
+                                               headers=[('Digest', 'SHA-256=' + b64(b'0' * 32))]))
+        self.server.route('/gzip', Reply(out.getvalue(), headers=[('Content-Encoding', 'gzip')] + content_md5))
+        self.server.route('/short', Reply(self.body, headers=[('Content-Length', len(self.body) + 100)], close=True))
+        self.server.route('/fresh', Reply(self.body, headers=[('Cache-Control', 'max-age=60')] + content_md5))
+        self.server.route('/etag', self.conditional)
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'out.data')
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def conditional(self, req):
+        headers = [('ETag', '"v1"'), ('Cache-Control', 'no-cache')]
+        if req.headers.get('if-none-match') == '"v1"':
+            return Reply(b'', '304 Not Modified', headers + [('Content-Length', '0')])
+        return Reply(self.body, headers=headers)
+
+    def test_hash_while_receiving(self):
+        for path in ('/plain', '/chunked'):
+            for options in ({}, {'adaptive': True}, {'file_path': self.file_path, 'overwrite': True},
+                            {'file_path': self.file_path, 'overwrite': True, 'preallocate': True}):
+                resp = get(self.server.url(path), hash_algorithms=['md5', 'sha256'], disable_progress=True, **options)
+                self.assertEqual(resp.digests, {'md5': self.md5, 'sha256': self.sha256}, (path, options))
+                self.assertIsNone(resp.verified)
+
+    def test_stream(self):
+        resp = get(self.server.url('/chunked'), expected_digest=self.sha256, stream=True)
+        self.assertEqual(b''.join(resp.iter_content()), self.body)
+        self.assertTrue(resp.verified)
+
+    def test_expected_digest(self):
+        resp = get(self.server.url('/plain'), file_path=self.file_path, expected_digest='sha256:' + self.sha256,
+                   disable_progress=True)
+        self.assertTrue(resp.verified)
+        self.assertTrue(os.path.exists(self.file_path))
+        os.remove(self.file_path)
+        with self.assertRaises(DigestMismatch):
+            get(self.server.url('/plain'), file_path=self.file_path, expected_digest='md5:' + '0' * 32,
+                disable_progress=True)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_session(self):
+        # 摘要不匹配时不归还连接
+        with Session() as session:
+            with self.assertRaises(DigestMismatch):
+                session.get(self.server.url('/plain'), expected_digest='md5:' + '0' * 32, disable_progress=True)
+            self.assertEqual(session.pool.stats()['idle'], 0)
+            resp = session.get(self.server.url('/plain'), expected_digest=self.md5, disable_progress=True)
+            self.assertTrue(resp.verified)
+            self.assertEqual(session.pool.stats()['idle'], 1)
+
+    def test_truncated_body(self):
+        for options in ({'file_path': self.file_path}, {'file_path': self.file_path, 'preallocate': True},
+                        {'file_path': self.file_path, 'atomic': True}, {}):
+            with self.assertRaises(DigestMismatch):
+                get(self.server.url('/short'), expected_digest=self.sha256, disable_progress=True, **options)
+            self.assertEqual(os.listdir(self.directory), [], options)
+        # 没有期望的摘要时只计算，不完整的实体照常返回
+        resp = get(self.server.url('/short'), hash_algorithms=['md5'], disable_progress=True)
+        self.assertFalse(resp.complete)
+        self.assertIsNone(resp.verified)
+
+    def test_cache(self):
+        cache = MemoryCache()
+        for path in ('/fresh', '/etag'):
+            get(self.server.url(path), cache=cache, disable_progress=True)
+            resp = get(self.server.url(path), cache=cache, expected_digest=self.md5, disable_progress=True)
+            self.assertTrue(resp.from_cache, path)
+            self.assertTrue(resp.verified, path)
+            self.assertEqual(resp.digests, {'md5': self.md5})
+            with self.assertRaises(DigestMismatch):
+                get(self.server.url(path), cache=cache, expected_digest='md5:' + '0' * 32, file_path=self.file_path,
+                    disable_progress=True)
+            self.assertEqual(os.listdir(self.directory), [])
+        # 缓存响应头中的摘要
+        resp = get(self.server.url('/fresh'), cache=cache, verify_digest=True, disable_progress=True)
+        self.assertTrue(resp.from_cache)
+        self.assertTrue(resp.verified)
+
+    def test_header_digest(self):
+        resp = get(self.server.url('/md5'), verify_digest=True, disable_progress=True)
+        self.assertTrue(resp.verified)
+        self.assertEqual(resp.digests, {'md5': self.md5})
+        for path in ('/bad-md5', '/bad-digest'):
+            with self.assertRaises(DigestMismatch):
+                get(self.server.url(path), file_path=self.file_path, verify_digest=True, disable_progress=True)
+            self.assertEqual(os.listdir(self.directory), [])
+        # 解压之后的实体与响应头中的摘要对不上，不校验
+        resp = get(self.server.url('/gzip'), compress=True, hash_algorithms=['md5'], disable_progress=True)
+        self.assertEqual(resp.data, self.body)
+        self.assertIsNone(resp.verified)
+
+    def test_resume(self):
+        file_path = os.path.join(self.directory, 'resume.data')
+        with open(file_path, 'wb') as handle:
+            handle.write(self.body[:100000])
+        state = ResumeState(file_path, self.server.url('/plain'))
+        state.etag = 'etag'
+        state.save(100000)
+        self.server.route('/plain', Reply(self.body, headers=[('ETag', 'etag')]))
+        resp = get(self.server.url('/plain'), file_path=file_path, resume=True, expected_digest=self.md5,
+                   disable_progress=True)
+        self.assertTrue(resp.verified)
+        with open(file_path, 'rb') as handle:
+            self.assertEqual(handle.read(), self.body)
+
+
+if __name__ == '__main__':
+    unittest.main()
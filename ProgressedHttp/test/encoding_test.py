@@ -0,0 +1,88 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import zlib
+import tempfile
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.encoding import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+def gzip_compress(data):
+    obj = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return obj.compress(data) + obj.flush()
+
+
+def raw_deflate(data):
+    obj = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return obj.compress(data) + obj.flush()
+
+
+class EncodingTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = b''.join(b'line %d of a very compressible log\n' % i for i in range(50000))
+        self.server.route('/gzip', Reply(gzip_compress(self.body), headers=[('Content-Encoding', 'gzip')]))
+        self.server.route('/gzip-chunked', Reply(gzip_compress(self.body), headers=[('Content-Encoding', 'gzip')],
+                                                 chunked=True, chunk_size=[1, 1000, 7]))
+        self.server.route('/deflate', Reply(zlib.compress(self.body), headers=[('Content-Encoding', 'deflate')]))
+        self.server.route('/raw-deflate', Reply(raw_deflate(self.body), headers=[('Content-Encoding', 'deflate')]))
+        self.server.route('/deflate-chunked', Reply(zlib.compress(self.body), headers=[('Content-Encoding', 'deflate')],
+                                                    chunked=True, chunk_size=[1, 1000, 7]))
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_decoder(self):
+        data = gzip_compress(self.body)
+        decoder = ContentDecoder.create(b'gzip')
+        result = b''.join(decoder.decompress(data[i: i + 10]) for i in range(0, len(data), 10)) + decoder.flush()
+        self.assertEqual(result, self.body)
+        # 接收循环传入的是 memoryview 切片
+        for encoding, data in ((b'gzip', data), (b'deflate', raw_deflate(self.body))):
+            view = memoryview(data)
+            decoder = ContentDecoder.create(encoding)
+            result = b''.join(decoder.decompress(view[i: i + 999]) for i in range(0, len(view), 999))
+            self.assertEqual(result + decoder.flush(), self.body)
+        # 第一段只有 1 个字节时还不能判断是否带 zlib 头
+        for data in (zlib.compress(self.body), raw_deflate(self.body)):
+            decoder = ContentDecoder.create(b'deflate')
+            result = decoder.decompress(data[:1]) + decoder.decompress(data[1:])
+            self.assertEqual(result + decoder.flush(), self.body)
+        self.assertIsNone(ContentDecoder.create(b'identity'))
+        self.assertIsNone(ContentDecoder.create(None))
+
+    def test_in_memory(self):
+        for path in ('/gzip', '/gzip-chunked', '/deflate', '/raw-deflate', '/deflate-chunked'):
+            resp = get(self.server.url(path), compress=True, disable_progress=True)
+            self.assertEqual(resp.data, self.body, path)
+            self.assertEqual(resp.received, len(self.body))
+            self.assertTrue(resp.wire < resp.received / 5)
+            self.assertEqual(self.server.requests[-1].headers['accept-encoding'], ACCEPT_ENCODING)
+
+    def test_not_negotiated(self):
+        resp = get(self.server.url('/gzip'), disable_progress=True)
+        self.assertEqual(resp.data, gzip_compress(self.body))
+        self.assertNotIn('accept-encoding', self.server.requests[-1].headers)
+
+    def test_downloading(self):
+        file_path = os.path.join(tempfile.gettempdir(), 'gzip.data')
+        for path in ('/gzip', '/gzip-chunked'):
+            resp = get(self.server.url(path), compress=True, file_path=file_path, overwrite=True,
+                       disable_progress=True)
+            with open(file_path, 'rb') as handle:
+                content = handle.read()
+            os.remove(file_path)
+            self.assertEqual(content, self.body, path)
+
+    def test_stream(self):
+        for path in ('/gzip', '/gzip-chunked'):
+            resp = get(self.server.url(path), compress=True, stream=True)
+            self.assertEqual(b''.join(resp.iter_content(1000)), self.body, path)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,96 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.headers import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+HEAD = (b'HTTP/1.1 302 Found\r\n'
+        b'Location: http://example.com:8080/a?b=c\r\n'
+        b'Date: Sun, 18 Oct 2026 10:00:00 GMT\r\n'
+        b'set-cookie: a=1; Path=/\r\n'
+        b'Set-Cookie: b=2\r\n'
+        b'X-Folded: first\r\n'
+        b' second\r\n'
+        b'ETag: "v1"\r\n'
+        b'\r\nbody')
+
+
+class HeadParserTest(unittest.TestCase):
+    def test_byte_by_byte(self):
+        parser = HeadParser()
+        done = [parser.feed(HEAD[i: i + 1]) for i in range(len(HEAD))]
+        self.assertEqual(done.index(True), HEAD.index(b'\r\n\r\n') + 3)
+        self.assertEqual(parser.leftover(), b'body')
+
+    def test_status(self):
+        parser = HeadParser()
+        self.assertTrue(parser.feed(HEAD))
+        self.assertEqual(parser.status(), {'status': b'HTTP/1.1 302 Found', 'code': b'302', 'version': b'HTTP/1.1'})
+        self.assertEqual(parser.raw, HEAD[:-4])
+        self.assertEqual(parser.leftover(), b'body')
+
+        parser = HeadParser()
+        parser.feed(b'HTTP/1.1 204 No Content\r\n\r\n')
+        self.assertEqual(len(parser.headers()), 0)
+
+        parser = HeadParser()
+        parser.feed(b'garbage\r\n\r\n')
+        self.assertRaises(Exception, parser.status)
+
+    def test_max_size(self):
+        parser = HeadParser(max_size=100)
+        self.assertFalse(parser.feed(b'HTTP/1.1 200 OK\r\n'))
+        self.assertRaises(Exception, parser.feed, b'X-Long: ' + b'a' * 100)
+        parser = HeadParser(max_size=100)
+        self.assertRaises(Exception, parser.feed, b'HTTP/1.1 200 OK\r\nX: ' + b'a' * 100 + b'\r\n\r\n')
+
+
+class HeadersTest(unittest.TestCase):
+    def setUp(self):
+        parser = HeadParser()
+        parser.feed(HEAD)
+        self.headers = parser.headers()
+
+    def test_lazy(self):
+        headers = Headers(b'Content-Length: 10\r\nX-Url: http://a:1/b\r\nx-url: c')
+        self.assertIn(b'content-length', headers)
+        self.assertEqual(headers[b'Content-Length'], b'10')
+        self.assertEqual(headers.get_all(b'X-URL'), [b'http://a:1/b', b'c'])
+        self.assertNotIn(b'Length', headers)
+        self.assertIsNone(headers.fields)
+        self.assertEqual(headers.keys(), [b'Content-Length', b'X-Url'])
+        self.assertIsNotNone(headers.fields)
+        # 有折叠写法时直接完整解析
+        self.assertEqual(self.headers[b'X-Folded'], b'first second')
+
+    def test_values(self):
+        self.assertEqual(self.headers[b'Location'], b'http://example.com:8080/a?b=c')
+        self.assertEqual(self.headers['date'], b'Sun, 18 Oct 2026 10:00:00 GMT')
+        self.assertEqual(self.headers.get(b'X-Folded'), b'first second')
+        self.assertEqual(self.headers.get_all('SET-COOKIE'), [b'a=1; Path=/', b'b=2'])
+        self.assertEqual(self.headers[b'Set-Cookie'], b'a=1; Path=/, b=2')
+        self.assertIsNone(self.headers.get(b'Missing'))
+        self.assertRaises(KeyError, lambda: self.headers[b'Missing'])
+
+    def test_dict_compatible(self):
+        self.assertEqual(list(self.headers), [b'Location', b'Date', b'Set-Cookie', b'X-Folded', b'Etag'])
+        self.assertEqual(dict(self.headers)[b'Etag'], b'"v1"')
+        self.assertEqual(len(self.headers.multi_items()), 6)
+        self.assertEqual(Headers(b'A: 1\r\nb: 2'), {b'a': b'1', 'B': b'2'})
+
+
+class SplitHeadTest(unittest.TestCase):
+    def test_split_head(self):
+        with LocalServer() as server:
+            server.route('/', Reply(b'x' * 100, piece=7, delay=0.005, headers=[('Location', 'http://a:1/b')]))
+            resp = get(server.url('/'), disable_progress=True)
+            self.assertEqual(resp.status['code'], b'200')
+            self.assertEqual(resp.data, b'x' * 100)
+            self.assertEqual(resp.headers[b'Location'], b'http://a:1/b')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
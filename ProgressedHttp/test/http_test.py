@@ -1,6 +1,7 @@
 # coding=utf8
 from __future__ import absolute_import, division, print_function
 
+import io
 import os
 import unittest
 import hashlib
@@ -8,6 +9,7 @@ import tempfile
 
 from ProgressedHttp.http import *
 from ProgressedHttp.http import quote
+from ProgressedHttp.test.server import LocalServer, Reply
 
 
 class HTTPTest(unittest.TestCase):
@@ -85,6 +87,7 @@ class HTTPTest(unittest.TestCase):
         href += '?name={}'.format(quote('中文'))
 
         self.assertEqual(result['request'], "{method} {href} HTTP/1.1".format(method=method.upper(), href=href))
+        self.assertEqual(result['entity'], '')
 
     def test_http_parser_simple_get(self):
         parser = HTTPCons.http_parser
@@ -244,6 +247,136 @@ class HTTPTest(unittest.TestCase):
                          "请保持数据获取正确完整，" + self.chunked_info(resp))
 
 
+class LocalHTTPTest(unittest.TestCase):
+    """
+    本地服务上的响应测试，不依赖外部网络
+    """
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(300000)
+        self.server.route('/plain', Reply(self.body))
+        self.server.route('/chunked', Reply(self.body, chunked=True, chunk_size=[1, 65536, 4095, 10240]))
+        self.server.route('/short', Reply(self.body, headers=[('Content-Length', len(self.body) + 100)], close=True))
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_in_memory(self):
+        for path in ('/plain', '/chunked'):
+            resp = get(self.server.url(path), disable_progress=True)
+            self.assertEqual(resp.data, self.body, path)
+            self.assertIsInstance(resp.body, memoryview)
+            self.assertEqual(len(resp.body), len(self.body))
+
+    def test_preallocated_buffer(self):
+        resp = get(self.server.url('/plain'), disable_progress=True, chunk=1000)
+        self.assertEqual(len(resp.buffer), len(self.body))
+        self.assertEqual(resp.data, self.body)
+
+    def test_preallocation_cap(self):
+        self.server.route('/huge', Reply(self.body, headers=[('Content-Length', 10 ** 12)], close=True))
+        resp = get(self.server.url('/huge'), disable_progress=True)
+        self.assertFalse(resp.complete)
+        self.assertLessEqual(len(resp.buffer), SockFeed.max_preallocate)
+        self.assertEqual(resp.data, self.body)
+
+        original = SockFeed.max_preallocate
+        SockFeed.max_preallocate = 4096  # 超过上限之后边接收边扩容
+        try:
+            for options in ({'chunk': 1000}, {'chunk': 65536}, {'adaptive': True}):
+                resp = get(self.server.url('/plain'), disable_progress=True, **options)
+                self.assertEqual(resp.data, self.body, options)
+                self.assertEqual(len(resp.buffer), len(self.body))
+        finally:
+            SockFeed.max_preallocate = original
+
+    def test_short_body(self):
+        resp = get(self.server.url('/short'), disable_progress=True)
+        self.assertEqual(len(resp.buffer), len(self.body) + 100)
+        self.assertEqual(resp.data, self.body)
+
+    def test_downloading(self):
+        file_path = os.path.join(tempfile.gettempdir(), 'local.data')
+        for path in ('/plain', '/chunked'):
+            resp = get(self.server.url(path), disable_progress=True, file_path=file_path, overwrite=True)
+            with open(file_path, 'rb') as handle:
+                content = handle.read()
+            os.remove(resp.file_handle.name)
+            self.assertEqual(content, self.body, path)
+            self.assertEqual(resp.data, b'')
+
+    def test_post_entity(self):
+        self.server.route('/echo', lambda req: Reply(req.body, headers=[
+            ('X-Length', req.headers.get('content-length', '')),
+            ('X-Encoding', req.headers.get('transfer-encoding', ''))]))
+        url = self.server.url('/echo')
+
+        resp = post(url, data=u'中文', disable_progress=True)
+        self.assertEqual(resp.data, u'中文'.encode('utf8'))
+        self.assertEqual(resp.headers[b'X-Length'], b'6')
+
+        resp = post(url, data=self.body, disable_progress=True)
+        self.assertEqual(resp.data, self.body)
+
+        resp = post(url, data=io.BytesIO(self.body), disable_progress=True)
+        self.assertEqual(resp.data, self.body)
+        self.assertEqual(resp.headers[b'X-Length'], str(len(self.body)).encode())
+
+        resp = post(url, data=(self.body[i: i + 1000] for i in range(0, len(self.body), 1000)),
+                    disable_progress=True)
+        self.assertEqual(resp.data, self.body)
+        self.assertEqual(resp.headers[b'X-Encoding'], b'chunked')
+
+    def test_post_debug(self):
+        print("调试输出")
+        self.server.route('/echo', lambda req: Reply(req.body))
+        for data in (b'abc\xff', u'中文'):
+            resp = post(self.server.url('/echo'), data=data, debug=True, disable_progress=True)
+            self.assertEqual(resp.data, data if isinstance(data, bytes) else data.encode('utf8'))
+
+    def test_post_file(self):
+        self.server.route('/echo', lambda req: Reply(req.body))
+        file_path = os.path.join(tempfile.gettempdir(), 'upload.data')
+        with open(file_path, 'wb') as handle:
+            handle.write(self.body)
+        with open(file_path, 'rb') as handle:
+            handle.seek(100)
+            resp = post(self.server.url('/echo'), data=handle, disable_progress=True)
+        os.remove(file_path)
+        self.assertEqual(resp.data, self.body[100:])
+
+    def test_stream(self):
+        for path in ('/plain', '/chunked'):
+            resp = get(self.server.url(path), stream=True)
+            self.assertEqual(resp.status['code'], b'200')
+            pieces = list(resp.iter_content(5000))
+            self.assertTrue(all(0 < len(i) <= 5000 for i in pieces))
+            self.assertEqual(b''.join(pieces), self.body, path)
+            self.assertEqual(len(resp.buffer), 0)
+            self.assertTrue(resp.complete)
+
+    def test_stream_lines(self):
+        lines = [os.urandom(i).replace(b'\r', b'').replace(b'\n', b'') for i in range(0, 3000, 7)]
+        body = b'\r\n'.join(lines)
+        self.server.route('/lines', Reply(body, chunked=True, chunk_size=[1, 2, 333]))
+        with get(self.server.url('/lines'), stream=True) as resp:
+            self.assertEqual(list(resp.iter_lines(100, b'\r\n')), lines)
+
+    def test_stream_readinto(self):
+        resp = get(self.server.url('/chunked'), stream=True)
+        buf = bytearray(7777)
+        result = bytearray()
+        size = resp.readinto(buf)
+        while size:
+            result += buf[:size]
+            size = resp.readinto(buf)
+        self.assertEqual(result, self.body)
+
+        resp = get(self.server.url('/plain'), stream=True)
+        self.assertEqual(resp.read(10), self.body[:10])
+        self.assertEqual(resp.read(), self.body[10:])
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
 
@@ -0,0 +1,93 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 只在用到时才需要的重量级依赖
+HEAVY = ('ssl', '_ssl', 'subprocess', 'urllib.request', 'urllib.parse', 'http.client', 'email.parser', 'json',
+         'hashlib', 'tempfile')
+
+# 同一进程中随后导入的标准库模块，作为导入耗时的参照，机器负载对两者的影响相近
+BASELINE = 'http.client'
+
+
+def run(code, *options):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='')
+    return subprocess.check_output([sys.executable] + list(options) + ['-c', code], cwd=ROOT, env=env,
+                                   stderr=subprocess.STDOUT).decode()
+
+
+def imported(statement):
+    """
+    :param statement: str
+    :return: set => 执行 statement 新导入的模块
+    """
+    code = "import sys, json; before = set(sys.modules); {}; print(json.dumps(sorted(set(sys.modules) - before)))"
+    return set(json.loads(run(code.format(statement)).strip().splitlines()[-1]))
+
+
+def import_tree(*modules):
+    """
+    :param modules: str => 依次导入的模块
+    :return: dict => python -X importtime 统计的 {模块名: (自身耗时, 累计耗时)}(微秒)，-S 排除 site 的导入
+    """
+    result = {}
+    for line in run('; '.join('import ' + i for i in modules), '-S', '-X', 'importtime').splitlines():
+        parts = [i.strip() for i in line.split('|')]
+        if len(parts) == 3 and parts[1].isdigit():
+            result[parts[2]] = (int(parts[0].split(':')[-1]), int(parts[1]))
+    for module in modules:
+        if module not in result:
+            raise Exception("{} not found in importtime output".format(module))
+    return result
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime and module __getattr__ need python 3.7+")
+class ImportTimeTest(unittest.TestCase):
+    def test_package_is_lazy(self):
+        modules = imported('import ProgressedHttp')
+        self.assertNotIn('ProgressedHttp.http', modules)
+        self.assertNotIn('ProgressedHttp.progress', modules)
+        modules = imported('import ProgressedHttp; ProgressedHttp.session.Session')
+        self.assertIn('ProgressedHttp.http', modules)
+
+    def test_heavy_dependencies_are_lazy(self):
+        for statement in ('import ProgressedHttp.http', 'import ProgressedHttp.session',
+                          'from ProgressedHttp.http import get, post, request'):
+            modules = imported(statement)
+            self.assertEqual(sorted(modules.intersection(HEAVY)), [], statement)
+
+    def test_loaded_on_first_use(self):
+        modules = imported("from ProgressedHttp import tls; tls.context()")
+        self.assertIn('ssl', modules)
+        modules = imported("from ProgressedHttp.http import HTTPCons; "
+                           "HTTPCons.http_parser('a.com', '/', 'GET', None, {'q': 'a b'})")
+        self.assertIn('urllib.parse', modules)
+
+    def test_import_tree(self):
+        tree = import_tree('ProgressedHttp.http')
+        self.assertEqual(sorted(set(tree).intersection(HEAVY)), [])
+
+    def test_import_time(self):
+        # 不使用固定的耗时上限，与同一进程中的参照模块比较，并且没有单个模块占去大部分时间，取多次中最好的一次
+        ratios = []
+        shares = []
+        for _ in range(3):
+            tree = import_tree('ProgressedHttp.http', BASELINE)
+            total = tree['ProgressedHttp.http'][1]
+            ratios.append(total / tree[BASELINE][1])
+            # ProgressedHttp.http 之前输出的是它的导入树，以及 -S 下解释器启动时的少量模块
+            names = list(tree)[:list(tree).index('ProgressedHttp.http') + 1]
+            shares.append(max((tree[i][0] / total, i) for i in names))
+        self.assertLess(min(ratios), 2, ratios)
+        self.assertLess(min(shares)[0], 0.4, shares)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+import threading
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.limiter import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class TokenBucketTest(unittest.TestCase):
+    def drain(self, bucket, total):
+        start = time.time()
+        while total > 0:
+            total -= bucket.reserve(min(total, 65536))
+        return time.time() - start
+
+    def test_unlimited(self):
+        bucket = TokenBucket(0)
+        self.assertEqual(bucket.reserve(1 << 30), 1 << 30)
+        self.assertLess(self.drain(TokenBucket(None), 10 * 1024 * 1024), 0.1)
+
+    def test_rate(self):
+        bucket = TokenBucket(200000, 20000)
+        # 桶里的 20000 个令牌不需要等待
+        elapsed = self.drain(bucket, 120000)
+        self.assertGreater(elapsed, 0.45)
+        self.assertLess(elapsed, 0.7)
+
+    def test_grant_limited_by_burst(self):
+        bucket = TokenBucket(100000, 8192)
+        self.assertEqual(bucket.reserve(65536), 8192)
+        bucket.refund(4096)
+        # 两次预留之间又补充了少量令牌
+        self.assertTrue(4096 <= bucket.reserve(65536) < 4096 + 1000)
+        bucket.refund(1 << 20)
+        self.assertLessEqual(bucket.tokens, 8192)
+
+    def test_set_rate_wakes_waiters(self):
+        bucket = TokenBucket(1000, 4096)
+        bucket.reserve(4096)
+        done = []
+        worker = threading.Thread(target=lambda: done.append(bucket.reserve(4096)))
+        start = time.time()
+        worker.start()
+        time.sleep(0.1)
+        self.assertFalse(done)
+        bucket.set_rate(10 * 1024 * 1024)
+        worker.join(1)
+        self.assertTrue(done)
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_host_limiter(self):
+        limiter = HostLimiter(1000)
+        self.assertIs(limiter.bucket('a.com'), limiter.bucket('a.com'))
+        self.assertIsNot(limiter.bucket('a.com'), limiter.bucket('b.com'))
+        limiter.set_rate(5000, host='b.com')
+        self.assertEqual((limiter.bucket('a.com').rate, limiter.bucket('b.com').rate), (1000, 5000))
+        limiter.set_rate(2000)
+        self.assertEqual([limiter.bucket(i).rate for i in ('a.com', 'b.com', 'c.com')], [2000] * 3)
+        bucket = TokenBucket(1000)
+        self.assertIs(bucket.bucket('a.com'), bucket)
+
+
+class LimitedResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(300 * 1024)
+        self.server.route('/plain', Reply(self.body))
+        self.server.route('/chunked', Reply(self.body, chunked=True, chunk_size=[3, 70000, 5, 4096]))
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_limit_rate(self):
+        for path in ('/plain', '/chunked'):
+            for options in ({}, {'adaptive': True}, {'chunk': 1024 * 1024}):
+                start = time.time()
+                resp = get(self.server.url(path), limit_rate=1024 * 1024, disable_progress=True, **options)
+                elapsed = time.time() - start
+                self.assertEqual(resp.body, self.body)
+                # 300KB 减去 100KB 的桶容量，约 0.2 秒
+                self.assertGreater(elapsed, 0.15, (path, options))
+                self.assertLess(elapsed, 0.5, (path, options))
+
+    def test_stream(self):
+        resp = get(self.server.url('/plain'), limit_rate=1024 * 1024, stream=True)
+        start = time.time()
+        self.assertEqual(b''.join(resp.iter_content(65536)), self.body)
+        self.assertGreater(time.time() - start, 0.15)
+
+    def test_shared(self):
+        limiter = TokenBucket(1024 * 1024)
+        results = []
+
+        def fetch():
+            results.append(get(self.server.url('/plain'), limiter=limiter, disable_progress=True).body)
+
+        workers = [threading.Thread(target=fetch) for _ in range(3)]
+        start = time.time()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.time() - start
+        self.assertEqual(results, [self.body] * 3)
+        # 900KB 共用 1MB/s，约 0.78 秒
+        self.assertGreater(elapsed, 0.6)
+        self.assertLess(elapsed, 1.2)
+
+    def test_throttle_running(self):
+        limiter = HostLimiter(100 * 1024)
+        timer = threading.Timer(0.2, limiter.set_rate, (10 * 1024 * 1024,))
+        timer.start()
+        start = time.time()
+        resp = get(self.server.url('/plain'), limiter=limiter, disable_progress=True)
+        self.assertEqual(resp.body, self.body)
+        # 不调整的话需要约 3 秒
+        self.assertLess(time.time() - start, 0.8)
+        self.assertEqual(list(limiter.buckets), ['127.0.0.1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.output import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class OutputFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'out.data')
+        self.body = os.urandom(300000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, handle, pieces):
+        offset = 0
+        for size in pieces:
+            handle.write(memoryview(self.body)[offset: offset + size])
+            offset += size
+        return offset
+
+    def read(self, path=None):
+        with open(path or self.file_path, 'rb') as handle:
+            return handle.read()
+
+    def test_mmap(self):
+        handle = OutputFile(self.file_path, use_mmap=True)
+        handle.allocate(len(self.body))
+        self.assertIsNotNone(handle.map)
+        self.write(handle, [1, 4096, 100000, 195903])
+        handle.close()
+        self.assertEqual(self.read(), self.body)
+
+    def test_coalesced(self):
+        for use_mmap, allocate in ((False, True), (True, False)):
+            handle = OutputFile(self.file_path, use_mmap=use_mmap, buffer_size=65536)
+            if allocate:
+                handle.allocate(len(self.body))
+            self.write(handle, [3, 70000, 5, 1000] * 3 + [300000 - 71008 * 3])
+            handle.close()
+            self.assertEqual(self.read(), self.body, (use_mmap, allocate))
+
+    def test_short_write_truncated(self):
+        for use_mmap in (True, False):
+            handle = OutputFile(self.file_path, use_mmap=use_mmap)
+            handle.allocate(len(self.body) + 1000)
+            self.write(handle, [100000, 200000])
+            handle.close()
+            self.assertEqual(self.read(), self.body)
+
+    def test_longer_than_allocated(self):
+        handle = OutputFile(self.file_path, use_mmap=True)
+        handle.allocate(1000)
+        self.write(handle, [600, 600, 298800])
+        handle.close()
+        self.assertEqual(self.read(), self.body)
+
+    def test_atomic(self):
+        with open(self.file_path, 'wb') as handle:
+            handle.write(b'old')
+        handle = OutputFile(self.file_path, atomic=True, use_mmap=True)
+        handle.allocate(len(self.body))
+        self.write(handle, [len(self.body)])
+        self.assertEqual(self.read(), b'old')
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        handle.commit()
+        handle.close()
+        self.assertEqual(self.read(), self.body)
+        self.assertEqual(os.listdir(self.directory), ['out.data'])
+
+    def test_atomic_failed(self):
+        with open(self.file_path, 'wb') as handle:
+            handle.write(b'old')
+        handle = OutputFile(self.file_path, atomic=True)
+        self.write(handle, [1000])
+        handle.close()
+        self.assertEqual(self.read(), b'old')
+        self.assertEqual(os.listdir(self.directory), ['out.data'])
+
+
+class OutputResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(3 * 1024 * 1024 + 17)
+        self.server.route('/plain', Reply(self.body))
+        self.server.route('/chunked', Reply(self.body, chunked=True, chunk_size=[3, 70000, 5, 4096]))
+        self.server.route('/short', Reply(self.body, headers=[('Content-Length', len(self.body) + 100)], close=True))
+        self.server.route('/missing', Reply(b'not found', status='404 Not Found'))
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'out.data')
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.file_path, 'rb') as handle:
+            return handle.read()
+
+    def test_download(self):
+        for path in ('/plain', '/chunked'):
+            for options in ({'preallocate': True}, {'preallocate': 'mmap'}, {'atomic': True},
+                            {'preallocate': 'mmap', 'atomic': True}, {'preallocate': True, 'adaptive': True}):
+                resp = get(self.server.url(path), file_path=self.file_path, overwrite=True, disable_progress=True,
+                           **options)
+                self.assertTrue(resp.complete)
+                self.assertEqual(resp.file_handle.name, self.file_path)
+                self.assertEqual(self.read(), self.body, (path, options))
+                self.assertEqual(os.listdir(self.directory), ['out.data'])
+
+    def test_short_body(self):
+        for preallocate in (True, 'mmap'):
+            resp = get(self.server.url('/short'), file_path=self.file_path, overwrite=True, preallocate=preallocate,
+                       disable_progress=True)
+            self.assertFalse(resp.complete)
+            self.assertEqual(self.read(), self.body)
+
+        os.remove(self.file_path)
+        resp = get(self.server.url('/short'), file_path=self.file_path, preallocate=True, atomic=True,
+                   disable_progress=True)
+        self.assertFalse(resp.complete)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_short_body_keeps_original(self):
+        for options in ({'atomic': True}, {'atomic': True, 'preallocate': True}, {'atomic': True, 'preallocate': 'mmap'}):
+            with open(self.file_path, 'wb') as handle:
+                handle.write(b'original')
+            resp = get(self.server.url('/short'), file_path=self.file_path, overwrite=True, disable_progress=True,
+                       **options)
+            self.assertFalse(resp.complete)
+            self.assertEqual(self.read(), b'original', options)
+            self.assertEqual(os.listdir(self.directory), ['out.data'])
+
+    def test_failed_status(self):
+        with open(self.file_path, 'wb') as handle:
+            handle.write(b'old')
+        get(self.server.url('/missing'), file_path=self.file_path, overwrite=True, atomic=True, disable_progress=True)
+        self.assertEqual(self.read(), b'old')
+        self.assertEqual(os.listdir(self.directory), ['out.data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import ssl
+import shutil
+import tempfile
+import threading
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.session import Session
+from ProgressedHttp.pipeline import *
+from ProgressedHttp.test.server import LocalServer, Reply
+from ProgressedHttp.test.tls_test import self_signed
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.bodies = {}
+        for i in range(20):
+            body = os.urandom(i * 997)
+            self.bodies['/item/{}'.format(i)] = body
+            if i % 2:
+                self.server.route('/item/{}'.format(i), Reply(body, chunked=True, chunk_size=[5, 300]))
+            else:
+                self.server.route('/item/{}'.format(i), Reply(body))
+        self.server.route('/empty', Reply(status='204 No Content'))
+        self.paths = sorted(self.bodies)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def check(self, results, paths=None):
+        paths = paths or self.paths
+        self.assertEqual(len(results), len(paths))
+        for path, resp in zip(paths, results):
+            self.assertTrue(resp.complete, path)
+            self.assertEqual(resp.data, self.bodies[path], path)
+
+    def test_one_connection(self):
+        for depth in (1, 4, 32):
+            connections = self.server.connections
+            results = pipeline([self.server.url(i) for i in self.paths], depth=depth, disable_progress=True)
+            self.check(results)
+            self.assertEqual(self.server.connections - connections, 1)
+
+    def test_leftover_between_responses(self):
+        # 一次 recv 会读到多个响应，没有实体的响应也要把多余的数据交给下一个
+        paths = ['/item/3', '/empty', '/item/4', '/empty', '/item/0', '/item/5']
+        self.bodies['/empty'] = b''
+        for options in ({}, {'chunk': 1024 * 1024}, {'adaptive': True}, {'chunk': 7}):
+            results = pipeline([self.server.url(i) for i in paths], depth=6, disable_progress=True, **options)
+            self.check(results, paths)
+
+    def test_files(self):
+        items = [(self.server.url(i), os.path.join(self.directory, i.replace('/', '_'))) for i in self.paths]
+        results = pipeline(items, depth=8, overwrite=True, disable_progress=True, hash_algorithms=['md5'])
+        for (url, file_path), resp in zip(items, results):
+            self.assertEqual(resp.file_handle.name, file_path)
+            with open(file_path, 'rb') as handle:
+                self.assertEqual(handle.read(), self.bodies[url[url.index('/item'):]])
+
+    def test_files_with_error(self):
+        # 错误响应不写文件，读完实体后继续使用同一个连接
+        self.server.route('/missing', Reply(b'not found', '404 Not Found'))
+        paths = self.paths[:5] + ['/missing'] + self.paths[5:9]
+        items = [(self.server.url(i), os.path.join(self.directory, i.replace('/', '_'))) for i in paths]
+        connections = self.server.connections
+        results = pipeline(items, depth=4, overwrite=True, disable_progress=True)
+        self.assertEqual(self.server.connections - connections, 1)
+        self.assertTrue(all(i.complete for i in results))
+        self.assertEqual(results[5].status['code'], b'404')
+        self.assertEqual(results[5].data, b'not found')
+        self.assertFalse(os.path.exists(items[5][1]))
+        for (url, file_path), resp in zip(items[6:], results[6:]):
+            with open(file_path, 'rb') as handle:
+                self.assertEqual(handle.read(), self.bodies[url[url.index('/item'):]])
+
+    def test_server_closes(self):
+        served = []
+        lock = threading.Lock()
+
+        def limited(req):
+            # 每个连接最多响应 3 个请求
+            with lock:
+                served.append(req)
+                close = len(served) % 3 == 0
+            return Reply(b'x' * len(served), close=close)
+
+        self.server.route('/limited', limited)
+        connections = self.server.connections
+        results = pipeline([self.server.url('/limited')] * 10, depth=5, disable_progress=True)
+        self.assertTrue(all(i.complete for i in results))
+        self.assertEqual(len(served), 10)
+        self.assertEqual(self.server.connections - connections, 4)
+
+    def test_session(self):
+        with Session() as session:
+            results = pipeline([self.server.url(i) for i in self.paths], session=session, disable_progress=True)
+            self.check(results)
+            self.assertEqual(session.pool.stats()['idle'], 1)
+            # 连接归还连接池之后还能正常使用
+            self.assertEqual(session.get(self.server.url('/item/7'), disable_progress=True).data,
+                             self.bodies['/item/7'])
+            self.check(pipeline([self.server.url(i) for i in self.paths], session=session, disable_progress=True))
+
+    def test_single_origin(self):
+        self.assertRaises(Exception, pipeline, ['http://a.com/', 'http://b.com/'])
+
+    def test_unexpected_data_not_reused(self):
+        self.server.route('/extra', lambda req: Reply(b'abc', headers=[('Content-Length', 2)]))
+        with Session() as session:
+            resp = get(self.server.url('/extra'), session=session, disable_progress=True)
+            self.assertEqual(resp.data, b'ab')
+            self.assertEqual(session.pool.stats()['idle'], 0)
+
+
+@unittest.skipIf(not hasattr(ssl, 'PROTOCOL_TLS_SERVER'), "local https server needs python 3.6+")
+class HTTPSPipelineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.pair = self_signed(cls.directory)
+        if cls.pair is None:
+            raise unittest.SkipTest("openssl is not available")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*self.pair)
+        self.server = LocalServer(context)
+        self.body = os.urandom(3000)
+        self.server.route('/', Reply(self.body))
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_session(self):
+        # 第二次使用的是连接池中已经完成握手的连接
+        with Session(tls_options={'cafile': self.pair[0]}) as session:
+            for _ in range(3):
+                results = pipeline([self.server.url('/')] * 5, session=session, disable_progress=True)
+                self.assertEqual([i.data for i in results], [self.body] * 5)
+            self.assertEqual(self.server.connections, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
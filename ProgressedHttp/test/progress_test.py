@@ -1,10 +1,14 @@
 # coding=utf8
 from __future__ import absolute_import, division, print_function
 
+import os
 import time
+import signal
 import random
+import threading
 import unittest
 
+from ProgressedHttp import progress
 from ProgressedHttp.progress import *
 
 
@@ -50,6 +54,16 @@ class Pro(object):
         self._chunked_loader()
         self.title = "full width"
 
+    @bar(threaded=True)
+    def threaded_loader(self):
+        self._normal_loader()
+        self.title = "后台线程绘制"
+
+    @bar(every=10)
+    def every_loader(self):
+        self._normal_loader()
+        self.title = "every 10"
+
     @bar(100)
     def fixed_chunked_loader(self):
         self._chunked_loader()
@@ -80,6 +94,194 @@ class ProgressTester(unittest.TestCase):
         print("进度条换行")
         Pro().fixed_chunked_loader()
 
+    def test_threaded_progress(self):
+        print("进度条换行")
+        pro = Pro()
+        pro.threaded_loader()
+        self.assertEqual(pro.progressed, pro.total)
+
+        pro = Pro()
+        pro.threaded_progress = True
+        pro.auto_loader()
+        self.assertEqual(pro.progressed, pro.total)
+
+        # 显式的 threaded=True 优先于对象上为 False 的 threaded_progress
+        painters = []
+        render_loop = progress._render_loop
+
+        def recording(*args):
+            painters.append(threading.current_thread())
+            render_loop(*args)
+
+        progress._render_loop = recording
+        try:
+            pro = Pro()
+            pro.threaded_progress = False
+            pro.threaded_loader()
+        finally:
+            progress._render_loop = render_loop
+        self.assertEqual(len(painters), 1)
+        self.assertIsNot(painters[0], threading.current_thread())
+        self.assertFalse(painters[0].is_alive())
+
+    def test_every_progress(self):
+        print("进度条换行")
+        pro = Pro()
+        pro.every_loader()
+        self.assertEqual(pro.progressed, pro.total)
+
+    def test_title_width_cache(self):
+        renderer = Renderer()
+        self.assertEqual(renderer.measure(u"中文"), (u"中文", 4))
+        renderer.title_width = -1
+        self.assertEqual(renderer.measure(u"中文")[1], -1)
+        self.assertEqual(renderer.measure(u"abc")[1], 3)
+
+    @unittest.skipUnless(hasattr(signal, 'SIGWINCH'), "SIGWINCH not supported")
+    def test_terminal_width_cache(self):
+        width = terminal_width()
+        self.assertTrue(width > 0)
+        self.assertFalse(progress._terminal['watching'])
+        self.assertTrue(progress._watch_resize())
+        try:
+            progress._terminal['width'] = 1
+            self.assertEqual(terminal_width(), 1)
+            os.kill(os.getpid(), signal.SIGWINCH)
+            self.assertEqual(terminal_width(), width)
+        finally:
+            progress._unwatch_resize()
+
+    @unittest.skipUnless(hasattr(signal, 'SIGWINCH'), "SIGWINCH not supported")
+    def test_resize_handler_restored(self):
+        received = []
+        previous = signal.signal(signal.SIGWINCH, lambda signum, frame: received.append(signum))
+        try:
+            terminal_width()
+            Pro().loader()
+            self.assertNotEqual(signal.getsignal(signal.SIGWINCH), progress._on_resize)
+
+            pro = Pro()
+            pro.threaded_progress = True
+            pro.threaded_loader()
+            os.kill(os.getpid(), signal.SIGWINCH)
+            self.assertEqual(received, [signal.SIGWINCH])
+            self.assertFalse(progress._terminal['watching'])
+        finally:
+            signal.signal(signal.SIGWINCH, previous)
+
+
+class Transfer(object):
+    def __init__(self, title, total, chunked=False):
+        self.title = title
+        self.progressed = 0
+        self.total = total
+        self.chunked = chunked
+        self.chunk_recved = 0
+
+
+class Output(object):
+    """
+    记录写入次数的输出，py2 下同时接受 str 与 unicode
+    """
+    def __init__(self):
+        self.parts = []
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        self.parts.append(s)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+class ManagerTester(unittest.TestCase):
+    def test_speed(self):
+        speed = Speed(window=1)
+        speed.update(0, 0)
+        self.assertEqual(speed.update(1000, 1), 1000)
+        for i in range(2, 20):
+            speed.update(1000 * i, i)
+        self.assertAlmostEqual(speed.rate, 1000)
+        # 突发的一个区间只改变一部分
+        rate = speed.update(1000 * 19 + 10000, 19.1)
+        self.assertTrue(1000 < rate < 100000, rate)
+        self.assertAlmostEqual(speed.eta(rate * 5), 5)
+        self.assertIsNone(Speed().eta(10))
+        self.assertEqual(speed.eta(0), 0)
+
+    def test_format(self):
+        self.assertEqual(progress.format_eta(None), '--:--')
+        self.assertEqual(progress.format_eta(65.2), '01:06')
+        self.assertEqual(progress.format_eta(3725), '1:02:05')
+        self.assertEqual(progress.fit(u"中文abc", 5), u"中文~")
+        self.assertEqual(progress.fit(u"ab", 4), u"ab  ")
+
+    def test_frame(self):
+        manager = Manager(rows=2, width=100, expected=5, stream=Output(), redraw=True)
+        transfers = [Transfer('a', 1000), Transfer('b', 2000), Transfer('c', 100, chunked=True)]
+        for i in transfers:
+            manager.add(i)
+        transfers[0].progressed = 500
+        transfers[2].chunk_recved = 4096
+        lines = manager.frame(0)
+        self.assertEqual(len(lines), 4)
+        self.assertIn('50%', lines[0])
+        self.assertIn('1 more', lines[2])
+        self.assertIn('total 0/5', lines[3])
+        self.assertTrue(all(progress.str_len(i) <= 99 for i in lines))
+
+        transfers[0].progressed = 1000
+        transfers[1].progressed = 1000
+        lines = manager.frame(1)
+        self.assertEqual(len(lines), 3)
+        self.assertIn('ETA', lines[0])
+        self.assertIn('4.00 KB', lines[1])
+        self.assertIn('total 1/5', lines[2])
+        # 失败的传输不计入完成数
+        manager.remove(transfers[1])
+        manager.remove(transfers[2])
+        self.assertEqual((manager.done, manager.done_bytes, manager.transfers), (1, 1000, []))
+
+        manager.draw(2)
+        manager.draw(3)
+        output = manager.stream.getvalue()
+        self.assertTrue(output.endswith('\x1b[J'))
+        self.assertIn('\x1b[1A', output)
+
+    def test_frame_rate(self):
+        stream = Output()
+        transfers = [Transfer(str(i), 2 * 10 ** 5) for i in range(8)]
+
+        def work(target):
+            manager.add(target)
+            while target.progressed < target.total:
+                target.progressed += 1000
+                time.sleep(0.001)
+
+        start = time.time()
+        with Manager(fps=20, width=80, expected=len(transfers), stream=stream, redraw=True) as manager:
+            threads = [threading.Thread(target=work, args=(i,)) for i in transfers]
+            for i in threads:
+                i.start()
+            for i in threads:
+                i.join()
+        elapsed = time.time() - start
+        self.assertEqual(manager.done, len(transfers))
+        self.assertTrue(stream.writes <= elapsed * 20 + 2, (stream.writes, elapsed))
+        self.assertIn('total 8/8', stream.getvalue().splitlines()[-2])
+
+    def test_not_a_terminal(self):
+        stream = Output()
+        with Manager(stream=stream, width=80) as manager:
+            target = manager.add(Transfer('a', 10))
+            target.progressed = 10
+        self.assertEqual(stream.writes, 1)
+        self.assertTrue(stream.getvalue().startswith(' total 1/1'))
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
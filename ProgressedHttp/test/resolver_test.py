@@ -0,0 +1,75 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import time
+import socket
+import unittest
+
+from ProgressedHttp.http import HTTPCons, get
+from ProgressedHttp.resolver import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class ResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.lookups = []
+        self.resolver = Resolver(ttl=0.2, negative_ttl=0.1, maxsize=2)
+        self.resolver.getaddrinfo = self.getaddrinfo
+
+    def getaddrinfo(self, host, port, family, kind):
+        self.lookups.append(host)
+        if host == 'missing':
+            raise socket.gaierror(-2, 'Name or service not known')
+        return [(family, kind, 6, '', ('127.0.0.{}'.format(len(self.lookups)), port))]
+
+    def test_ttl(self):
+        self.assertEqual(self.resolver.resolve('a', 80), [('127.0.0.1', 80)])
+        self.assertEqual(self.resolver.resolve('a', 80), [('127.0.0.1', 80)])
+        self.assertEqual(self.lookups, ['a'])
+        time.sleep(0.25)
+        self.assertEqual(self.resolver.resolve('a', 80), [('127.0.0.2', 80)])
+        self.assertEqual(self.resolver.stats(), {'hits': 1, 'misses': 2, 'size': 1})
+
+    def test_negative(self):
+        for _ in range(3):
+            self.assertRaises(socket.gaierror, self.resolver.resolve, 'missing', 80)
+        self.assertEqual(self.lookups, ['missing'])
+        time.sleep(0.15)
+        self.assertRaises(socket.gaierror, self.resolver.resolve, 'missing', 80)
+        self.assertEqual(len(self.lookups), 2)
+
+    def test_negative_fresh_exception(self):
+        errors = []
+        for _ in range(3):
+            try:
+                self.resolver.resolve('missing', 80)
+            except socket.gaierror as e:
+                errors.append(e)
+        self.assertEqual(len(set(id(i) for i in errors)), 3)
+        self.assertTrue(all(i.args == (-2, 'Name or service not known') for i in errors))
+        self.assertEqual(self.lookups, ['missing'])
+
+    def test_maxsize(self):
+        self.resolver.ttl = 60
+        for host in ('a', 'b', 'a', 'c'):
+            self.resolver.resolve(host, 80)
+        self.assertEqual(list(self.resolver.cache), [('a', 80), ('c', 80)])
+
+    def test_connection(self):
+        server = LocalServer()
+        server.route('/', Reply(b'resolved'))
+        resolver = Resolver()
+        try:
+            for _ in range(3):
+                req = HTTPCons(resolver=resolver)
+                req.request('http://localhost:{}/'.format(server.port))
+                req.close()
+            self.assertEqual(resolver.stats()['misses'], 1)
+            self.assertEqual(resolver.stats()['hits'], 2)
+            self.assertEqual(get(server.url('/'), disable_progress=True).data, b'resolved')
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
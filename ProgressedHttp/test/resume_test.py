@@ -0,0 +1,118 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import json
+import tempfile
+import unittest
+
+from ProgressedHttp.http import get
+from ProgressedHttp.resume import *
+from ProgressedHttp.test.server import LocalServer, Reply, ranged
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(1000000)
+        self.file_path = os.path.join(tempfile.gettempdir(), 'resume.data')
+        self.sidecar = self.file_path + ResumeState.suffix
+        for i in (self.file_path, self.sidecar):
+            if os.path.exists(i):
+                os.remove(i)
+
+    def tearDown(self):
+        self.server.close()
+        for i in (self.file_path, self.sidecar):
+            if os.path.exists(i):
+                os.remove(i)
+
+    def broken(self, size):
+        # 只发送部分实体后断开
+        return Reply(self.body[:size], headers=[('Content-Length', len(self.body)), ('ETag', '"v1"')], close=True)
+
+    def fetch(self):
+        return get(self.server.url('/file'), file_path=self.file_path, resume=True, disable_progress=True)
+
+    def content(self):
+        with open(self.file_path, 'rb') as handle:
+            return handle.read()
+
+    def test_resume(self):
+        self.server.route('/file', self.broken(300000))
+        self.fetch()
+        self.assertEqual(os.path.getsize(self.file_path), 300000)
+        with open(self.sidecar) as handle:
+            state = json.load(handle)
+        self.assertEqual(state['written'], 300000)
+        self.assertEqual(state['etag'], '"v1"')
+
+        self.server.route('/file', ranged(self.body, etag='"v1"'))
+        resp = self.fetch()
+        self.assertEqual(resp.status['code'], b'206')
+        self.assertEqual(self.server.requests[-1].headers['range'], 'bytes=300000-')
+        self.assertEqual(self.server.requests[-1].headers['if-range'], '"v1"')
+        self.assertEqual(self.content(), self.body)
+        self.assertFalse(os.path.exists(self.sidecar))
+
+    def test_changed(self):
+        self.server.route('/file', self.broken(300000))
+        self.fetch()
+        self.server.route('/file', ranged(self.body[::-1], etag='"v2"'))
+        resp = self.fetch()
+        self.assertEqual(resp.status['code'], b'200')
+        self.assertEqual(self.content(), self.body[::-1])
+        self.assertFalse(os.path.exists(self.sidecar))
+
+    def test_failed_without_data(self):
+        self.server.route('/file', Reply(b'', '500 Internal Server Error'))
+        self.fetch()
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertFalse(os.path.exists(self.sidecar))
+
+    def test_failed_keeps_existing(self):
+        # 没有可续传的部分时，响应被拒绝也不能删除已有的文件
+        with open(self.file_path, 'wb') as handle:
+            handle.write(b'original')
+        self.server.route('/file', Reply(b'', '404 Not Found'))
+        resp = get(self.server.url('/file'), file_path=self.file_path, resume=True, overwrite=True,
+                   disable_progress=True)
+        self.assertFalse(resp.complete)
+        self.assertEqual(self.content(), b'original')
+        self.assertFalse(os.path.exists(self.sidecar))
+
+    def test_renamed_target(self):
+        # 不覆盖已有文件时下载到 1_<name>，续传时找到它的状态文件
+        with open(self.file_path, 'wb') as handle:
+            handle.write(b'original')
+        renamed = os.path.join(os.path.dirname(self.file_path), '1_' + os.path.basename(self.file_path))
+        try:
+            self.server.route('/file', self.broken(300000))
+            self.fetch()
+            self.assertTrue(os.path.exists(renamed + ResumeState.suffix))
+            self.server.route('/file', ranged(self.body, etag='"v1"'))
+            resp = self.fetch()
+            self.assertEqual(resp.status['code'], b'206')
+            self.assertEqual(resp.file_handle.name, renamed)
+            self.assertEqual(self.content(), b'original')
+            with open(renamed, 'rb') as handle:
+                self.assertEqual(handle.read(), self.body)
+            self.assertFalse(os.path.exists(renamed + ResumeState.suffix))
+            self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.file_path),
+                                                         '2_' + os.path.basename(self.file_path))))
+        finally:
+            for i in (renamed, renamed + ResumeState.suffix):
+                if os.path.exists(i):
+                    os.remove(i)
+
+    def test_other_url(self):
+        self.server.route('/file', self.broken(300000))
+        self.fetch()
+        self.server.route('/other', ranged(self.body, etag='"v1"'))
+        get(self.server.url('/other'), file_path=self.file_path, resume=True, overwrite=True, disable_progress=True)
+        self.assertNotIn('range', self.server.requests[-1].headers)
+        self.assertEqual(self.content(), self.body)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,170 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import ssl
+import time
+import shutil
+import tempfile
+import unittest
+
+from ProgressedHttp.segment import *
+from ProgressedHttp.http import parse_content_range
+from ProgressedHttp.test.server import LocalServer, Reply, ranged
+from ProgressedHttp.test.tls_test import self_signed
+
+
+def failing(body):
+    """
+    第一个分段慢速返回，其余分段返回 500
+    """
+    serve = ranged(body)
+
+    def reply(req):
+        value = req.headers.get('range', '')
+        if not value:
+            return serve(req)
+        if not value.startswith('bytes=0-'):
+            return Reply(b'error', '500 Internal Server Error')
+        resp = serve(req)
+        resp.piece, resp.delay = 16 * 1024, 0.05  # 约 4 秒才能发完
+        return resp
+    return reply
+
+
+class SegmentTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(5 * 1024 * 1024 + 3)
+        self.file_path = os.path.join(tempfile.gettempdir(), 'segment.data')
+
+    def tearDown(self):
+        self.server.close()
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def content(self):
+        with open(self.file_path, 'rb') as handle:
+            return handle.read()
+
+    def test_segmented(self):
+        self.server.route('/ranged', ranged(self.body))
+        loader = download(self.server.url('/ranged'), self.file_path, segments=4,
+                          overwrite=True, disable_progress=True)
+        self.assertTrue(loader.segmented)
+        self.assertEqual(len(loader.ranges), 4)
+        self.assertEqual(self.content(), self.body)
+        self.assertEqual(len([i for i in self.server.requests if 'range' in i.headers]), 4)
+
+    def test_segment_count(self):
+        self.server.route('/ranged', ranged(self.body))
+        loader = download(self.server.url('/ranged'), self.file_path, segments=16,
+                          overwrite=True, disable_progress=True)
+        self.assertEqual(len(loader.ranges), 5)
+        self.assertEqual(self.content(), self.body)
+
+    def test_progress(self):
+        print("进度条换行")
+        self.server.route('/ranged', ranged(self.body))
+        loader = download(self.server.url('/ranged'), self.file_path, overwrite=True)
+        self.assertEqual(loader.written(), len(self.body))
+        self.assertEqual(self.content(), self.body)
+
+    def test_no_ranges(self):
+        self.server.route('/plain', Reply(self.body))
+        loader = download(self.server.url('/plain'), self.file_path, overwrite=True, disable_progress=True)
+        self.assertFalse(loader.segmented)
+        self.assertEqual(self.content(), self.body)
+
+    def test_ranges_ignored(self):
+        self.server.route('/ignored', Reply(self.body, headers=[('Accept-Ranges', 'bytes')]))
+        loader = download(self.server.url('/ignored'), self.file_path, overwrite=True, disable_progress=True)
+        self.assertFalse(loader.segmented)
+        self.assertEqual(self.content(), self.body)
+
+    def test_content_range(self):
+        self.assertEqual(parse_content_range(b'bytes 0-99/1000'), (0, 99, 1000))
+        self.assertEqual(parse_content_range(b'bytes 5-9/*'), (5, 9, None))
+        for value in (None, b'', b'bytes */1000', b'bytes 9-5/10', b'items 0-1/2', b'bytes -1-5/10'):
+            self.assertIsNone(parse_content_range(value), value)
+
+    def test_shifted_range(self):
+        serve = ranged(self.body)
+
+        def shifted(req):
+            value = req.headers.get('range', '')
+            if not value or value.startswith('bytes=0-'):
+                return serve(req)
+            # 返回的范围比请求的晚 1 个字节
+            start, end = [int(i) for i in req.headers['range'][6:].split('-')]
+            return Reply(self.body[start + 1: end + 2], '206 Partial Content', [
+                ('Accept-Ranges', 'bytes'), ('Content-Range', 'bytes {}-{}/{}'.format(start + 1, end + 1, len(self.body)))])
+
+        def missing(req):
+            if not req.headers.get('range'):
+                return serve(req)
+            return Reply(self.body[:100], '206 Partial Content', [('Accept-Ranges', 'bytes')])
+
+        for route in (shifted, missing):
+            self.server.route('/shifted', route)
+            with self.assertRaises(Exception):
+                download(self.server.url('/shifted'), self.file_path, overwrite=True, disable_progress=True)
+            self.assertFalse(os.path.exists(self.file_path))
+
+    def test_failed_segment_cancels_others(self):
+        self.server.route('/failing', failing(self.body))
+        start = time.time()
+        with self.assertRaises(Exception) as context:
+            download(self.server.url('/failing'), self.file_path, overwrite=True, disable_progress=True)
+        self.assertLess(time.time() - start, 2)
+        self.assertIn('500', str(context.exception))
+        self.assertFalse(os.path.exists(self.file_path))
+
+
+@unittest.skipIf(not hasattr(ssl, 'PROTOCOL_TLS_SERVER'), "local https server needs python 3.6+")
+class HTTPSSegmentTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.pair = self_signed(cls.directory)
+        if cls.pair is None:
+            raise unittest.SkipTest("openssl is not available")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*self.pair)
+        self.server = LocalServer(context)
+        self.body = os.urandom(5 * 1024 * 1024 + 3)
+        self.file_path = os.path.join(tempfile.gettempdir(), 'segment.data')
+
+    def tearDown(self):
+        self.server.close()
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_segmented(self):
+        self.server.route('/ranged', ranged(self.body))
+        loader = download(self.server.url('/ranged'), self.file_path, segments=4,
+                          overwrite=True, disable_progress=True, cafile=self.pair[0])
+        self.assertTrue(loader.segmented)
+        with open(self.file_path, 'rb') as handle:
+            self.assertEqual(handle.read(), self.body)
+
+    def test_failed_segment_cancels_others(self):
+        # https 连接需要中断 wrap_socket 之后的 socket，否则慢速分段会一直下载完
+        self.server.route('/failing', failing(self.body))
+        start = time.time()
+        with self.assertRaises(Exception) as context:
+            download(self.server.url('/failing'), self.file_path, overwrite=True, disable_progress=True,
+                     cafile=self.pair[0])
+        self.assertLess(time.time() - start, 2)
+        self.assertIn('500', str(context.exception))
+        self.assertFalse(os.path.exists(self.file_path))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,227 @@
+# coding=utf8
+"""
+    本地 HTTP 测试服务，不依赖外部网络
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+import socket
+import threading
+
+__all__ = ['LocalServer', 'Request', 'Reply', 'ranged']
+
+
+class Request(object):
+    """
+    服务端收到的请求
+    """
+    def __init__(self, method, path, version, headers, body):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers  # 键为小写 str
+        self.body = body
+
+
+class Reply(object):
+    """
+    服务端返回的响应
+    """
+    def __init__(self, body=b'', status='200 OK', headers=None, chunked=False, chunk_size=1024,
+                 close=False, delay=0, piece=0):
+        """
+        :param body: bytes
+        :param status: str
+        :param headers: list => [(name, value), ...]
+        :param chunked: bool => 使用分块编码
+        :param chunk_size: int | list => 分块大小，或依次使用的分块大小列表
+        :param close: bool => 响应之后关闭连接
+        :param delay: float => 每次发送之间的间隔，模拟慢速传输
+        :param piece: int => 每次发送的字节数，0 表示一次发完
+        """
+        self.body = body
+        self.status = status
+        self.headers = list(headers or [])
+        self.chunked = chunked
+        self.chunk_size = chunk_size
+        self.close = close
+        self.delay = delay
+        self.piece = piece
+
+    def chunks(self):
+        sizes = self.chunk_size if isinstance(self.chunk_size, (list, tuple)) else [self.chunk_size]
+        offset = index = 0
+        while offset < len(self.body):
+            size = sizes[index % len(sizes)]
+            index += 1
+            yield self.body[offset: offset + size]
+            offset += size
+
+    def payload(self):
+        head = ['HTTP/1.1 {}'.format(self.status)]
+        names = [k.lower() for k, _ in self.headers]
+        if self.chunked:
+            head.append('Transfer-Encoding: chunked')
+        elif 'content-length' not in names:
+            head.append('Content-Length: {}'.format(len(self.body)))
+        if self.close:
+            head.append('Connection: close')
+        head.extend('{}: {}'.format(k, v) for k, v in self.headers)
+        data = ('\r\n'.join(head) + '\r\n\r\n').encode()
+        if self.chunked:
+            data += b''.join(b'%x\r\n' % len(i) + i + b'\r\n' for i in self.chunks())
+            data += b'0\r\n\r\n'
+        else:
+            data += self.body
+        return data
+
+    def pieces(self):
+        data = self.payload()
+        if not self.piece:
+            yield data
+            return
+        for i in range(0, len(data), self.piece):
+            if i and self.delay:
+                time.sleep(self.delay)
+            yield data[i: i + self.piece]
+
+
+def ranged(body, headers=None, etag=None):
+    """
+    支持 Range 与 If-Range 请求的响应
+    :param body: bytes
+    :param headers: list => [(name, value), ...]
+    :param etag: str
+    :return: callable
+    """
+    def reply(req):
+        base = [('Accept-Ranges', 'bytes')] + list(headers or [])
+        if etag:
+            base.append(('ETag', etag))
+        value = req.headers.get('range', '')
+        if 'if-range' in req.headers and req.headers['if-range'] != etag:
+            value = ''
+        if not value.startswith('bytes='):
+            return Reply(body, headers=base)
+        start, end = value[6:].split('-')
+        start = int(start)
+        end = int(end) if end else len(body) - 1
+        return Reply(body[start: end + 1], '206 Partial Content',
+                     base + [('Content-Range', 'bytes {}-{}/{}'.format(start, end, len(body)))])
+    return reply
+
+
+class LocalServer(object):
+    """
+    多线程本地服务，按路径返回预设的 Reply
+    """
+    def __init__(self, context=None):
+        """
+        :param context: ssl.SSLContext => 设置后提供 https 服务
+        """
+        self.context = context
+        self.routes = {}
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(128)
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def url(self, path='/'):
+        return '{}://127.0.0.1:{}{}'.format('https' if self.context else 'http', self.port, path)
+
+    def route(self, path, reply):
+        """
+        :param path: str
+        :param reply: Reply | callable => callable(Request) -> Reply
+        :return: None
+        """
+        self.routes[path] = reply
+
+    def close(self):
+        self.running = False
+        self.sock.close()
+
+    def serve(self):
+        while self.running:
+            try:
+                con, _ = self.sock.accept()
+            except (socket.error, OSError):
+                break
+            with self.lock:
+                self.connections += 1
+            thread = threading.Thread(target=self.handle, args=(con,))
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def read_chunked(con, buf):
+        body = b''
+        while True:
+            while b'\r\n' not in buf:
+                buf += con.recv(65536)
+            line, buf = buf.split(b'\r\n', 1)
+            size = int(line.split(b';')[0], 16)
+            while len(buf) < size + 2:
+                buf += con.recv(65536)
+            body += buf[:size]
+            buf = buf[size + 2:]
+            if not size:
+                return body, buf
+
+    def handle(self, con):
+        buf = b''
+        try:
+            if self.context is not None:
+                con = self.context.wrap_socket(con, server_side=True)
+            while self.running:
+                while b'\r\n\r\n' not in buf:
+                    data = con.recv(65536)
+                    if not data:
+                        return
+                    buf += data
+                head, buf = buf.split(b'\r\n\r\n', 1)
+                lines = head.decode('latin-1').split('\r\n')
+                method, path, version = lines[0].split(' ')
+                headers = {}
+                for line in lines[1:]:
+                    k, v = line.split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+                if headers.get('transfer-encoding') == 'chunked':
+                    body, buf = self.read_chunked(con, buf)
+                else:
+                    length = int(headers.get('content-length', 0))
+                    while len(buf) < length:
+                        buf += con.recv(65536)
+                    body, buf = buf[:length], buf[length:]
+
+                req = Request(method, path, version, headers, body)
+                with self.lock:
+                    self.requests.append(req)
+                reply = self.routes.get(path.split('?')[0])
+                if reply is None:
+                    reply = Reply(b'not found', '404 Not Found')
+                elif callable(reply):
+                    reply = reply(req)
+                for piece in reply.pieces():
+                    con.sendall(piece)
+                if reply.close or headers.get('connection', '').lower() == 'close':
+                    return
+        except (socket.error, OSError, ValueError):
+            return
+        finally:
+            con.close()
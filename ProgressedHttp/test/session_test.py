@@ -0,0 +1,148 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import io
+import os
+import time
+import socket
+import unittest
+
+from ProgressedHttp.session import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class SessionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(50000)
+        self.server.route('/plain', Reply(self.body))
+        self.server.route('/chunked', Reply(self.body, chunked=True, chunk_size=[100, 3000, 7]))
+        self.server.route('/empty', Reply(b''))
+        self.server.route('/close', Reply(self.body, close=True))
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_reuse_connection(self):
+        with Session() as session:
+            for path in ('/plain', '/chunked', '/empty', '/plain', '/chunked'):
+                resp = session.get(self.server.url(path), disable_progress=True)
+                self.assertEqual(resp.data, self.body if path != '/empty' else b'')
+            self.assertEqual(self.server.connections, 1)
+            self.assertEqual(session.pool.stats(), {'hits': 4, 'misses': 1, 'evictions': 0, 'idle': 1})
+
+    def test_stream_reuse(self):
+        with Session() as session:
+            resp = session.get(self.server.url('/chunked'), stream=True)
+            self.assertEqual(b''.join(resp.iter_content()), self.body)
+            resp = session.get(self.server.url('/plain'), stream=True)
+            resp.read(10)
+            resp.close()
+            resp = session.get(self.server.url('/plain'), stream=True)
+            self.assertEqual(resp.read(), self.body)
+            self.assertEqual(self.server.connections, 2)
+
+    def test_server_close(self):
+        with Session() as session:
+            for _ in range(3):
+                resp = session.get(self.server.url('/close'), disable_progress=True)
+                self.assertEqual(resp.data, self.body)
+            self.assertEqual(self.server.connections, 3)
+            self.assertEqual(session.pool.stats()['idle'], 0)
+
+    def test_idle_timeout(self):
+        with Session(idle_timeout=0.05) as session:
+            session.get(self.server.url('/plain'), disable_progress=True)
+            time.sleep(0.1)
+            self.assertEqual(session.pool.evict_idle(), 1)
+            session.get(self.server.url('/plain'), disable_progress=True)
+            self.assertEqual(self.server.connections, 2)
+
+    def test_dropped_connection(self):
+        with Session() as session:
+            session.get(self.server.url('/plain'), disable_progress=True)
+            self.server.close()
+            for key in session.pool.idle:
+                for con, _ in session.pool.idle[key]:
+                    con.connect.shutdown(0)
+            self.assertIsNone(session.pool.get(('http', '127.0.0.1', self.server.port)))
+            self.assertEqual(session.pool.evictions, 1)
+
+    def test_retry_streamed_body(self):
+        class Stale(object):
+            # 连接池中已被服务端关闭的连接，请求头之后的发送失败
+            def __init__(self, connect):
+                self.connect = connect
+                self.sent = 0
+
+            def sendall(self, data):
+                self.sent += 1
+                if self.sent > 1:
+                    raise socket.error(32, 'Broken pipe')
+                self.connect.sendall(data)
+
+            def __getattr__(self, name):
+                return getattr(self.connect, name)
+
+        body = self.body * 2  # 超过 64KB 的实体与请求头分开发送
+
+        def pieces():
+            for i in range(0, len(body), 10000):
+                yield body[i: i + 10000]
+
+        self.server.route('/echo', lambda req: Reply(req.body))
+        with Session() as session:
+            for data, retried in ((body, True), (io.BytesIO(body), True), (pieces(), False)):
+                session.get(self.server.url('/plain'), disable_progress=True)
+                for key in session.pool.idle:
+                    for con, _ in session.pool.idle[key]:
+                        con.connect = Stale(con.connect)
+                if retried:
+                    resp = session.post(self.server.url('/echo'), data=data, disable_progress=True)
+                    self.assertEqual(resp.data, body)
+                else:
+                    # 生成器已经被读出一部分，不能重发
+                    self.assertRaises(socket.error, session.post, self.server.url('/echo'), data=data,
+                                      disable_progress=True)
+
+    def test_request_options(self):
+        with Session() as session:
+            resp = session.get(self.server.url('/plain'), stream=True, nodelay=True)
+            self.assertEqual(resp.con.s.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), 1)
+            self.assertEqual(resp.read(), self.body)
+            # 配置不同的连接不会互相复用
+            resp = session.get(self.server.url('/plain'), stream=True)
+            self.assertEqual(resp.con.s.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), 0)
+            self.assertEqual(resp.read(), self.body)
+            resp = session.get(self.server.url('/plain'), stream=True, nodelay=True)
+            self.assertTrue(resp.con.reused)
+            self.assertEqual(resp.con.s.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), 1)
+            self.assertEqual(resp.read(), self.body)
+            self.assertEqual(self.server.connections, 2)
+
+        with Session(tls_options={'verify': False}) as session:
+            con = session.connection(self.server.url('/plain'), tls_options={'cafile': 'ca.pem'})
+            self.assertEqual(con.tls_options, {'verify': False, 'cafile': 'ca.pem'})
+            con = session.connection(self.server.url('/plain'), tls_options={'verify': False})
+            self.assertEqual(con.variant, ())
+
+    def test_pool_size(self):
+        pool = ConnectionPool(maxsize=1)
+
+        class Con(object):
+            key = ('http', 'host', 80)
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        first, second = Con(), Con()
+        pool.put(first)
+        pool.put(second)
+        self.assertTrue(second.closed)
+        self.assertFalse(first.closed)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
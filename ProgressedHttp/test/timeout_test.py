@@ -0,0 +1,133 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+import socket
+import tempfile
+import unittest
+
+from ProgressedHttp.http import get, post
+from ProgressedHttp.session import Session
+from ProgressedHttp.timeout import *
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class TimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(100000)
+        self.server.route('/plain', Reply(self.body))
+        # 每 0.1 秒发送 1000 字节
+        self.server.route('/slow', Reply(self.body, piece=1000, delay=0.1))
+        self.server.route('/stall', Reply(self.body, piece=50000, delay=2))
+        self.file_path = os.path.join(tempfile.gettempdir(), 'timeout.data')
+
+    def tearDown(self):
+        self.server.close()
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_no_limit(self):
+        resp = get(self.server.url('/plain'), read_timeout=1, deadline=5, min_speed=(1000, 1),
+                   disable_progress=True)
+        self.assertEqual(resp.data, self.body)
+
+    def test_read_timeout(self):
+        start = time.time()
+        self.assertRaises(ReadTimeout, get, self.server.url('/stall'), read_timeout=0.3,
+                          file_path=self.file_path, disable_progress=True)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_slow_upload(self):
+        # 上传期间持续有数据发出，空闲超时从最后一次发送开始计算
+        def pieces():
+            for i in range(5):
+                time.sleep(0.3)
+                yield self.body[i * 1000: (i + 1) * 1000]
+
+        self.server.route('/echo', lambda req: time.sleep(0.3) or Reply(req.body))
+        resp = post(self.server.url('/echo'), data=pieces(), read_timeout=0.7, disable_progress=True)
+        self.assertEqual(resp.data, self.body[:5000])
+
+    def test_deadline(self):
+        start = time.time()
+        self.assertRaises(DeadlineExceeded, get, self.server.url('/slow'), read_timeout=1, deadline=0.5,
+                          file_path=self.file_path, disable_progress=True)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_too_slow(self):
+        self.assertRaises(TooSlow, get, self.server.url('/slow'), min_speed=(100000, 0.5),
+                          disable_progress=True)
+        self.assertRaises(TooSlow, get, self.server.url('/stall'), min_speed=(1000, 0.3),
+                          disable_progress=True)
+
+    def test_min_speed_after_first_byte(self):
+        # 响应头之前等待 0.6 秒，不计入最低速度的统计窗口
+        self.server.route('/late', lambda req: time.sleep(0.6) or Reply(self.body))
+        resp = get(self.server.url('/late'), min_speed=(100000, 0.3), disable_progress=True)
+        self.assertEqual(resp.data, self.body)
+
+    def test_clock_jump(self):
+        limits = Timeouts(deadline=5, min_speed=(10, 1))
+        self.assertIsNone(limits.window_start)
+        real = time.time
+        time.time = lambda: real() + 3600  # 系统时间向后跳变不影响超时
+        try:
+            limits.check()
+            self.assertGreater(limits.remaining(), 4)
+        finally:
+            time.time = real
+        limits.start_body()
+        self.assertLessEqual(limits.timeout(), 1)
+
+    def test_stream(self):
+        resp = get(self.server.url('/stall'), read_timeout=0.3, stream=True)
+        self.assertRaises(ReadTimeout, resp.read)
+        self.assertTrue(resp.finished)
+
+    def test_connect_timeout(self):
+        # backlog 为 0 且不 accept 的服务端，队列占满后连接不会完成
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(0)
+        port = sock.getsockname()[1]
+        pending = []
+        try:
+            for _ in range(8):
+                con = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                con.setblocking(False)
+                con.connect_ex(('127.0.0.1', port))
+                pending.append(con)
+            try:
+                get('http://127.0.0.1:{}/'.format(port), connect_timeout=0.2, disable_progress=True)
+            except ConnectTimeout:
+                pass
+            except socket.error:
+                self.skipTest("connection was not left pending")
+            else:
+                self.skipTest("connection was accepted by the kernel")
+        finally:
+            for con in pending:
+                con.close()
+            sock.close()
+
+    def test_session_reset(self):
+        with Session() as session:
+            self.assertRaises(ReadTimeout, session.get, self.server.url('/stall'), read_timeout=0.3,
+                              disable_progress=True)
+            session.get(self.server.url('/plain'), read_timeout=1, disable_progress=True)
+            resp = session.get(self.server.url('/plain'), disable_progress=True)
+            self.assertIsNone(resp.socket.gettimeout())
+
+    def test_timeouts(self):
+        self.assertIsNone(Timeouts.create({'data': 'x'}))
+        limits = Timeouts(read=5, deadline=1, min_speed=(10, 2))
+        self.assertLessEqual(limits.timeout(), 1)
+        self.assertTrue(issubclass(TooSlow, socket.timeout))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,115 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import socket
+import tempfile
+import unittest
+
+from ProgressedHttp import timing
+from ProgressedHttp.http import get
+from ProgressedHttp.session import Session
+from ProgressedHttp.timeout import ReadTimeout
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class TimingTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer()
+        self.body = os.urandom(100000)
+        self.server.route('/plain', Reply(self.body, piece=20000, delay=0.01))
+        self.server.route('/chunked', Reply(self.body, chunked=True))
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_phases(self):
+        resp = get(self.server.url('/plain'), disable_progress=True)
+        timings = resp.timings
+        points = [timings.start, timings.resolved, timings.connected, timings.sent,
+                  timings.first_byte, timings.head_received, timings.done]
+        self.assertEqual(points, sorted(points))
+        self.assertIsNone(timings.handshaked)
+        durations = timings.durations()
+        self.assertIsNone(durations['tls'])
+        self.assertGreater(durations['transfer'], 0.03)
+        self.assertAlmostEqual(sum(v for k, v in durations.items() if k != 'total' and v), durations['total'])
+        self.assertEqual(timings.wire_bytes, len(self.body))
+        self.assertEqual(timings.head_size, len(resp.raw_head))
+        self.assertGreater(timings.request_size, 0)
+        self.assertTrue(timings.complete)
+        self.assertIn('transfer=', repr(timings))
+
+    def test_reused(self):
+        with Session() as session:
+            session.get(self.server.url('/chunked'), disable_progress=True)
+            timings = session.get(self.server.url('/chunked'), disable_progress=True).timings
+        self.assertTrue(timings.reused)
+        self.assertIsNone(timings.durations()['dns'])
+        self.assertIsNotNone(timings.durations()['wait'])
+        self.assertEqual(timings.as_dict()['wire_bytes'], timings.wire_bytes)
+
+    def test_hooks(self):
+        local = []
+        shared = []
+        timing.add_hook(shared.append)
+        try:
+            resp = get(self.server.url('/chunked'), disable_progress=True, on_timings=local.append)
+            get(self.server.url('/missing'), disable_progress=True)
+        finally:
+            timing.remove_hook(shared.append)
+        get(self.server.url('/chunked'), disable_progress=True)
+        self.assertEqual(local, [resp.timings])
+        self.assertEqual(len(shared), 2)
+        self.assertEqual(shared[1].url, self.server.url('/missing'))
+
+    def test_failed(self):
+        # 超时、连接失败的请求同样调用回调，timings 附在异常上
+        self.server.route('/stall', Reply(self.body, piece=50000, delay=2))
+        local = []
+        shared = []
+        timing.add_hook(shared.append)
+        try:
+            with self.assertRaises(ReadTimeout) as context:
+                get(self.server.url('/stall'), read_timeout=0.2, disable_progress=True, on_timings=local.append)
+            closed = socket.socket()
+            closed.bind(('127.0.0.1', 0))
+            port = closed.getsockname()[1]
+            closed.close()
+            with self.assertRaises(socket.error) as refused:
+                get('http://127.0.0.1:{}/'.format(port), disable_progress=True)
+        finally:
+            timing.remove_hook(shared.append)
+        timings = context.exception.timings
+        self.assertEqual(local, [timings])
+        self.assertEqual(shared, [timings, refused.exception.timings])
+        self.assertFalse(timings.complete)
+        self.assertIs(timings.error, context.exception)
+        self.assertGreater(timings.wire_bytes, 0)
+        self.assertIsNotNone(timings.durations()['total'])
+        self.assertIsNone(refused.exception.timings.connected)
+        self.assertIn('ReadTimeout', timings.as_dict()['error'])
+
+    def test_raising_hook(self):
+        def hook(timings):
+            raise ValueError('hook')
+
+        feeds = []
+        file_path = os.path.join(tempfile.gettempdir(), 'timing.data')
+        with Session() as session:
+            with self.assertRaises(ValueError):
+                get(self.server.url('/chunked'), disable_progress=True, on_timings=hook, file_path=file_path,
+                    overwrite=True, session=session, on_feed=feeds.append)
+            self.assertTrue(feeds[0].complete)
+            self.assertTrue(feeds[0].file_handle.closed)
+            self.assertEqual(session.pool.stats()['idle'], 1)
+            # 已经归还的连接没有被关闭，可以继续使用
+            resp = session.get(self.server.url('/chunked'), disable_progress=True)
+            self.assertTrue(resp.con.reused)
+            self.assertEqual(resp.data, self.body)
+        self.assertTrue(os.path.exists(file_path))
+        os.remove(file_path)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
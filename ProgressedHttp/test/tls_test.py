@@ -0,0 +1,100 @@
+# coding=utf8
+from __future__ import absolute_import, division, print_function
+
+import os
+import ssl
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from ProgressedHttp import tls
+from ProgressedHttp.http import get
+from ProgressedHttp.session import Session
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+def self_signed(directory):
+    """
+    生成 127.0.0.1 的自签名证书，没有 openssl 时返回 None
+    """
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    try:
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                               '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                               '-keyout', key, '-out', cert],
+                              stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+
+class ContextTest(unittest.TestCase):
+    def tearDown(self):
+        tls.clear()
+
+    def test_cached(self):
+        self.assertIs(tls.context(), tls.context())
+        self.assertIsNot(tls.context(), tls.context(verify=False))
+        self.assertEqual(tls.context(verify=False).verify_mode, ssl.CERT_NONE)
+        self.assertEqual(tls.options({'verify': False, 'data': 'x'}), {'verify': False})
+
+    def test_session_store(self):
+        store = tls.SessionStore(maxsize=2)
+        ctx = tls.context()
+        for host in ('a', 'b', 'c'):
+            store.put(ctx, host, 443, host)
+        store.put(ctx, 'd', 443, None)
+        self.assertIsNone(store.get(ctx, 'a', 443))
+        self.assertEqual(store.get(ctx, 'c', 443), 'c')
+        self.assertIsNone(store.get(tls.context(verify=False), 'c', 443))
+
+
+@unittest.skipIf(not tls.SUPPORT_SESSION, "TLS session reuse needs python 3.6+")
+class ResumptionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.pair = self_signed(cls.directory)
+        if cls.pair is None:
+            raise unittest.SkipTest("openssl is not available")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*self.pair)
+        self.server = LocalServer(context)
+        self.body = os.urandom(30000)
+        self.server.route('/', Reply(self.body))
+
+    def tearDown(self):
+        self.server.close()
+        tls.clear()
+
+    def test_resumed(self):
+        resumed = []
+        for _ in range(3):
+            resp = get(self.server.url('/'), cafile=self.pair[0], disable_progress=True,
+                       on_feed=lambda feed: resumed.append(feed.con.resumed))
+            self.assertEqual(resp.data, self.body)
+        self.assertEqual(resumed, [False, True, True])
+        self.assertTrue(resp.timings.connected < resp.timings.handshaked < resp.timings.sent)
+        self.assertEqual(len(tls._contexts), 1)
+
+    def test_session(self):
+        with Session(tls_options={'cafile': self.pair[0]}) as session:
+            self.assertEqual(session.get(self.server.url('/'), disable_progress=True).data, self.body)
+        with Session(tls_options={'cafile': self.pair[0]}) as session:
+            resp = session.get(self.server.url('/'), disable_progress=True)
+            self.assertTrue(resp.con.resumed)
+
+    def test_verify_failed(self):
+        self.assertRaises(ssl.SSLError, get, self.server.url('/'), disable_progress=True)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,173 @@
+# coding=utf8
+"""
+    Connect/read timeouts, whole-request deadline and minimum throughput
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+import socket
+
+__all__ = ['Timeout', 'ConnectTimeout', 'ReadTimeout', 'DeadlineExceeded', 'TooSlow', 'Timeouts']
+
+# 单调时钟，系统时间被调整时不会误触发或错过超时；python2 没有 monotonic 时退化为 time.time
+clock = getattr(time, 'monotonic', time.time)
+
+
+class Timeout(socket.timeout):
+    """
+    所有超时异常的基类，兼容 socket.timeout
+    """
+
+
+class ConnectTimeout(Timeout):
+    """
+    建立连接(包括 TLS 握手)超时
+    """
+
+
+class ReadTimeout(Timeout):
+    """
+    连接上超过 read_timeout 秒没有收发任何数据
+    """
+
+
+class DeadlineExceeded(Timeout):
+    """
+    整个请求超过 deadline 秒仍未完成
+    """
+
+
+class TooSlow(Timeout):
+    """
+    从收到实体开始，连续 min_speed[1] 秒的平均速度低于 min_speed[0] 字节每秒
+    """
+
+
+class Timeouts(object):
+    """
+    单次请求的超时限制，每次收发前给出 socket 应设置的超时
+    """
+    def __init__(self, connect=None, read=None, deadline=None, min_speed=None):
+        """
+        :param connect: float => 连接超时秒数
+        :param read: float => 读写空闲超时秒数
+        :param deadline: float => 整个请求的最长秒数，从创建时开始计时
+        :param min_speed: (int, float) => (字节每秒, 秒数)，持续低于该速度时中止
+        """
+        self.connect = connect
+        self.read = read
+        self.deadline = deadline
+        self.min_speed = min_speed
+        self.started = clock()
+        self.transferred = 0
+        self.last_active = self.started  # 最近一次收发数据的时间
+        # 最低速度的统计窗口，收到实体后才开始，连接与等待响应的时间不计入
+        self.window_start = None
+        self.window_bytes = 0
+
+    @staticmethod
+    def create(kwargs):
+        """
+        从请求参数中创建，没有任何限制时返回 None
+        :param kwargs: dict => connect_timeout | read_timeout | deadline | min_speed
+        :return: Timeouts | None
+        """
+        if kwargs.get('timeouts') is not None:
+            return kwargs['timeouts']
+        values = [kwargs.get(k) for k in ('connect_timeout', 'read_timeout', 'deadline', 'min_speed')]
+        if all(i is None for i in values):
+            return None
+        return Timeouts(*values)
+
+    def remaining(self, now=None):
+        """
+        :return: float | None => 距离 deadline 的剩余秒数
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - ((now or clock()) - self.started)
+
+    @staticmethod
+    def shortest(*values):
+        values = [i for i in values if i is not None]
+        if not values:
+            return None
+        return max(min(values), 0.001)
+
+    def connect_timeout(self):
+        """
+        :return: float | None => 建立连接时 socket 的超时
+        """
+        self.check()
+        return self.shortest(self.connect, self.remaining())
+
+    def send_timeout(self):
+        """
+        :return: float | None => 发送请求时 socket 的超时，每次 sendall 不能超过空闲超时
+        """
+        self.check()
+        return self.shortest(self.read, self.remaining())
+
+    def timeout(self):
+        """
+        :return: float | None => 收发数据时 socket 的超时
+        """
+        now = clock()
+        self.check(now)
+        idle = window = None
+        if self.read is not None:
+            idle = self.read - (now - self.last_active)
+        if self.min_speed is not None and self.window_start is not None:
+            window = self.min_speed[1] - (now - self.window_start)
+        return self.shortest(idle, self.remaining(now), window)
+
+    def start_body(self, received=0):
+        """
+        响应头接收完整时调用，最低速度从实体的第一个字节开始统计
+        :param received: int => 与响应头一起收到的实体字节数
+        :return: None
+        """
+        if self.window_start is None:
+            self.window_start = clock()
+            self.window_bytes = self.transferred - received
+
+    def update(self, count):
+        """
+        记录收发的字节数，并检查 deadline 与最低速度
+        :param count: int
+        :return: None
+        """
+        self.transferred += count
+        self.last_active = clock()
+        self.check(self.last_active)
+
+    def check(self, now=None):
+        """
+        超出限制时抛出对应的异常
+        :return: None
+        """
+        now = now or clock()
+        remaining = self.remaining(now)
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("request exceeded deadline of {}s".format(self.deadline))
+        if self.min_speed is None or self.window_start is None:
+            return
+        speed, seconds = self.min_speed
+        elapsed = now - self.window_start
+        if elapsed < seconds:
+            return
+        rate = (self.transferred - self.window_bytes) / elapsed
+        if rate < speed:
+            raise TooSlow("transfer rate {:.0f}B/s below {}B/s for {}s".format(rate, speed, seconds))
+        self.window_start = now
+        self.window_bytes = self.transferred
+
+    def expired(self):
+        """
+        socket 超时后调用，抛出具体的超时原因
+        :return: None => 只是速度统计窗口到期且速度达标时返回，可以继续等待
+        """
+        now = clock()
+        self.check(now)
+        if self.read is not None and now - self.last_active >= self.read - 0.001:
+            raise ReadTimeout("no data for {}s".format(self.read))
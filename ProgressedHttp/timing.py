@@ -0,0 +1,140 @@
+# coding=utf8
+"""
+    Per-request phase timings: DNS, connect, TLS, send, wait, transfer
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+
+__all__ = ['Timings', 'add_hook', 'remove_hook']
+
+# 单调时钟，python2 没有 monotonic 时退化为 time.time
+clock = getattr(time, 'monotonic', time.time)
+
+hooks = []  # 每个请求结束后调用 hook(timings)
+
+
+def add_hook(func):
+    """
+    注册全局回调，例如把耗时上报到 tracing 系统
+    :param func: callable => func(Timings)
+    :return: None
+    """
+    if func not in hooks:
+        hooks.append(func)
+
+
+def remove_hook(func):
+    if func in hooks:
+        hooks.remove(func)
+
+
+class Timings(object):
+    """
+    一次请求各阶段的时间点，复用的连接没有 dns、connect、tls 阶段
+    """
+    # (阶段名, 阶段结束的时间点属性)
+    phases = (
+        ('dns', 'resolved'),
+        ('connect', 'connected'),
+        ('tls', 'handshaked'),
+        ('send', 'sent'),
+        ('wait', 'first_byte'),
+        ('transfer', 'done'),
+    )
+
+    def __init__(self, hook=None):
+        """
+        :param hook: callable => 本次请求结束后调用 hook(timings)
+        """
+        self.hook = hook
+        self.url = None
+        self.start = clock()
+        self.resolved = None  # DNS 解析完成
+        self.connected = None  # TCP 连接建立
+        self.handshaked = None  # TLS 握手完成
+        self.sent = None  # 请求发送完成
+        self.first_byte = None  # 收到响应的第一个字节
+        self.head_received = None  # 响应头接收完整
+        self.done = None  # 响应结束
+
+        self.reused = False  # 使用了连接池中的连接
+        self.resumed = False  # 复用了 TLS 会话
+        self.request_size = 0  # 请求行与请求头字节数
+        self.head_size = 0  # 响应头字节数
+        self.wire_bytes = 0  # 实体传输的字节数(解压前)
+        self.complete = False
+        self.error = None  # 请求失败时的异常
+        self.notified = False
+
+    def mark(self, name):
+        setattr(self, name, clock())
+
+    def finish(self, complete, wire_bytes):
+        """
+        记录响应结束，回调在连接、文件清理之后由 notify 调用
+        :param complete: bool => 响应实体是否完整
+        :param wire_bytes: int
+        :return: None
+        """
+        self.done = clock()
+        self.complete = complete
+        self.wire_bytes = wire_bytes
+
+    def notify(self):
+        """
+        调用本次请求与全局的回调
+        :return: None
+        """
+        self.notified = True
+        if self.hook is not None:
+            self.hook(self)
+        for hook in hooks:
+            hook(self)
+
+    def fail(self, error, wire_bytes=0):
+        """
+        请求因超时、连接错误等异常结束时同样记录并调用回调，异常的 timings 属性指向本对象
+        :param error: BaseException
+        :param wire_bytes: int
+        :return: None
+        """
+        if self.notified:
+            return  # finish_loop 已经调用过回调，例如回调本身或摘要校验抛出的异常
+        if self.done is None:
+            self.finish(False, wire_bytes)
+        self.error = error
+        try:
+            error.timings = self
+        except AttributeError:
+            pass
+        self.notify()
+
+    def durations(self):
+        """
+        :return: dict => 阶段名 => 秒数，没有经过的阶段为 None
+        """
+        result = {}
+        previous = self.start
+        for name, point in self.phases:
+            value = getattr(self, point)
+            if value is None:
+                result[name] = None
+                continue
+            result[name] = value - previous
+            previous = value
+        result['total'] = self.done - self.start if self.done is not None else None
+        return result
+
+    def as_dict(self):
+        result = self.durations()
+        result.update(url=self.url, reused=self.reused, resumed=self.resumed, complete=self.complete,
+                      error=repr(self.error) if self.error is not None else None,
+                      request_size=self.request_size, head_size=self.head_size, wire_bytes=self.wire_bytes)
+        return result
+
+    def __repr__(self):
+        durations = self.durations()
+        names = [i[0] for i in self.phases] + ['total']
+        return "Timings({})".format(", ".join(
+            "{}={:.1f}ms".format(i, durations[i] * 1000) for i in names if durations[i] is not None))
@@ -0,0 +1,111 @@
+# coding=utf8
+"""
+    Shared SSLContext cache and TLS session store
+"""
+from __future__ import absolute_import, division, print_function
+
+import sys
+import threading
+from collections import OrderedDict
+
+__all__ = ['context', 'options', 'SessionStore', 'default_sessions', 'clear']
+
+# request 中与 SSLContext 配置相关的参数
+OPTIONS = ('verify', 'cafile', 'certfile', 'keyfile')
+
+_contexts = {}
+_lock = threading.Lock()
+
+# python 3.6 之前 wrap_socket 不支持传入 session，这里不导入 ssl，只有 https 请求才需要加载
+SUPPORT_SESSION = sys.version_info >= (3, 6)
+
+
+def context(verify=True, cafile=None, certfile=None, keyfile=None):
+    """
+    按配置缓存 SSLContext，加载系统证书只在第一次创建时进行
+    :param verify: bool => 是否校验服务端证书
+    :param cafile: str => 自定义 CA 证书路径
+    :param certfile: str => 客户端证书
+    :param keyfile: str => 客户端证书私钥
+    :return: ssl.SSLContext
+    """
+    key = (bool(verify), cafile, certfile, keyfile)
+    with _lock:
+        if key not in _contexts:
+            import ssl
+            # 没有指定 cafile 时 create_default_context 已经加载了系统证书
+            ctx = ssl.create_default_context(cafile=cafile)
+            if verify:
+                ctx.check_hostname = True
+                ctx.verify_mode = ssl.CERT_REQUIRED
+            else:
+                ctx.check_hostname = False
+                ctx.verify_mode = ssl.CERT_NONE
+            if certfile:
+                ctx.load_cert_chain(certfile, keyfile)
+            _contexts[key] = ctx
+        return _contexts[key]
+
+
+def options(kwargs):
+    """
+    从请求参数中取出 SSLContext 配置
+    :param kwargs: dict
+    :return: dict
+    """
+    return dict((k, kwargs[k]) for k in OPTIONS if k in kwargs)
+
+
+def clear():
+    """
+    清空缓存的 SSLContext 与 TLS 会话
+    """
+    with _lock:
+        _contexts.clear()
+    default_sessions.clear()
+
+
+class SessionStore(object):
+    """
+    按 (SSLContext, host, port) 保存最近一次的 SSLSession，用于简化握手
+    """
+    def __init__(self, maxsize=256):
+        """
+        :param maxsize: int => 最多保存的会话数量
+        """
+        self.maxsize = maxsize
+        self.sessions = OrderedDict()  # 按加入顺序淘汰
+        self.lock = threading.Lock()
+
+    def get(self, ctx, host, port):
+        """
+        :param ctx: ssl.SSLContext
+        :param host: str
+        :param port: int
+        :return: ssl.SSLSession | None
+        """
+        with self.lock:
+            return self.sessions.get((id(ctx), host, port))
+
+    def put(self, ctx, host, port, session):
+        """
+        :param ctx: ssl.SSLContext
+        :param host: str
+        :param port: int
+        :param session: ssl.SSLSession | None
+        :return: None
+        """
+        if session is None:
+            return
+        with self.lock:
+            key = (id(ctx), host, port)
+            if key not in self.sessions and len(self.sessions) >= self.maxsize:
+                self.sessions.popitem(last=False)
+            self.sessions[key] = session
+
+    def clear(self):
+        with self.lock:
+            self.sessions.clear()
+
+
+default_sessions = SessionStore()
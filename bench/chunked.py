@@ -0,0 +1,81 @@
+# coding=utf8
+"""
+    分块编码解码吞吐量对比: 旧的拼接/切片实现 vs ChunkedDecoder
+
+    python -m bench.chunked
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import time
+
+from ProgressedHttp.chunked import ChunkedDecoder
+from ProgressedHttp.utils import unit_change
+
+
+class LegacyChunk(object):
+    """
+    原 SockFeed.flush_chunk 实现
+    """
+    def __init__(self):
+        self.current_chunk = b''
+        self.data = bytearray()
+        self.done = False
+
+    def flush_chunk(self, data):
+        self.current_chunk += data
+
+        while len(self.current_chunk) > 10240 or self.current_chunk.endswith(b'0\r\n\r\n'):
+            chunk_head = self.current_chunk[: self.current_chunk.index(b'\r\n')]
+            chunk_left = self.current_chunk[self.current_chunk.index(b'\r\n') + 2:]
+            chunk_size = int(chunk_head, 16)
+            if chunk_size == 0:
+                self.done = True
+                return True
+            if chunk_size > len(chunk_left):
+                return False
+            self.data += chunk_left[: chunk_size]
+            self.current_chunk = chunk_left[chunk_size:]
+            if self.current_chunk.startswith(b'\r\n'):
+                self.current_chunk = self.current_chunk[2:]
+
+
+def encode(body, size):
+    return b''.join(b'%x\r\n' % len(body[i: i + size]) + body[i: i + size] + b'\r\n'
+                    for i in range(0, len(body), size)) + b'0\r\n\r\n'
+
+
+def legacy(pieces):
+    feed = LegacyChunk()
+    for i in pieces:
+        feed.flush_chunk(i)
+    return feed.done
+
+
+def incremental(pieces):
+    data = bytearray()
+    decoder = ChunkedDecoder(data.extend)
+    for i in pieces:
+        decoder.feed(i)
+    return decoder.done
+
+
+def measure(func, pieces, total):
+    start = time.time()
+    assert func(pieces)
+    cost = time.time() - start
+    return "{:>12}/s".format(unit_change(total / cost))
+
+
+def run(total=16 * 1024 * 1024, recv=4096):
+    body = os.urandom(total)
+    print("{:>10} {:>14} {:>14}".format('chunk', 'legacy', 'incremental'))
+    for size in (1024, 16 * 1024, 256 * 1024, 1024 * 1024):
+        data = encode(body, size)
+        pieces = [data[i: i + recv] for i in range(0, len(data), recv)]
+        print("{:>10} {} {}".format(unit_change(size), measure(legacy, pieces, total),
+                                    measure(incremental, pieces, total)))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,62 @@
+# coding=utf8
+"""
+    响应头解析耗时对比: 旧的拼接/整体扫描实现 vs HeadParser
+
+    python -m bench.headers
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+
+from ProgressedHttp.headers import HeadParser
+
+
+def legacy(pieces):
+    """
+    原 SockFeed.feed 中的响应头解析
+    """
+    raw_head = b''
+    for data in pieces:
+        raw_head += data
+        if b'\r\n\r\n' in raw_head:
+            seps = raw_head[0: raw_head.index(b'\r\n\r\n')].split(b'\r\n')
+            status = seps[0].split(b' ')
+            headers = {
+                i.split(b":")[0].title(): i.split(b":")[1].strip() for i in seps[1:]
+            }
+            return status[1], headers[b'Content-Length']
+
+
+def incremental(pieces):
+    parser = HeadParser()
+    for data in pieces:
+        if parser.feed(data):
+            return parser.status()['code'], parser.headers()[b'Content-Length']
+
+
+def response(count):
+    lines = [b'HTTP/1.1 200 OK', b'Date: Sun, 18 Oct 2026 10:00:00 GMT']
+    lines.extend(b'X-Header-%d: value-%d' % (i, i) for i in range(count))
+    lines.append(b'Content-Length: 0')
+    return b'\r\n'.join(lines) + b'\r\n\r\n'
+
+
+def measure(func, pieces, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        assert func(pieces) == (b'200', b'0')
+    return "{:>10.1f}us".format((time.time() - start) / rounds * 1e6)
+
+
+def run(rounds=2000):
+    print("{:>8} {:>6} {:>12} {:>12}".format('headers', 'recv', 'legacy', 'incremental'))
+    for count in (10, 50, 200):
+        data = response(count)
+        for recv in (len(data), 512, 64):
+            pieces = [data[i: i + recv] for i in range(0, len(data), recv)]
+            print("{:>8} {:>6} {} {}".format(count, recv, measure(legacy, pieces, rounds),
+                                            measure(incremental, pieces, rounds)))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,120 @@
+# coding=utf8
+"""
+    小请求批量耗时: 逐个 keep-alive 请求 vs 不同深度的管线化，通过延迟代理模拟往返时间
+
+    python -m bench.pipeline
+    python -m bench.pipeline --rtt 50 -n 200
+"""
+from __future__ import absolute_import, division, print_function
+
+import time
+import socket
+import argparse
+import threading
+from collections import deque
+
+from ProgressedHttp.session import Session
+from ProgressedHttp.pipeline import pipeline
+from ProgressedHttp.test.server import LocalServer, Reply
+
+
+class DelayProxy(object):
+    """
+    每个方向的数据都延迟 rtt / 2 再转发，不限制带宽
+    """
+    def __init__(self, port, rtt):
+        self.upstream = ('127.0.0.1', port)
+        self.delay = rtt / 2
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except (socket.error, OSError):
+                return
+            server = socket.create_connection(self.upstream)
+            for source, target in ((client, server), (server, client)):
+                thread = threading.Thread(target=self.pump, args=(source, target))
+                thread.daemon = True
+                thread.start()
+
+    def pump(self, source, target):
+        queue = deque()
+        ready = threading.Condition()
+
+        def forward():
+            while True:
+                with ready:
+                    while not queue:
+                        ready.wait()
+                    due, data = queue.popleft()
+                time.sleep(max(due - time.time(), 0))
+                try:
+                    if not data:
+                        target.shutdown(socket.SHUT_WR)
+                        return
+                    target.sendall(data)
+                except (socket.error, OSError):
+                    return
+
+        thread = threading.Thread(target=forward)
+        thread.daemon = True
+        thread.start()
+        while True:
+            try:
+                data = source.recv(65536)
+            except (socket.error, OSError):
+                data = b''
+            with ready:
+                queue.append((time.time() + self.delay, data))
+                ready.notify()
+            if not data:
+                return
+
+    def close(self):
+        self.sock.close()
+
+
+def main(args=None):
+    arg = argparse.ArgumentParser(prog='python -m bench.pipeline')
+    arg.add_argument('-n', '--requests', type=int, default=100, help="requests per batch")
+    arg.add_argument('--rtt', type=float, default=20, help="simulated round trip time in ms")
+    arg.add_argument('--size', type=int, default=512, help="response body size")
+    options = arg.parse_args(args)
+
+    server = LocalServer()
+    server.route('/small', Reply(b'x' * options.size))
+    proxy = DelayProxy(server.port, options.rtt / 1000)
+    url = 'http://127.0.0.1:{}/small'.format(proxy.port)
+    print("{} GETs of {} bytes, rtt {}ms".format(options.requests, options.size, options.rtt))
+
+    with Session() as session:
+        session.get(url, disable_progress=True)  # 建立连接
+        start = time.time()
+        for _ in range(options.requests):
+            session.get(url, disable_progress=True)
+        sequential = time.time() - start
+    print("{:>12} {:>9.1f}ms".format('keep-alive', sequential * 1000))
+
+    for depth in (1, 4, 16, 64):
+        with Session() as session:
+            session.get(url, disable_progress=True)
+            start = time.time()
+            results = pipeline([url] * options.requests, depth=depth, session=session, disable_progress=True)
+            elapsed = time.time() - start
+        assert all(i.complete for i in results)
+        print("{:>12} {:>9.1f}ms {:>6.1f}x".format('depth={}'.format(depth), elapsed * 1000, sequential / elapsed))
+
+    proxy.close()
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
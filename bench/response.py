@@ -0,0 +1,211 @@
+# coding=utf8
+"""
+    响应接收基准测试，使用子进程中的本地服务，不依赖外部网络
+
+    python -m bench.response                    # 完整测试，结果写入 bench-response.json
+    python -m bench.response --quick -o a.json  # 只测较小的实体
+    python -m bench.response --compare a.json   # 与之前的结果对比
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from ProgressedHttp import __version__
+from ProgressedHttp.http import get
+from ProgressedHttp.utils import unit_change
+from ProgressedHttp.test.server import LocalServer, Reply
+
+KB = 1024
+MB = 1024 * 1024
+
+# 名称 => (实体大小, Reply 参数)
+BODIES = [
+    ('length-64K', 64 * KB, {}),
+    ('length-1M', MB, {}),
+    ('length-16M', 16 * MB, {}),
+    ('chunked-1K', MB, {'chunked': True, 'chunk_size': KB}),
+    ('chunked-64K', 16 * MB, {'chunked': True, 'chunk_size': 64 * KB}),
+    ('chunked-mixed', 4 * MB, {'chunked': True, 'chunk_size': [3, 10000, 64 * KB, 7, 1500]}),
+    ('drip-1M', MB, {'piece': 16 * KB, 'delay': 0.001}),
+]
+QUICK = ('length-64K', 'length-1M', 'chunked-1K', 'chunked-mixed', 'drip-1M')
+MODES = ('memory', 'file', 'prealloc', 'muted')
+CHUNKS = (4 * KB, 64 * KB, 256 * KB, 0)  # 0 表示从 4KB 开始自适应
+
+
+def serve(queue, names):
+    """
+    子进程中运行的服务，基准测试进程的 CPU 时间不包括服务端
+    """
+    server = LocalServer()
+    for name, size, options in BODIES:
+        if name in names:
+            server.route('/' + name, Reply(os.urandom(size), **options))
+    queue.put(server.port)
+    while True:
+        time.sleep(60)
+
+
+def cpu_time():
+    if resource is None:
+        return time.process_time() if hasattr(time, 'process_time') else time.clock()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Muted(object):
+    """
+    进度条输出到 /dev/null，只保留绘制的开销
+    """
+    def __enter__(self):
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+
+    def __exit__(self, *args):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+
+def fetch(url, mode, chunk, file_path):
+    options = {'chunk': chunk} if chunk else {'adaptive': True}
+    if mode == 'file':
+        return get(url, file_path=file_path, overwrite=True, **options)
+    if mode == 'prealloc':
+        return get(url, file_path=file_path, overwrite=True, preallocate=True, atomic=True, **options)
+    return get(url, disable_progress=mode == 'muted', **options)
+
+
+def chunk_name(chunk):
+    return unit_change(chunk) if chunk else 'auto'
+
+
+def measure(url, size, mode, chunk, repeat, file_path):
+    """
+    :return: dict => 一组参数的测试结果
+    """
+    seconds = []
+    cpu = []
+    with Muted():
+        for _ in range(repeat):
+            start, start_cpu = time.time(), cpu_time()
+            resp = fetch(url, mode, chunk, file_path)
+            seconds.append(time.time() - start)
+            cpu.append(cpu_time() - start_cpu)
+            assert resp.received == size, (url, resp.received)
+            del resp
+
+        peak = None
+        if tracemalloc is not None:
+            # 单独测一次内存，tracemalloc 会拖慢速度
+            tracemalloc.start()
+            fetch(url, mode, chunk, file_path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        'bytes': size,
+        'seconds': best,
+        'throughput': size / best,
+        'cpu_per_mb': min(cpu) / (size / MB),
+        'peak_memory': peak
+    }
+
+
+def run(names, repeat=3, output=None):
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=serve, args=(queue, names))
+    worker.daemon = True
+    worker.start()
+    port = queue.get(timeout=30)
+    file_path = os.path.join(tempfile.gettempdir(), 'bench-response.data')
+
+    results = []
+    print("{:>14} {:>7} {:>9} {:>12} {:>11} {:>10}".format('body', 'mode', 'chunk', 'throughput', 'cpu/MB', 'peak'))
+    try:
+        for name, size, _ in BODIES:
+            if name not in names:
+                continue
+            for mode in MODES:
+                for chunk in CHUNKS:
+                    url = 'http://127.0.0.1:{}/{}'.format(port, name)
+                    result = measure(url, size, mode, chunk, repeat, file_path)
+                    result.update(body=name, mode=mode, chunk=chunk)
+                    results.append(result)
+                    print("{:>14} {:>7} {:>9} {:>10}/s {:>9.2f}ms {:>10}".format(
+                        name, mode, chunk_name(chunk), unit_change(result['throughput']),
+                        result['cpu_per_mb'] * 1000,
+                        unit_change(result['peak_memory']) if result['peak_memory'] is not None else '-'))
+    finally:
+        worker.terminate()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    report = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'repeat': repeat,
+        'results': results
+    }
+    if output:
+        with open(output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print("results written to {}".format(output))
+    return report
+
+
+def compare(old_path, new_path):
+    """
+    按 (body, mode, chunk) 对比两次结果的吞吐量与 CPU 时间
+    """
+    with open(old_path) as handle:
+        old = dict(((i['body'], i['mode'], i['chunk']), i) for i in json.load(handle)['results'])
+    with open(new_path) as handle:
+        new = json.load(handle)['results']
+    print("{:>14} {:>7} {:>9} {:>11} {:>9}".format('body', 'mode', 'chunk', 'throughput', 'cpu/MB'))
+    for i in new:
+        before = old.get((i['body'], i['mode'], i['chunk']))
+        if before is None:
+            continue
+        print("{:>14} {:>7} {:>9} {:>+10.1f}% {:>+8.1f}%".format(
+            i['body'], i['mode'], chunk_name(i['chunk']),
+            (i['throughput'] / before['throughput'] - 1) * 100,
+            (i['cpu_per_mb'] / before['cpu_per_mb'] - 1) * 100 if before['cpu_per_mb'] else 0))
+
+
+def main(args=None):
+    arg = argparse.ArgumentParser(prog='python -m bench.response')
+    arg.add_argument('-o', '--output', default='bench-response.json', help="json result file")
+    arg.add_argument('-r', '--repeat', type=int, default=3, help="runs per case, the best one is kept")
+    arg.add_argument('--quick', action='store_true', help="skip the large bodies")
+    arg.add_argument('--compare', help="previous json result to compare with")
+    options = arg.parse_args(args)
+
+    names = QUICK if options.quick else [i[0] for i in BODIES]
+    run(names, options.repeat, options.output)
+    if options.compare:
+        compare(options.compare, options.output)
+
+
+if __name__ == '__main__':
+    main()
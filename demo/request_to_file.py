@@ -1,8 +1,6 @@
 # coding=utf8
 from ProgressedHttp import http
 
-import hashlib
-
 
 def run():
     file_path = '1m.data'
@@ -16,15 +14,13 @@ def run():
     # 传递连接对象
     resp = http.SockFeed(req)
 
-    # 获取http响应结果，并保存在 `1m.data` 文件中
-    resp.http_response(file_path, overwrite=True)  # 多次下载，文件将被重写
-
-    # 验证下载文件完整性
-    with open(file_path, 'rb') as handle:
-        # 如果上面请求结束未关闭文件，这里将无法读取全部文件
-        content = handle.read()
+    # 获取http响应结果，并保存在 `1m.data` 文件中，接收时同时计算 md5，不匹配时删除文件并抛出 DigestMismatch
+    resp.http_response(file_path, overwrite=True,  # 多次下载，文件将被重写
+                       expected_digest='md5:9a50ddbef4c82eb9003bd496a00e0989')
 
-    assert hashlib.md5(content).hexdigest() == '9a50ddbef4c82eb9003bd496a00e0989'
+    # 不需要重新读取文件验证完整性
+    assert resp.verified
+    assert resp.digests['md5'] == '9a50ddbef4c82eb9003bd496a00e0989'
 
 
 if __name__ == '__main__':
@@ -15,6 +15,11 @@ setup(
     author_email=__author_email__,
     url=__url__,
     packages=['ProgressedHttp'],
+    entry_points={
+        'console_scripts': [
+            'progressed-http = ProgressedHttp.cli:main'
+        ]
+    },
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',